@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+端到端回填基准
+使用模拟佳明服务 + 一次性 PostgreSQL，分别测量 1 天 / 30 天 / 10 年回填吞吐(天/秒、点/秒)
+
+示例:
+    python bench/bench_backfill.py --docker --scenarios 1,30,3650 --latency-ms 20 \
+        --out bench_output.json --compare bench_baseline.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import sys
+import time
+
+import harness
+from fake_garmin import FakeGarminServer, install
+
+
+def run_scenario(dsn, server, days, verbose=False):
+    import garth
+    import metrics
+    from garmin_data_collector import GarminDataCollector
+
+    harness.reset_tables(dsn)
+    server.days_back = days
+    requests_before = server.requests
+    bytes_before = server.bytes_sent
+
+    collector = GarminDataCollector()
+    install(garth.client, server.base_url)
+    collector._display_name = "bench-user"
+    base = metrics.snapshot()
+    t0 = time.monotonic()
+    try:
+        out = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+        with out:
+            collector.collect_all_data(days_back=days)
+    finally:
+        collector.cleanup()
+    elapsed = time.monotonic() - t0
+    now = metrics.snapshot()
+    rows = now["rowswritten"] - base["rowswritten"]
+    return {
+        "days": days,
+        "seconds": round(elapsed, 3),
+        "days_per_second": round(days / elapsed, 3),
+        "rows_written": int(rows),
+        "points_per_second": round(rows / elapsed, 1),
+        "requests": server.requests - requests_before,
+        "bytes": server.bytes_sent - bytes_before,
+        "db_seconds": round(now["dbseconds"] - base["dbseconds"], 3),
+        "db_commits": int(now["dbcommits"] - base["dbcommits"]),
+    }
+
+
+def print_results(results, baseline=None):
+    print(f"\n{'场景':>8} {'耗时(s)':>10} {'天/秒':>10} {'点/秒':>12} {'请求数':>8} {'提交数':>8}  对比基线")
+    for res in results:
+        line = (f"{res['days']:>7}d {res['seconds']:>10.2f} {res['days_per_second']:>10.2f} "
+                f"{res['points_per_second']:>12.0f} {res['requests']:>8} {res['db_commits']:>8}")
+        base = (baseline or {}).get(str(res["days"]))
+        if base and base.get("points_per_second"):
+            ratio = res["points_per_second"] / base["points_per_second"]
+            line += f"  x{ratio:.2f} {'⚠️' if ratio < 0.9 else ''}"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="端到端回填吞吐基准")
+    parser.add_argument("--dsn", help="一次性测试库 DSN(会清空 garmin_ 表)")
+    parser.add_argument("--docker", action="store_true", help="自动启动一次性 PostgreSQL 容器")
+    parser.add_argument("--scenarios", default="1,30,3650", help="回填天数，逗号分隔")
+    parser.add_argument("--latency-ms", type=float, default=0, help="模拟接口延迟")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="模拟接口延迟抖动")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="模拟接口错误率(503)")
+    parser.add_argument("--fixtures", help="录制数据目录，缺失的接口用合成数据")
+    parser.add_argument("--out", help="结果输出 JSON")
+    parser.add_argument("--compare", help="基线结果 JSON(例如上一个 PR 的输出)")
+    parser.add_argument("--verbose", action="store_true", help="显示采集器输出")
+    args = parser.parse_args(argv)
+
+    dsn = harness.resolve_dsn(args)
+    harness.write_config(dsn)
+    harness.load_schema(dsn)
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    server = FakeGarminServer(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                              error_rate=args.error_rate, fixtures_dir=args.fixtures).start()
+    results = []
+    try:
+        for days in (int(d) for d in args.scenarios.split(",")):
+            print(f"⏱️ 回填 {days} 天...")
+            results.append(run_scenario(dsn, server, days, args.verbose))
+    finally:
+        server.stop()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = {str(r["days"]): r for r in json.load(f)["results"]}
+    print_results(results, baseline)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({
+                "revision": harness.git_revision(),
+                "latency_ms": args.latency_ms,
+                "error_rate": args.error_rate,
+                "results": results,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 结果已写入 {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
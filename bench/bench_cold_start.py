@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+run-once 冷启动基准
+每次启动新进程执行 `main.py run-once`(模拟佳明服务 + 已缓存的会话令牌)，测量:
+    import main     导入入口模块(重模块按需导入)
+    startup         导入后至取得采集锁(导入采集器/garth/psycopg2、读配置、连接数据库)
+    login           恢复缓存会话并完成首个请求
+    至首个请求      startup + login
+    进程总耗时      含解释器启动与采集本身
+
+示例:
+    python bench/bench_cold_start.py --docker --repeat 5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import harness
+from fake_garmin import FakeGarminServer, install
+
+BENCH = os.path.dirname(os.path.abspath(__file__))
+
+DRIVER = """
+import time
+t0 = time.monotonic()
+import sys, json
+sys.path[:0] = {paths!r}
+import main
+imported = time.monotonic() - t0
+import garth
+from fake_garmin import install
+install(garth.client, {url!r})
+code = main.main(["run-once", "--types"] + {types!r} + ["--days", "{days}"])
+print("@@" + json.dumps({{"import": imported, "code": code}}))
+"""
+
+
+def write_session(save_path, base_url):
+    """写入不过期的假会话令牌，run-once 直接恢复而不登录"""
+    import garth
+    install(garth.client, base_url)
+    garth.client.dump(save_path)
+
+
+def last_run(dsn):
+    import psycopg2
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT stages, duration FROM garmin_run_journal ORDER BY id DESC LIMIT 1")
+            return cur.fetchone()
+    finally:
+        conn.close()
+
+
+def run_once(dsn, config_path, base_url, types, days):
+    code = DRIVER.format(paths=[BENCH, harness.SRC], url=base_url, types=types, days=days)
+    env = dict(os.environ, CONFIG_PATH=config_path)
+    t0 = time.monotonic()
+    proc = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True)
+    wall = time.monotonic() - t0
+    marker = [line for line in proc.stdout.splitlines() if line.startswith("@@")]
+    if not marker:
+        raise RuntimeError(f"run-once 异常退出({proc.returncode}): {proc.stderr[-2000:]}")
+    result = json.loads(marker[-1][2:])
+    if result["code"] != 0:
+        raise RuntimeError(f"run-once 退出码 {result['code']}: {proc.stdout[-2000:]}")
+    stages, _ = last_run(dsn)
+    return {
+        "import": result["import"],
+        "startup": stages["startup"],
+        "login": stages["login"],
+        "first_request": stages["startup"] + stages["login"],
+        "wall": wall,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="run-once 冷启动基准")
+    parser.add_argument("--dsn", help="一次性测试库 DSN(会清空 garmin_ 表)")
+    parser.add_argument("--docker", action="store_true", help="自动启动一次性 PostgreSQL 容器")
+    parser.add_argument("--repeat", type=int, default=5, help="启动次数")
+    parser.add_argument("--types", nargs="+", default=["heartrate"], help="run-once 采集的数据类型")
+    parser.add_argument("--days", type=int, default=1, help="run-once 回溯天数")
+    parser.add_argument("--latency-ms", type=float, default=0, help="模拟接口延迟")
+    args = parser.parse_args(argv)
+
+    dsn = harness.resolve_dsn(args)
+    config_path = harness.write_config(dsn)
+    harness.load_schema(dsn)
+    import yaml
+    with open(config_path, "r", encoding="utf-8") as f:
+        save_path = yaml.safe_load(f)["garmin"]["save_path"]
+
+    server = FakeGarminServer(latency_ms=args.latency_ms).start()
+    try:
+        write_session(save_path, server.base_url)
+        samples = []
+        for i in range(args.repeat):
+            harness.reset_tables(dsn)
+            samples.append(run_once(dsn, config_path, server.base_url, args.types, args.days))
+            print(f"  ⏱️ 第 {i + 1} 次: 至首个请求 {samples[-1]['first_request']:.3f}s")
+    finally:
+        server.stop()
+
+    print(f"\n{'阶段':<14} {'最好(s)':>9} {'中位(s)':>9}")
+    labels = (("import main", "import"), ("startup", "startup"), ("login", "login"),
+              ("至首个请求", "first_request"), ("进程总耗时", "wall"))
+    for label, key in labels:
+        values = [s[key] for s in samples]
+        print(f"{label:<14} {min(values):>9.3f} {statistics.median(values):>9.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+明细写入基准: 逐点 datetime + VALUES 与 毫秒时间戳数组 + 服务端 to_timestamp/unnest 对比
+默认一年 2 分钟间隔心率(365 x 720 点)，逐日写入
+
+示例:
+    python bench/bench_detail_ingest.py --docker --days 365
+"""
+
+import argparse
+import logging
+import sys
+import time
+from datetime import date, timedelta
+
+import harness
+import synthetic
+
+
+def _payload_bytes(db, sql, params=None, values=None):
+    """客户端发送的 SQL 文本字节数"""
+    from psycopg2.extras import execute_values
+
+    class _Capture:
+        def __init__(self, cur):
+            self.cur = cur
+            self.size = 0
+            self.connection = cur.connection
+
+        def mogrify(self, *args):
+            return self.cur.mogrify(*args)
+
+        def execute(self, query, args=None):
+            self.size += len(query if args is None else self.cur.mogrify(query, args))
+
+    with db._get_conn().cursor() as cur:
+        if values is not None:
+            cap = _Capture(cur)
+            execute_values(cap, sql, values, page_size=500)
+            return cap.size
+        return len(cur.mogrify(sql, params))
+
+
+def run_path(dsn, db, path, days_data):
+    """按日写入全部数据，返回 (客户端准备耗时, 总耗时, 点数, 字节数)"""
+    harness.reset_tables(dsn)
+    prep = 0.0
+    points = 0
+    payload = 0
+    t0 = time.monotonic()
+    for day, series in days_data:
+        p0 = time.monotonic()
+        if path == "values":
+            values = db._heartrate_detail_values(day, series)
+            prep += time.monotonic() - p0
+            db._write("garmin_heartrate_detail", db.DETAIL_SQL["heartrate"], values=values)
+            points += len(values)
+        else:
+            ts, vals = db._series_arrays(series, int)
+            prep += time.monotonic() - p0
+            db._write_series("heartrate", day, ts, vals, error="bench")
+            points += len(ts)
+    elapsed = time.monotonic() - t0
+
+    # 载荷大小单独统计，不计入耗时
+    for day, series in days_data[:7]:
+        if path == "values":
+            payload += _payload_bytes(db, db.DETAIL_SQL["heartrate"],
+                                      values=db._heartrate_detail_values(day, series))
+        else:
+            ts, vals = db._series_arrays(series, int)
+            payload += _payload_bytes(db, db.ARRAY_SQL["heartrate"],
+                                      params={"datadate": day, "ts": ts, "vals": vals})
+    payload = payload * len(days_data) // min(len(days_data), 7)
+    return prep, elapsed, points, payload
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="心率明细写入路径对比")
+    parser.add_argument("--dsn", help="一次性测试库 DSN(会清空 garmin_ 表)")
+    parser.add_argument("--docker", action="store_true", help="自动启动一次性 PostgreSQL 容器")
+    parser.add_argument("--days", type=int, default=365, help="天数")
+    parser.add_argument("--step", type=int, default=120, help="采样间隔(秒)")
+    parser.add_argument("--repeat", type=int, default=3, help="每种路径重复次数，取最好成绩")
+    args = parser.parse_args(argv)
+
+    dsn = harness.resolve_dsn(args)
+    harness.write_config(dsn)
+    harness.load_schema(dsn)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    from database import GarminDatabase
+    db = GarminDatabase()
+    end = date.today() - timedelta(days=1)
+    days_data = []
+    for i in range(args.days):
+        day = (end - timedelta(days=i)).isoformat()
+        days_data.append((day, synthetic.heart_rate(day, args.step)["heartRateValues"]))
+    total = sum(len(s) for _, s in days_data)
+    print(f"⏱️ {args.days} 天 x {86400 // args.step} 点 = {total} 点，每种路径 {args.repeat} 次")
+
+    print(f"\n{'路径':<8} {'准备(s)':>10} {'总耗时(s)':>10} {'点/秒':>12} {'载荷(MB)':>10}")
+    results = {}
+    try:
+        for path in ("values", "array"):
+            best = min((run_path(dsn, db, path, days_data) for _ in range(args.repeat)), key=lambda r: r[1])
+            results[path] = best
+            prep, elapsed, points, payload = best
+            print(f"{path:<8} {prep:>10.2f} {elapsed:>10.2f} {points / elapsed:>12.0f} {payload / 1024 / 1024:>10.1f}")
+    finally:
+        db.close()
+    speedup = results["values"][1] / results["array"][1]
+    print(f"\n📈 数组路径加速 x{speedup:.2f}，载荷 {results['array'][3] / results['values'][3] * 100:.0f}%")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
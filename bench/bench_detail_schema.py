@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+明细表结构写入基准: 原结构 vs 追加写结构(script/detail_append_only.sql)
+经 GarminDatabase 的明细写入方法逐日写入心率/压力/呼吸/血氧/睡眠阶段与活动轨迹点，
+分别测量首次写入与重复写入(刷新窗口内的 ON CONFLICT DO NOTHING)吞吐，以及写入后的表大小
+
+示例:
+    python bench/bench_detail_schema.py --docker --days 365
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import harness
+import synthetic
+
+APPEND_ONLY_SCHEMA = os.path.join(harness.ROOT, "script", "detail_append_only.sql")
+
+TABLES = ("garmin_heartrate_detail", "garmin_stress_detail", "garmin_respiration_detail",
+          "garmin_spo2_detail", "garmin_sleep_detail", "garmin_activity_detail")
+
+
+def build_payloads(days):
+    """预先生成全部载荷，不计入写入耗时 [(写入方法名, 参数...), ...]"""
+    end = date.today() - timedelta(days=1)
+    calls = []
+    for i in range(days):
+        day = end - timedelta(days=i)
+        d = day.isoformat()
+        calls.append(("batch_upsert_heartrate_details", d, synthetic.heart_rate(d)["heartRateValues"]))
+        calls.append(("batch_upsert_stress_details", d, synthetic.stress(d)["stressValuesArray"]))
+        calls.append(("batch_upsert_respiration_details", d,
+                      synthetic.respiration(d)["respirationValuesArray"]))
+        calls.append(("batch_upsert_spo2_details", d, synthetic.spo2(d)))
+        calls.append(("batch_upsert_sleep_details", d, synthetic.sleep(d)["sleepLevels"]))
+        if day.toordinal() % synthetic.ACTIVITY_EVERY_DAYS == 0:
+            aid = synthetic.activity_id(day)
+            points = [{
+                "pointtime": datetime.fromtimestamp(ts / 1000, tz=timezone.utc),
+                "latitude": lat, "longitude": lng, "heartrate": hr,
+                "elevation": ele, "speed": speed, "distance": dist,
+            } for ts, lat, lng, hr, ele, speed, dist in synthetic._track(aid)]
+            calls.append(("batch_upsert_activity_details", aid, points))
+    return calls
+
+
+def write_all(db, calls):
+    t0 = time.monotonic()
+    for method, key, payload in calls:
+        getattr(db, method)(key, payload)
+    return time.monotonic() - t0
+
+
+def table_stats(db):
+    rows = db._fetchall("""
+        SELECT c.relname, c.reltuples::bigint, pg_relation_size(c.oid), pg_indexes_size(c.oid)
+        FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relkind = 'r' AND n.nspname = current_schema() AND c.relname = ANY(%s)
+    """, (list(TABLES),))
+    return {name: (count, heap, indexes) for name, count, heap, indexes in rows}
+
+
+def run_variant(dsn, variant, calls):
+    import psycopg2
+    from database import GarminDatabase
+
+    harness.load_schema(dsn)
+    if variant == "append_only":
+        harness.load_schema(dsn, APPEND_ONLY_SCHEMA)
+    db = GarminDatabase()
+    try:
+        first = write_all(db, calls)
+        again = write_all(db, calls)
+    finally:
+        db.close()
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("VACUUM ANALYZE " + ", ".join(TABLES))
+    conn.close()
+    db = GarminDatabase()
+    try:
+        stats = table_stats(db)
+    finally:
+        db.close()
+    return first, again, stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="明细表结构写入基准(原结构 vs 追加写结构)")
+    parser.add_argument("--dsn", help="一次性测试库 DSN(会重建 garmin_ 表)")
+    parser.add_argument("--docker", action="store_true", help="自动启动一次性 PostgreSQL 容器")
+    parser.add_argument("--days", type=int, default=365, help="天数")
+    args = parser.parse_args(argv)
+
+    dsn = harness.resolve_dsn(args)
+    harness.write_config(dsn)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    calls = build_payloads(args.days)
+    results = {}
+    for variant in ("original", "append_only"):
+        print(f"⏱️ {variant}: 写入 {args.days} 天明细...")
+        results[variant] = run_variant(dsn, variant, calls)
+
+    points = sum(v[0] for v in results["original"][2].values())
+    print(f"\n{'结构':<12} {'首次写入(s)':>12} {'点/秒':>10} {'重复写入(s)':>12} {'点/秒':>10} "
+          f"{'表(MB)':>9} {'索引(MB)':>9}")
+    for variant, (first, again, stats) in results.items():
+        heap = sum(s[1] for s in stats.values()) / 1024 / 1024
+        indexes = sum(s[2] for s in stats.values()) / 1024 / 1024
+        print(f"{variant:<12} {first:>12.2f} {points / first:>10.0f} {again:>12.2f} {points / again:>10.0f} "
+              f"{heap:>9.1f} {indexes:>9.1f}")
+
+    print(f"\n{'表':<28} {'行数':>10} {'原 字节/行':>10} {'追加写 字节/行':>14}")
+    for table in TABLES:
+        count, heap, indexes = results["original"][2].get(table, (0, 0, 0))
+        _, heap2, indexes2 = results["append_only"][2].get(table, (0, 0, 0))
+        if count:
+            print(f"{table:<28} {count:>10} {(heap + indexes) / count:>10.0f} {(heap2 + indexes2) / count:>14.0f}")
+
+    original, append_only = results["original"], results["append_only"]
+    print(f"\n📈 首次写入 x{original[0] / append_only[0]:.2f}，重复写入 x{original[1] / append_only[1]:.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
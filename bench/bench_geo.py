@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+空间查询基准: PostGIS GiST 索引 vs 扫描经纬度列
+在家附近 ±0.5° 范围内生成若干活动轨迹，对比"起点 2km 内"与"经过某公园"两类查询
+
+示例:
+    python bench/bench_geo.py --docker --activities 1000
+"""
+
+import argparse
+import logging
+import math
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import harness
+import synthetic
+
+NEAR_SQL_SCAN = """
+    SELECT activityid FROM garmin_activity
+    WHERE 2 * 6371008.8 * asin(sqrt(
+        power(sin(radians(startlat - %(lat)s) / 2), 2) +
+        cos(radians(%(lat)s)) * cos(radians(startlat)) * power(sin(radians(startlng - %(lng)s) / 2), 2)
+    )) <= %(radius)s
+"""
+
+REGION_SQL_SCAN = """
+    SELECT DISTINCT activityid FROM garmin_activity_detail
+    WHERE latitude BETWEEN %(y1)s AND %(y2)s AND longitude BETWEEN %(x1)s AND %(x2)s
+"""
+
+
+def load_activities(db, collector, count, step, seed=0):
+    """生成 count 个活动(每个平移到随机位置)，经采集器写库路径入库"""
+    rng = random.Random(seed)
+    today = date.today()
+    points_total = 0
+    for n in range(count):
+        day = today - timedelta(days=n + 1)
+        aid = synthetic.activity_id(day)
+        dlat, dlng = rng.uniform(-0.5, 0.5), rng.uniform(-0.5, 0.5)
+        item = synthetic.activity_list_item(day)
+        item["activityId"] = int(aid)
+        detail = synthetic.activity_detail(aid)
+        summary = detail["summaryDTO"]
+        for key in ("startLatitude", "endLatitude"):
+            summary[key] += dlat
+        for key in ("startLongitude", "endLongitude"):
+            summary[key] += dlng
+        db.upsert_activity(collector._parse_activity_summary(item, detail))
+        track = [{
+            "pointtime": datetime.fromtimestamp(ts / 1000, tz=timezone.utc),
+            "latitude": lat + dlat,
+            "longitude": lng + dlng,
+            "heartrate": hr,
+        } for ts, lat, lng, hr, *_ in synthetic._track(aid)[::step]]
+        db.batch_upsert_activity_details(aid, track)
+        db.upsert_activity_geom(aid)
+        points_total += len(track)
+    return points_total
+
+
+def timed(db, sql, params, repeat):
+    conn = db._get_conn()
+    best = math.inf
+    rows = None
+    with conn.cursor() as cur:
+        for _ in range(repeat):
+            t0 = time.monotonic()
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+            best = min(best, time.monotonic() - t0)
+        cur.execute("EXPLAIN " + sql, params)
+        plan = "\n".join(r[0] for r in cur.fetchall())
+    conn.commit()
+    return best, len(rows), plan
+
+
+def timed_helper(func, repeat):
+    best = math.inf
+    rows = None
+    for _ in range(repeat):
+        t0 = time.monotonic()
+        rows = func()
+        best = min(best, time.monotonic() - t0)
+    return best, len(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PostGIS 空间查询基准")
+    parser.add_argument("--dsn", help="一次性测试库 DSN(需 PostGIS，会清空 garmin_ 表)")
+    parser.add_argument("--docker", action="store_true", help="自动启动一次性 PostGIS 容器")
+    parser.add_argument("--activities", type=int, default=1000, help="活动数")
+    parser.add_argument("--step", type=int, default=3, help="轨迹点抽样间隔(秒)")
+    parser.add_argument("--repeat", type=int, default=5, help="每个查询重复次数，取最好成绩")
+    args = parser.parse_args(argv)
+
+    dsn = harness.resolve_dsn(args, image="postgis/postgis:16-3.4-alpine")
+    harness.write_config(dsn, {"postgis": {"enabled": True}})
+    harness.load_schema(dsn)
+    harness.load_schema(dsn, harness.POSTGIS_SCHEMA)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    from garmin_data_collector import GarminDataCollector
+    collector = GarminDataCollector()
+    db = collector.db
+    try:
+        t0 = time.monotonic()
+        points = load_activities(db, collector, args.activities, args.step)
+        print(f"⏱️ 写入 {args.activities} 个活动 / {points} 个轨迹点，耗时 {time.monotonic() - t0:.1f}s")
+        with db._get_conn().cursor() as cur:
+            cur.execute("ANALYZE garmin_activity; ANALYZE garmin_activity_detail; ANALYZE garmin_activity_geom")
+        db._get_conn().commit()
+
+        lat, lng, radius = synthetic.HOME_LAT, synthetic.HOME_LNG, 2000
+        # 约 1km 见方的"公园"
+        x1, y1 = lng + 0.1, lat + 0.1
+        bbox = (x1, y1, x1 + 0.01, y1 + 0.01)
+
+        print(f"\n{'查询':<24} {'耗时(ms)':>10} {'结果数':>8}  使用索引")
+        scan_near = timed(db, NEAR_SQL_SCAN, {"lat": lat, "lng": lng, "radius": radius}, args.repeat)
+        print(f"{'起点2km内 - 扫描':<22} {scan_near[0] * 1000:>10.1f} {scan_near[1]:>8}")
+        gis_near = timed_helper(lambda: db.find_activities_near(lat, lng, radius, limit=100000), args.repeat)
+        _, _, plan = timed(db, """
+            SELECT activityid FROM garmin_activity_geom
+            WHERE ST_DWithin(startpoint, ST_SetSRID(ST_MakePoint(%(lng)s, %(lat)s), 4326)::geography, %(radius)s)
+        """, {"lat": lat, "lng": lng, "radius": radius}, 1)
+        print(f"{'起点2km内 - PostGIS':<22} {gis_near[0] * 1000:>10.1f} {gis_near[1]:>8}  "
+              f"{'✅' if 'gist_activity_geom_startpoint' in plan else '❌'}")
+
+        params = dict(zip(("x1", "y1", "x2", "y2"), bbox))
+        scan_region = timed(db, REGION_SQL_SCAN, params, args.repeat)
+        print(f"{'经过公园 - 扫描轨迹点':<20} {scan_region[0] * 1000:>10.1f} {scan_region[1]:>8}")
+        gis_region = timed_helper(lambda: db.find_activities_through(bbox=bbox, limit=100000), args.repeat)
+        _, _, plan = timed(db, """
+            SELECT activityid FROM garmin_activity_geom
+            WHERE track && ST_MakeEnvelope(%(x1)s, %(y1)s, %(x2)s, %(y2)s, 4326)
+              AND ST_Intersects(track, ST_MakeEnvelope(%(x1)s, %(y1)s, %(x2)s, %(y2)s, 4326))
+        """, params, 1)
+        print(f"{'经过公园 - PostGIS':<22} {gis_region[0] * 1000:>10.1f} {gis_region[1]:>8}  "
+              f"{'✅' if 'gist_activity_geom_track' in plan else '❌'}")
+        print("\n注: 扫描轨迹点只能命中落在区域内的采样点，PostGIS 按线段相交判断，结果数可能略多")
+    finally:
+        collector.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
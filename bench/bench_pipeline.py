@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+数据库往返基准: psycopg2(逐条提交) vs psycopg 3 管道模式(database.driver: pipeline)
+经本地 TCP 代理为每个方向注入 rtt/2 延迟，模拟采集器与数据库不在同一主机，
+再经采集器写库路径(bench/dataset.py)写入相同天数的数据，比较耗时、提交次数与每行写入耗时
+
+示例:
+    python bench/bench_pipeline.py --docker --days 30 --rtt-ms 5
+"""
+
+import argparse
+import heapq
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import harness
+
+DRIVERS = ("psycopg2", "pipeline")
+
+
+class LatencyProxy:
+    """TCP 代理，每个方向按到达时间延迟 delay 秒后转发；上游 host 以 / 开头时连接 unix socket"""
+
+    def __init__(self, upstream_host, upstream_port, delay):
+        self.upstream = (upstream_host, int(upstream_port))
+        self.delay = delay
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen(16)
+        self.port = self._sock.getsockname()[1]
+
+    def start(self):
+        threading.Thread(target=self._accept, daemon=True).start()
+        return self
+
+    def _connect_upstream(self):
+        host, port = self.upstream
+        if host.startswith("/"):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(os.path.join(host, f".s.PGSQL.{port}"))
+        else:
+            sock = socket.create_connection((host, port))
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+
+    def _accept(self):
+        while True:
+            client, _ = self._sock.accept()
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            upstream = self._connect_upstream()
+            for src, dst in ((client, upstream), (upstream, client)):
+                threading.Thread(target=self._pipe, args=(src, dst), daemon=True).start()
+
+    def _pipe(self, src, dst):
+        """读取线程按 (到期时间, 数据) 入队，本线程到期发送；保持顺序且不阻塞后续读取"""
+        queue = []
+        seq = 0
+        cond = threading.Condition()
+        closed = []
+
+        def reader():
+            nonlocal seq
+            while True:
+                try:
+                    data = src.recv(65536)
+                except OSError:
+                    data = b""
+                with cond:
+                    if not data:
+                        closed.append(True)
+                    else:
+                        heapq.heappush(queue, (time.monotonic() + self.delay, seq, data))
+                        seq += 1
+                    cond.notify()
+                if not data:
+                    return
+
+        threading.Thread(target=reader, daemon=True).start()
+        while True:
+            with cond:
+                while not queue and not closed:
+                    cond.wait()
+                if not queue:
+                    break
+                due, _, data = queue[0]
+                wait = due - time.monotonic()
+                if wait > 0:
+                    cond.wait(wait)
+                    continue
+                heapq.heappop(queue)
+            try:
+                dst.sendall(data)
+            except OSError:
+                break
+        for sock in (src, dst):
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def run_driver(dsn, driver, days):
+    """子进程内运行(配置与模块状态互不影响)，返回 (总耗时, 写库耗时, 写入行数, 提交次数)"""
+    code = (
+        "import sys, json, logging, harness, dataset, metrics\n"
+        f"harness.write_config({dsn!r}, {{'database': {{'driver': {driver!r}}}}})\n"
+        "logging.getLogger().setLevel(logging.WARNING)\n"
+        f"dataset.DAYS_PER_YEAR = {days}\n"
+        f"stats = dataset.generate({dsn!r}, 1, 1)\n"
+        "now = metrics.snapshot()\n"
+        "print(json.dumps([stats['seconds'], now['dbseconds'], stats['rows_written'], now['dbcommits']]))\n"
+    )
+    bench_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([bench_dir, harness.SRC]))
+    out = subprocess.run([sys.executable, "-c", code], env=env, check=True,
+                         capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="数据库往返基准(psycopg2 vs 管道模式)")
+    parser.add_argument("--dsn", help="一次性测试库 DSN(会清空 garmin_ 表)")
+    parser.add_argument("--docker", action="store_true", help="自动启动一次性 PostgreSQL 容器")
+    parser.add_argument("--days", type=int, default=30, help="写入天数")
+    parser.add_argument("--rtt-ms", type=float, default=5.0, help="注入的网络往返延迟(毫秒)")
+    args = parser.parse_args(argv)
+
+    try:
+        import psycopg  # noqa: F401
+    except ImportError:
+        print('❌ 需要安装 psycopg 3: pip install "psycopg[binary]>=3.1"')
+        return 1
+    from psycopg2.extensions import make_dsn, parse_dsn
+
+    dsn = harness.resolve_dsn(args)
+    harness.load_schema(dsn)
+    params = parse_dsn(dsn)
+    proxy = LatencyProxy(params.get("host", "127.0.0.1"), params.get("port", 5432),
+                         args.rtt_ms / 2000).start()
+    params.update(host="127.0.0.1", port=str(proxy.port))
+    proxied = make_dsn(**params)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = {}
+    for driver in DRIVERS:
+        print(f"⏱️ {driver}: 写入 {args.days} 天 (rtt {args.rtt_ms}ms)...")
+        results[driver] = run_driver(proxied, driver, args.days)
+
+    # 总耗时含模拟佳明服务的请求，写库耗时为采集器记录的数据库写入耗时
+    print(f"\n{'驱动':<10} {'总耗时(s)':>10} {'写库耗时(s)':>12} {'写入行数':>10} {'提交次数':>9} {'写库微秒/行':>12}")
+    for driver, (seconds, db_seconds, rows, commits) in results.items():
+        print(f"{driver:<10} {seconds:>10.1f} {db_seconds:>12.2f} {rows:>10} {commits:>9.0f} "
+              f"{db_seconds * 1e6 / rows:>12.1f}")
+    base, piped = results["psycopg2"], results["pipeline"]
+    print(f"\n📈 管道模式: 总耗时 x{base[0] / piped[0]:.2f}，写库耗时 x{base[1] / piped[1]:.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
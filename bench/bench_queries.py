@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+数据库查询基准
+在合成多年数据集(bench/dataset.py)上测量代表性的看板与分析查询耗时，并报告各表/索引大小，
+用于以数字评估表结构与索引的改动
+
+看板查询直接调用查询服务使用的 GarminDatabase 方法，分析查询为典型的跨年聚合。
+
+示例:
+    python bench/bench_queries.py --docker --users 1 --years 10 --out queries_new.json --compare queries_old.json
+    # 复用已生成的数据(同一测试库上反复调整索引)
+    python bench/bench_queries.py --dsn "host=... dbname=bench" --skip-generate
+"""
+
+import argparse
+import json
+import logging
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+import harness
+import dataset
+
+ANALYTICS_SQL = {
+    "静息心率月均(全部)": """
+        SELECT date_trunc('month', hrdate), avg(restinghr) FROM garmin_heartrate GROUP BY 1 ORDER BY 1
+    """,
+    "活动距离年度汇总(全部)": """
+        SELECT extract(year FROM starttime), count(*), sum(distance), sum(duration)
+        FROM garmin_activity GROUP BY 1 ORDER BY 1
+    """,
+    "活动心率区间分布(1年)": """
+        SELECT width_bucket(d.heartrate, 100, 200, 5), count(*)
+        FROM garmin_activity a JOIN garmin_activity_detail d ON d.activityid = a.activityid
+        WHERE a.starttime >= %(year_start)s AND d.heartrate IS NOT NULL
+        GROUP BY 1 ORDER BY 1
+    """,
+    "压力等级分布(1年)": """
+        SELECT width_bucket(stresslevel, 0, 100, 4), count(*) FROM garmin_stress_detail
+        WHERE stressdate >= %(year_start)s AND stresslevel >= 0
+        GROUP BY 1 ORDER BY 1
+    """,
+    "睡眠阶段时长(1年)": """
+        SELECT activitylevel, sum(extract(epoch FROM endtime - starttime)) FROM garmin_sleep_detail
+        WHERE sleepdate >= %(year_start)s GROUP BY 1 ORDER BY 1
+    """,
+    "心率小时均值(1年)": """
+        SELECT extract(hour FROM pointhour), avg(avgvalue) FROM garmin_detail_hourly
+        WHERE datatype = 'heartrate' AND pointhour >= %(year_start)s GROUP BY 1 ORDER BY 1
+    """,
+}
+
+SIZE_SQL = """
+    SELECT c.relname, c.reltuples::bigint, pg_relation_size(c.oid), pg_indexes_size(c.oid),
+           pg_total_relation_size(c.oid)
+    FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.relkind = 'r' AND n.nspname = current_schema() AND c.relname LIKE 'garmin\\_%'
+    ORDER BY pg_total_relation_size(c.oid) DESC
+"""
+
+INDEX_SQL = """
+    SELECT relname, indexrelname, pg_relation_size(indexrelid), idx_scan
+    FROM pg_stat_user_indexes
+    WHERE relname LIKE 'garmin\\_%'
+    ORDER BY pg_relation_size(indexrelid) DESC
+"""
+
+
+def _count(result):
+    if isinstance(result, dict):
+        return sum(len(v) if isinstance(v, list) else 1 for v in result.values())
+    if result is None:
+        return 0
+    return len(result) if isinstance(result, (list, tuple)) else 1
+
+
+def dashboard_queries(db, today=None):
+    """看板查询 {名称: 调用}，日期取最近区间(第 1 个用户)"""
+    import gaps
+    yesterday = (today or date.today()) - timedelta(days=1)
+    days = lambda n: [(yesterday - timedelta(days=i)).isoformat() for i in range(n)]
+    recent = db._fetchall("""
+        SELECT activityid FROM garmin_activity ORDER BY starttime DESC NULLS LAST LIMIT 1
+    """)
+    aid = recent[0][0] if recent else None
+    return {
+        "每日汇总(30天)": lambda: db.daily_rollups(days(30)),
+        "心率明细(1天)": lambda: db.detail_series("heartrate", days(1)),
+        "心率明细(7天)": lambda: db.detail_series("heartrate", days(7)),
+        "压力小时汇总(30天)": lambda: db.hourly_series("stress", days(30)),
+        "活动列表(30天)": lambda: db.activities_on(days(30)),
+        "活动完整轨迹": lambda: db.activity_track(aid),
+        "活动轨迹LOD(zoom 14)": lambda: db.get_track_lod(aid, 14),
+        "训练负荷(90天)": lambda: db.recent_training_load(90),
+        "同步状态(30天)": lambda: db.sync_states("garmin", "heartrate", days(30)),
+        "覆盖率缺口(1年)": lambda: gaps.find_gaps(db, yesterday - timedelta(days=364), yesterday),
+    }
+
+
+def timed(func, repeat):
+    """返回 (最好, 中位数) 毫秒与结果行数；第一次执行预热不计"""
+    result = func()
+    samples = []
+    for _ in range(repeat):
+        t0 = time.monotonic()
+        result = func()
+        samples.append((time.monotonic() - t0) * 1000)
+    return min(samples), statistics.median(samples), _count(result)
+
+
+def run_queries(db, repeat):
+    results = {}
+    year_start = (date.today() - timedelta(days=365)).isoformat()
+    queries = [("看板", name, func) for name, func in dashboard_queries(db).items()]
+    queries += [("分析", name, lambda sql=sql: db._fetchall(sql, {"year_start": year_start}))
+                for name, sql in ANALYTICS_SQL.items()]
+    for category, name, func in queries:
+        best, median, rows = timed(func, repeat)
+        results[name] = {"category": category, "best_ms": round(best, 2),
+                         "median_ms": round(median, 2), "rows": rows}
+    return results
+
+
+def table_sizes(db):
+    tables = {}
+    for name, rows, heap, indexes, total in db._fetchall(SIZE_SQL):
+        tables[name] = {"rows": max(rows, 0), "heap_bytes": heap, "index_bytes": indexes, "total_bytes": total}
+    indexes = {}
+    for table, index, size, scans in db._fetchall(INDEX_SQL):
+        indexes[index] = {"table": table, "bytes": size, "scans": scans}
+    return tables, indexes
+
+
+def _mb(value):
+    return value / 1024 / 1024
+
+
+def print_results(queries, tables, indexes, baseline=None):
+    print(f"\n{'查询':<20} {'类别':<4} {'最好(ms)':>10} {'中位(ms)':>10} {'行数':>9}  对比基线")
+    for name, res in queries.items():
+        line = (f"{name:<20} {res['category']:<4} {res['best_ms']:>10.2f} {res['median_ms']:>10.2f} "
+                f"{res['rows']:>9}")
+        base = ((baseline or {}).get("queries") or {}).get(name)
+        if base and base.get("median_ms"):
+            ratio = res["median_ms"] / base["median_ms"]
+            line += f"  x{ratio:.2f} {'⚠️' if ratio > 1.1 else ''}"
+        print(line)
+
+    print(f"\n{'表':<28} {'行数':>12} {'表(MB)':>10} {'索引(MB)':>10} {'合计(MB)':>10} {'字节/行':>8}")
+    for name, t in tables.items():
+        per_row = t["total_bytes"] / t["rows"] if t["rows"] else 0
+        line = (f"{name:<28} {t['rows']:>12} {_mb(t['heap_bytes']):>10.1f} {_mb(t['index_bytes']):>10.1f} "
+                f"{_mb(t['total_bytes']):>10.1f} {per_row:>8.0f}")
+        base = ((baseline or {}).get("tables") or {}).get(name)
+        if base and base.get("total_bytes"):
+            line += f"  x{t['total_bytes'] / base['total_bytes']:.2f}"
+        print(line)
+
+    print(f"\n{'索引':<40} {'表':<28} {'大小(MB)':>10} {'扫描次数':>10}")
+    for name, idx in indexes.items():
+        if idx["bytes"] < 1024 * 1024:
+            continue
+        print(f"{name:<40} {idx['table']:<28} {_mb(idx['bytes']):>10.1f} {idx['scans']:>10}"
+              f"{'  (未使用)' if not idx['scans'] else ''}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="数据库查询基准(合成多年数据)")
+    parser.add_argument("--dsn", help="一次性测试库 DSN(会清空 garmin_ 表)")
+    parser.add_argument("--docker", action="store_true", help="自动启动一次性 PostgreSQL 容器")
+    parser.add_argument("--users", type=int, default=1, help="用户数(按时间错开)")
+    parser.add_argument("--years", type=int, default=10, help="每个用户的年数")
+    parser.add_argument("--skip-generate", action="store_true", help="不重新生成，直接使用库中已有数据")
+    parser.add_argument("--schema", nargs="+", default=[harness.SCHEMA],
+                        help="建表脚本，按顺序执行(评估表结构改动，如追加 script/detail_append_only.sql)")
+    parser.add_argument("--repeat", type=int, default=5, help="每个查询重复次数")
+    parser.add_argument("--out", help="结果输出 JSON")
+    parser.add_argument("--compare", help="基线结果 JSON")
+    args = parser.parse_args(argv)
+
+    dsn = harness.resolve_dsn(args)
+    harness.write_config(dsn)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    generated = None
+    if not args.skip_generate:
+        for schema in args.schema:
+            harness.load_schema(dsn, schema)
+        print(f"🧪 生成 {args.users} 个用户 x {args.years} 年...")
+        generated = dataset.generate(dsn, args.users, args.years)
+        print(f"✅ {generated['rows_written']} 行，耗时 {generated['seconds']}s")
+
+    import psycopg2
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        # 更新统计信息与可见性映射，使计划与索引只读扫描接近长期运行的库
+        cur.execute("VACUUM ANALYZE")
+    conn.close()
+
+    from database import GarminDatabase
+    db = GarminDatabase(readonly=True)
+    try:
+        queries = run_queries(db, args.repeat)
+        tables, indexes = table_sizes(db)
+    finally:
+        db.close()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_results(queries, tables, indexes, baseline)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({
+                "revision": harness.git_revision(),
+                "schema": args.schema,
+                "generated": generated,
+                "queries": queries,
+                "tables": tables,
+                "indexes": indexes,
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 结果已写入 {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
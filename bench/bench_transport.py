@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+HTTP 传输层基准
+经模拟佳明服务(按 Accept-Encoding 压缩，新连接模拟握手耗时)采集相同天数，对比:
+    garth_default  garth 默认适配器(每主机 10 连接、池满不等待)
+    identity       传输层连接池，不接受压缩
+    transport      传输层连接池，默认压缩格式(gzip/deflate，安装 brotli 后含 br)
+报告耗时、请求数、新建连接数，以及各接口线上/解压后字节数
+
+示例:
+    python bench/bench_transport.py --docker --days 30 --latency-ms 20 --handshake-ms 30
+    # 并发数超过 garth 默认的每主机 10 连接时，对比连接复用
+    python bench/bench_transport.py --docker --days 60 --concurrency 16
+"""
+
+import argparse
+import contextlib
+import io
+import logging
+import sys
+import time
+
+import harness
+from fake_garmin import FakeGarminServer, install
+
+MODES = ("garth_default", "identity", "transport")
+
+
+def _by_endpoint(metric):
+    return {key[0]: child.value for key, child in metric._children.items()}
+
+
+def run_mode(dsn, server, mode, days):
+    import garth
+    import metrics
+    from garmin_data_collector import GarminDataCollector
+
+    harness.reset_tables(dsn)
+    collector = GarminDataCollector()
+    if mode == "garth_default":
+        garth.client.configure(pool_connections=10, pool_maxsize=10)
+        garth.client.sess.headers["Accept-Encoding"] = "gzip, deflate"
+    elif mode == "identity":
+        collector.cfg = dict(collector.cfg, accept_encoding="identity")
+        collector.configure_transport()
+    install(garth.client, server.base_url)
+    collector._display_name = "bench-user"
+
+    wire0, decoded0 = _by_endpoint(metrics.API_BYTES), _by_endpoint(metrics.API_DECODED_BYTES)
+    requests0, connections0 = server.requests, server.connections
+    t0 = time.monotonic()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            collector.collect_all_data(days_back=days)
+    finally:
+        collector.cleanup()
+        garth.client.sess.close()
+    elapsed = time.monotonic() - t0
+    wire, decoded = _by_endpoint(metrics.API_BYTES), _by_endpoint(metrics.API_DECODED_BYTES)
+    return {
+        "seconds": round(elapsed, 2),
+        "requests": server.requests - requests0,
+        "connections": server.connections - connections0,
+        "endpoints": {ep: (wire[ep] - wire0.get(ep, 0), decoded.get(ep, 0) - decoded0.get(ep, 0))
+                      for ep in wire},
+    }
+
+
+def _kb(value):
+    return value / 1024
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP 传输层基准(连接复用、压缩)")
+    parser.add_argument("--dsn", help="一次性测试库 DSN(会清空 garmin_ 表)")
+    parser.add_argument("--docker", action="store_true", help="自动启动一次性 PostgreSQL 容器")
+    parser.add_argument("--days", type=int, default=30, help="采集天数")
+    parser.add_argument("--latency-ms", type=float, default=20, help="模拟接口延迟")
+    parser.add_argument("--handshake-ms", type=float, default=30, help="每个新连接的额外耗时(模拟 TCP/TLS 握手)")
+    parser.add_argument("--concurrency", type=int, help="覆盖各按日类型的并发请求数")
+    args = parser.parse_args(argv)
+
+    dsn = harness.resolve_dsn(args)
+    extra = None
+    if args.concurrency:
+        from data_types import DATA_TYPES
+        extra = {"data_types": {dt.dtype: {"max_concurrency": args.concurrency} for dt in DATA_TYPES}}
+    harness.write_config(dsn, extra)
+    harness.load_schema(dsn)
+    import garmin_data_collector  # noqa: F401  导入时配置日志，之后再调整级别
+    logging.getLogger().setLevel(logging.WARNING)
+
+    server = FakeGarminServer(latency_ms=args.latency_ms, handshake_ms=args.handshake_ms,
+                              days_back=args.days).start()
+    results = {}
+    try:
+        for mode in MODES:
+            print(f"⏱️ {mode}: 采集 {args.days} 天...")
+            results[mode] = run_mode(dsn, server, mode, args.days)
+    finally:
+        server.stop()
+
+    print(f"\n{'模式':<14} {'耗时(s)':>8} {'请求数':>7} {'新建连接':>8} {'线上(KB)':>10} {'解压后(KB)':>11}")
+    for mode, r in results.items():
+        wire = sum(w for w, _ in r["endpoints"].values())
+        decoded = sum(d for _, d in r["endpoints"].values())
+        print(f"{mode:<14} {r['seconds']:>8.2f} {r['requests']:>7} {r['connections']:>8} "
+              f"{_kb(wire):>10.0f} {_kb(decoded):>11.0f}")
+
+    print(f"\n{'接口':<20} " + " ".join(f"{m + '(KB)':>16}" for m in MODES) + f" {'压缩比':>7}")
+    endpoints = sorted(results["transport"]["endpoints"],
+                       key=lambda ep: -results["transport"]["endpoints"][ep][1])
+    for ep in endpoints:
+        cols = " ".join(f"{_kb(results[m]['endpoints'].get(ep, (0, 0))[0]):>16.1f}" for m in MODES)
+        wire, decoded = results["transport"]["endpoints"][ep]
+        print(f"{ep:<20} {cols} {decoded / wire if wire else 0:>7.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
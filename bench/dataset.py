@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+合成多年数据集
+经模拟佳明服务 + 采集器自身的写库路径(按日类型调度、活动批量登记、轨迹/LOD/训练负荷、每日汇总)
+填充 N 个用户 x 若干年的数据: 2 分钟心率/呼吸、3 分钟压力、睡眠阶段、血氧、HRV、隔天一次 1Hz GPS 活动
+
+表结构为单用户(按日期唯一)，多用户按时间错开: 第 k 个用户占据 [今天 - (k+1)*年数, 今天 - k*年数) 区间，
+总数据量为 N x 年数，最近区间的看板查询面对的是 N 倍规模的表。
+
+示例:
+    python bench/dataset.py --docker --users 1 --years 10
+"""
+
+import argparse
+import contextlib
+import io
+import logging
+import sys
+import time
+from datetime import date, timedelta
+
+import harness
+import synthetic
+from fake_garmin import FakeGarminServer, install
+
+DAYS_PER_YEAR = 365
+
+
+def user_range(user, years, today=None):
+    """第 user 个用户的日期区间 [start, end]"""
+    today = today or date.today()
+    end = today - timedelta(days=user * years * DAYS_PER_YEAR + 1)
+    return end - timedelta(days=years * DAYS_PER_YEAR - 1), end
+
+
+def generate(dsn, users=1, years=10, chunk_days=30, reset=True, verbose=False):
+    """按时间顺序逐段写入全部用户的数据，返回统计"""
+    import garth
+    import metrics
+    from garmin_data_collector import GarminDataCollector
+
+    if reset:
+        harness.reset_tables(dsn)
+    server = FakeGarminServer().start()
+    collector = GarminDataCollector()
+    install(garth.client, server.base_url)
+    collector._display_name = "bench-user"
+    base = metrics.snapshot()
+    total_days = users * years * DAYS_PER_YEAR
+    activities = 0
+    t0 = time.monotonic()
+    try:
+        # 从最早的用户、最早的日期开始，训练负荷每段只需向后递推
+        for user in reversed(range(users)):
+            start, end = user_range(user, years)
+            day = start
+            while day <= end:
+                last = min(day + timedelta(days=chunk_days - 1), end)
+                # 与采集时一致，新日期在前
+                days = [last - timedelta(days=i) for i in range((last - day).days + 1)]
+                dates = [d.isoformat() for d in days]
+                items = [synthetic.activity_list_item(d) for d in days
+                         if d.toordinal() % synthetic.ACTIVITY_EVERY_DAYS == 0]
+                out = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+                with out:
+                    collector._save_activities(items)
+                    for dt in collector.daily_types():
+                        collector.collect_daily(dt, dates)
+                    collector.refresh_rollups()
+                activities += len(items)
+                day = last + timedelta(days=1)
+            print(f"  👤 用户 {users - user}/{users}: {start} ~ {end} 已写入 ({time.monotonic() - t0:.0f}s)")
+    finally:
+        collector.cleanup()
+        server.stop()
+    elapsed = time.monotonic() - t0
+    now = metrics.snapshot()
+    rows = int(now["rowswritten"] - base["rowswritten"])
+    return {
+        "users": users,
+        "years": years,
+        "days": total_days,
+        "activities": activities,
+        "seconds": round(elapsed, 1),
+        "rows_written": rows,
+        "rows_per_second": round(rows / elapsed, 1),
+        "requests": server.requests,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="合成多年数据集(经采集器写库路径)")
+    parser.add_argument("--dsn", help="一次性测试库 DSN(会清空 garmin_ 表)")
+    parser.add_argument("--docker", action="store_true", help="自动启动一次性 PostgreSQL 容器")
+    parser.add_argument("--users", type=int, default=1, help="用户数(按时间错开)")
+    parser.add_argument("--years", type=int, default=10, help="每个用户的年数")
+    parser.add_argument("--chunk-days", type=int, default=30, help="每段写入天数")
+    parser.add_argument("--verbose", action="store_true", help="显示采集器输出")
+    args = parser.parse_args(argv)
+
+    dsn = harness.resolve_dsn(args)
+    harness.write_config(dsn)
+    harness.load_schema(dsn)
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    print(f"🧪 生成 {args.users} 个用户 x {args.years} 年...")
+    stats = generate(dsn, args.users, args.years, args.chunk_days, verbose=args.verbose)
+    print(f"✅ {stats['days']} 天 / {stats['activities']} 个活动 / {stats['rows_written']} 行，"
+          f"耗时 {stats['seconds']}s ({stats['rows_per_second']:.0f} 行/秒)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+本地模拟佳明 Connect 服务
+覆盖采集器用到的全部接口，返回录制的 fixture 或合成数据，可配置延迟与错误率；
+按请求的 Accept-Encoding 压缩响应(gzip，安装 brotli 后支持 br)，新连接可模拟握手耗时
+
+独立运行:
+    python bench/fake_garmin.py --port 18080 --latency-ms 50 --error-rate 0.01
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit, urlunsplit
+
+import synthetic
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 小于该字节数的响应不压缩
+COMPRESS_MIN_BYTES = 1024
+
+# (路由名, 路径正则)
+ROUTES = [
+    ("user_settings", re.compile(r"^/userprofile-service/userprofile/user-settings$")),
+    ("activities", re.compile(r"^/activitylist-service/activities/search/activities$")),
+    ("activity_polyline", re.compile(r"^/activity-service/activity/(?P<aid>\d+)/polyline/full-resolution/?$")),
+    ("activity_track", re.compile(r"^/activity-service/activity/(?P<aid>\d+)/details$")),
+    ("activity_detail", re.compile(r"^/activity-service/activity/(?P<aid>\d+)$")),
+    ("heartrate", re.compile(r"^/wellness-service/wellness/dailyHeartRate$")),
+    ("sleep", re.compile(r"^/wellness-service/wellness/dailySleepData/[^/]+$")),
+    ("stress", re.compile(r"^/wellness-service/wellness/dailyStress/(?P<date>[\d-]+)$")),
+    ("spo2", re.compile(r"^/wellness-service/wellness/daily/spo2/(?P<date>[\d-]+)$")),
+    ("respiration", re.compile(r"^/wellness-service/wellness/daily/respiration/(?P<date>[\d-]+)$")),
+    ("hrv", re.compile(r"^/hrv-service/hrv/(?P<date>[\d-]+)$")),
+    ("hrv_range", re.compile(r"^/hrv-service/hrv/daily/(?P<start>[\d-]+)/(?P<end>[\d-]+)$")),
+]
+
+
+class FakeGarminServer:
+    """模拟佳明服务
+
+    fixtures_dir 下按 `<路由名>/<日期或活动id>.json` 存放录制数据，存在则优先返回，否则合成
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=0, jitter_ms=0,
+                 error_rate=0.0, fixtures_dir=None, days_back=3650, seed=0,
+                 handshake_ms=0, compress=True):
+        self.latency_ms = latency_ms
+        # 每个新连接的额外耗时(模拟 TCP/TLS 握手)
+        self.handshake_ms = handshake_ms
+        self.compress = compress
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.fixtures_dir = fixtures_dir
+        # 活动列表覆盖的天数(今天之前)
+        self.days_back = days_back
+        self.today = date.today()
+        self.requests = 0
+        self.errors = 0
+        self.connections = 0
+        # 线上字节数(压缩后)与压缩前字节数
+        self.bytes_sent = 0
+        self.bytes_raw = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-garmin", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    # ==================== 响应生成 ====================
+
+    def _fixture(self, route, key):
+        if not self.fixtures_dir or key is None:
+            return None
+        path = os.path.join(self.fixtures_dir, route, f"{key}.json")
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                return f.read()
+        return None
+
+    def respond(self, path, query):
+        """返回 (状态码, 响应体bytes)"""
+        for route, pattern in ROUTES:
+            m = pattern.match(path)
+            if m:
+                break
+        else:
+            return 404, b'{"message": "not found"}'
+
+        groups = m.groupdict()
+        key = groups.get("aid") or groups.get("date") or (query.get("date") or [None])[0]
+        body = self._fixture(route, key)
+        if body is not None:
+            return 200, body
+
+        if route == "user_settings":
+            data = {"userData": {"displayName": "bench-user"}}
+        elif route == "activities":
+            start = int((query.get("start") or ["0"])[0])
+            limit = int((query.get("limit") or ["20"])[0])
+            data = synthetic.activity_list(self.today, self.days_back, start, limit)
+        elif route == "activity_detail":
+            data = synthetic.activity_detail(key)
+        elif route == "activity_polyline":
+            data = synthetic.activity_polyline(key)
+        elif route == "activity_track":
+            data = synthetic.activity_track(key)
+        elif route == "heartrate":
+            data = synthetic.heart_rate(key)
+        elif route == "sleep":
+            data = synthetic.sleep(key)
+        elif route == "stress":
+            data = synthetic.stress(key)
+        elif route == "spo2":
+            data = synthetic.spo2(key)
+        elif route == "respiration":
+            data = synthetic.respiration(key)
+        elif route == "hrv_range":
+            start, end = date.fromisoformat(groups["start"]), date.fromisoformat(groups["end"])
+            data = {"hrvSummaries": [synthetic.hrv(start + timedelta(days=i))["hrvSummary"]
+                                     for i in range((end - start).days + 1)]}
+        else:
+            data = synthetic.hrv(key)
+        return 200, json.dumps(data, separators=(",", ":")).encode()
+
+    def encode(self, body, accept_encoding):
+        """按 Accept-Encoding 压缩，返回 (响应体, Content-Encoding 或 None)"""
+        if not self.compress or len(body) < COMPRESS_MIN_BYTES:
+            return body, None
+        accepted = {e.split(";")[0].strip() for e in (accept_encoding or "").split(",")}
+        if "br" in accepted and brotli is not None:
+            return brotli.compress(body, quality=5), "br"
+        if "gzip" in accepted:
+            return gzip.compress(body, compresslevel=6), "gzip"
+        return body, None
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+                if server.handshake_ms:
+                    time.sleep(server.handshake_ms / 1000)
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                with server._lock:
+                    server.requests += 1
+                    delay = server.latency_ms + server._rng.uniform(0, server.jitter_ms)
+                    fail = server._rng.random() < server.error_rate
+                if delay:
+                    time.sleep(delay / 1000)
+                if fail:
+                    with server._lock:
+                        server.errors += 1
+                    status, body = 503, b'{"message": "injected error"}'
+                else:
+                    status, body = server.respond(parts.path, parse_qs(parts.query))
+                raw_bytes = len(body)
+                body, encoding = server.encode(body, self.headers.get("Accept-Encoding"))
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                if encoding:
+                    self.send_header("Content-Encoding", encoding)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                with server._lock:
+                    server.bytes_sent += len(body)
+                    server.bytes_raw += raw_bytes
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+# ==================== garth 客户端接入 ====================
+
+def install(client, base_url):
+    """将 garth 客户端的请求重定向到模拟服务，并注入不过期的假令牌
+
+    重定向包装会话当时挂载的适配器(采集器的传输层连接池)，连接池、重试与套接字选项保持不变；
+    之后 garth 恢复会话或传输层重新挂载适配器时同样生效。
+    """
+    from requests.adapters import BaseAdapter
+    from garth.auth_tokens import OAuth1Token, OAuth2Token
+
+    target = urlsplit(base_url)
+
+    class RedirectAdapter(BaseAdapter):
+        def __init__(self, inner):
+            super().__init__()
+            self.inner = inner
+
+        def send(self, request, **kwargs):
+            parts = urlsplit(request.url)
+            request.url = urlunsplit((target.scheme, target.netloc, parts.path, parts.query, ""))
+            return self.inner.send(request, **kwargs)
+
+        def close(self):
+            self.inner.close()
+
+    sess = client.sess
+    # 按原始 https 地址选择适配器
+    sess.get_adapter = lambda url, _get=type(sess).get_adapter: RedirectAdapter(_get(sess, url))
+
+    far = int(time.time()) + 10 * 365 * 86400
+    client.oauth1_token = OAuth1Token(oauth_token="bench", oauth_token_secret="bench")
+    client.oauth2_token = OAuth2Token(
+        scope="bench", jti="bench", token_type="Bearer", access_token="bench", refresh_token="bench",
+        expires_in=far, expires_at=far, refresh_token_expires_in=far, refresh_token_expires_at=far,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="模拟佳明 Connect 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--handshake-ms", type=float, default=0, help="每个新连接的额外耗时(模拟 TCP/TLS 握手)")
+    parser.add_argument("--no-compress", action="store_true", help="不压缩响应")
+    parser.add_argument("--fixtures", help="录制数据目录")
+    parser.add_argument("--days-back", type=int, default=3650, help="活动列表覆盖天数")
+    args = parser.parse_args(argv)
+
+    server = FakeGarminServer(args.host, args.port, args.latency_ms, args.jitter_ms,
+                              args.error_rate, args.fixtures, args.days_back,
+                              handshake_ms=args.handshake_ms, compress=not args.no_compress).start()
+    print(f"🧪 模拟佳明服务: {server.base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+基准测试公共环境
+临时配置文件、一次性本地 PostgreSQL、建表与清空数据
+"""
+
+import atexit
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, "src")
+SCHEMA = os.path.join(ROOT, "script", "datastruct.sql")
+POSTGIS_SCHEMA = os.path.join(ROOT, "script", "postgis.sql")
+
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+DOCKER_NAME = "garminwong-bench-pg"
+DOCKER_PORT = 55432
+
+
+def start_docker_postgres(image="postgres:16-alpine", port=DOCKER_PORT):
+    """启动一次性 PostgreSQL 容器，进程退出时自动删除，返回 DSN"""
+    subprocess.run(["docker", "rm", "-f", DOCKER_NAME], capture_output=True)
+    subprocess.run([
+        "docker", "run", "-d", "--rm", "--name", DOCKER_NAME,
+        "-e", "POSTGRES_PASSWORD=bench", "-e", "POSTGRES_DB=bench",
+        "-p", f"{port}:5432", image,
+    ], check=True, capture_output=True)
+    atexit.register(lambda: subprocess.run(["docker", "rm", "-f", DOCKER_NAME], capture_output=True))
+    dsn = f"host=127.0.0.1 port={port} dbname=bench user=postgres password=bench"
+    _wait_ready(dsn)
+    return dsn
+
+
+def _wait_ready(dsn, timeout=60):
+    import psycopg2
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            psycopg2.connect(dsn).close()
+            return
+        except psycopg2.OperationalError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.5)
+
+
+def write_config(dsn, extra=None):
+    """按 DSN 生成临时 config.yml 并通过 CONFIG_PATH 生效(须在首次读取配置前调用)"""
+    import yaml
+    from psycopg2.extensions import parse_dsn
+
+    params = parse_dsn(dsn)
+    workdir = tempfile.mkdtemp(prefix="garminwong-bench-")
+    atexit.register(shutil.rmtree, workdir, True)
+    cfg = {
+        "database": {
+            "host": params.get("host", "127.0.0.1"),
+            "port": int(params.get("port", 5432)),
+            "db": params.get("dbname"),
+            "user": params.get("user"),
+            "password": params.get("password"),
+        },
+        "garmin": {
+            "email": "bench@example.com",
+            "password": "bench",
+            "domain": "garmin.cn",
+            "save_path": os.path.join(workdir, "session"),
+        },
+    }
+    for key, value in (extra or {}).items():
+        cfg.setdefault(key, {}).update(value)
+    path = os.path.join(workdir, "config.yml")
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(cfg, f, allow_unicode=True)
+    os.environ["CONFIG_PATH"] = path
+    return path
+
+
+def load_schema(dsn, schema_path=SCHEMA):
+    """执行建表脚本，去掉依赖生产角色的 owner/role 语句"""
+    import psycopg2
+
+    with open(schema_path, "r", encoding="utf-8") as f:
+        sql = f.read()
+    sql = "\n".join(line for line in sql.splitlines()
+                    if not re.match(r"^\s*alter role\b", line, re.I)
+                    and not re.search(r"\bowner to\b", line, re.I))
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(sql)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def reset_tables(dsn):
+    """清空全部 garmin_ 表"""
+    import psycopg2
+
+    conn = psycopg2.connect(dsn)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT tablename FROM pg_tables
+                WHERE schemaname = current_schema() AND tablename LIKE 'garmin\\_%'
+            """)
+            tables = [r[0] for r in cur.fetchall()]
+            if tables:
+                cur.execute(f"TRUNCATE {', '.join(tables)} RESTART IDENTITY")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def resolve_dsn(args, image="postgres:16-alpine"):
+    """--docker 启动一次性容器；否则使用 --dsn 或环境变量 BENCH_DSN"""
+    if getattr(args, "docker", False):
+        return start_docker_postgres(image=image)
+    dsn = getattr(args, "dsn", None) or os.getenv("BENCH_DSN")
+    if not dsn:
+        raise SystemExit("请通过 --dsn / BENCH_DSN 指定一次性测试库，或使用 --docker 自动启动")
+    return dsn
+
+
+def git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except Exception:
+        return None
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+合成佳明接口响应
+按日期/活动id 确定性生成各接口的返回结构，与 garth 实际返回字段保持一致
+"""
+
+import math
+import random
+import zlib
+from datetime import date, datetime, timedelta, timezone
+
+DAY_MS = 86400 * 1000
+# 合成活动: 每 ACTIVITY_EVERY_DAYS 天一次，每次 ACTIVITY_SECONDS 秒，1Hz 轨迹
+ACTIVITY_EVERY_DAYS = 2
+ACTIVITY_SECONDS = 2700
+ACTIVITY_ID_BASE = 10_000_000_000
+# 默认轨迹起点(上海)
+HOME_LAT = 31.2304
+HOME_LNG = 121.4737
+
+
+def _rng(*key):
+    return random.Random(zlib.crc32(repr(key).encode()))
+
+
+def _day_start_ms(day):
+    if isinstance(day, str):
+        day = date.fromisoformat(day)
+    return int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def _series(day, step_seconds, value_func, seed):
+    """一天内等间隔时序 [[ts_ms, value], ...]"""
+    rng = _rng(seed, str(day))
+    start = _day_start_ms(day)
+    n = 86400 // step_seconds
+    return [[start + i * step_seconds * 1000, value_func(i / n, rng)] for i in range(n)]
+
+
+# ==================== 按日健康数据 ====================
+
+def heart_rate(day, step_seconds=120):
+    values = _series(day, step_seconds, lambda f, r: int(55 + 25 * math.sin(math.pi * f) + r.randint(-5, 5)), "hr")
+    hrs = [v for _, v in values]
+    return {
+        "calendarDate": str(day),
+        "restingHeartRate": min(hrs) + 3,
+        "maxHeartRate": max(hrs),
+        "minHeartRate": min(hrs),
+        "heartRateValues": values,
+    }
+
+
+def stress(day, step_seconds=180):
+    def level(f, r):
+        v = int(20 + 40 * math.sin(math.pi * f) ** 2 + r.randint(-15, 15))
+        # 少量 -1(未佩戴) / -2(运动中)
+        return r.choice((-1, -2)) if r.random() < 0.03 else max(v, 0)
+
+    values = _series(day, step_seconds, level, "stress")
+    valid = [v for _, v in values if v >= 0]
+    return {
+        "calendarDate": str(day),
+        "avgStressLevel": sum(valid) // max(len(valid), 1),
+        "maxStressLevel": max(valid, default=0),
+        "stressValuesArray": values,
+    }
+
+
+def respiration(day, step_seconds=120):
+    values = _series(day, step_seconds, lambda f, r: round(13 + 3 * math.sin(math.pi * f) + r.random(), 1), "resp")
+    resp = [v for _, v in values]
+    return {
+        "calendarDate": str(day),
+        "avgWakingRespirationValue": round(sum(resp) / len(resp), 1),
+        "avgSleepRespirationValue": round(min(resp) + 1, 1),
+        "highestRespirationValue": max(resp),
+        "lowestRespirationValue": min(resp),
+        "respirationValuesArray": values,
+    }
+
+
+def spo2(day):
+    hourly = _series(day, 3600, lambda f, r: r.randint(92, 99), "spo2")
+    values = [v for _, v in hourly]
+    return {
+        "calendarDate": str(day),
+        "averageSpO2": round(sum(values) / len(values), 1),
+        "lowestSpO2": min(values),
+        "latestSpO2": values[-1],
+        "lastSevenDaysAvgSpO2": 96.0,
+        "spO2HourlyAverages": hourly,
+        "continuousReadingDTOList": [],
+    }
+
+
+def sleep(day):
+    rng = _rng("sleep", str(day))
+    start = _day_start_ms(day) - 2 * 3600 * 1000
+    levels = []
+    t = start
+    for _ in range(rng.randint(16, 28)):
+        length = rng.randint(10, 40) * 60 * 1000
+        levels.append({
+            "startGMT": datetime.fromtimestamp(t / 1000, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.0"),
+            "endGMT": datetime.fromtimestamp((t + length) / 1000, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.0"),
+            "activityLevel": float(rng.randint(0, 3)),
+        })
+        t += length
+    total = (t - start) // 1000
+    return {
+        "dailySleepDTO": {
+            "calendarDate": str(day),
+            "sleepTimeSeconds": total,
+            "sleepStartTimestampGMT": start,
+            "sleepEndTimestampGMT": t,
+            "deepSleepSeconds": total // 5,
+            "lightSleepSeconds": total // 2,
+            "remSleepSeconds": total // 5,
+            "awakeSleepSeconds": total // 10,
+            "awakeCount": rng.randint(0, 4),
+            "averageSpO2Value": 95.0,
+            "lowestSpO2Value": 90.0,
+            "highestSpO2Value": 99.0,
+            "averageRespirationValue": 14.0,
+            "sleepScores": {"overall": {"value": rng.randint(50, 95), "qualifierKey": "GOOD"}},
+        },
+        "sleepLevels": levels,
+    }
+
+
+def hrv(day):
+    rng = _rng("hrv", str(day))
+    return {
+        "hrvSummary": {
+            "calendarDate": str(day),
+            "weeklyAvg": rng.randint(40, 60),
+            "lastNightAvg": rng.randint(35, 70),
+            "lastNight5MinHigh": rng.randint(70, 100),
+            "status": "BALANCED",
+            "baseline": {"lowUpper": 38, "balancedLow": 42, "balancedUpper": 58},
+        },
+    }
+
+
+# ==================== 活动 ====================
+
+def activity_days(today, days_back):
+    """回溯范围内有活动的日期(倒序)"""
+    return [today - timedelta(days=i) for i in range(1, days_back + 1)
+            if (today - timedelta(days=i)).toordinal() % ACTIVITY_EVERY_DAYS == 0]
+
+
+def activity_id(day):
+    return str(ACTIVITY_ID_BASE + day.toordinal())
+
+
+def activity_day(activity_id_value):
+    return date.fromordinal(int(activity_id_value) - ACTIVITY_ID_BASE)
+
+
+def activity_list_item(day):
+    begin = _day_start_ms(day) + 7 * 3600 * 1000
+    return {
+        "activityId": int(activity_id(day)),
+        "activityName": f"合成跑步 {day}",
+        "activityType": {"typeKey": "running"},
+        "startTimeLocal": datetime.fromtimestamp(begin / 1000).strftime("%Y-%m-%d %H:%M:%S"),
+        "endTimeGMT": datetime.fromtimestamp(begin / 1000 + ACTIVITY_SECONDS, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        "beginTimestamp": begin,
+        "duration": float(ACTIVITY_SECONDS),
+        "distance": 8000.0,
+        "calories": 520,
+        "averageHR": 148,
+        "maxHR": 176,
+        "averageSpeed": 2.96,
+        "maxSpeed": 4.1,
+        "aerobicTrainingEffect": 3.2,
+        "anaerobicTrainingEffect": 1.1,
+        "hasPolyline": True,
+    }
+
+
+def activity_list(today, days_back, start, limit):
+    days = activity_days(today, days_back)
+    return [activity_list_item(d) for d in days[start:start + limit]]
+
+
+def activity_detail(activity_id_value):
+    day = activity_day(activity_id_value)
+    begin = _day_start_ms(day) + 7 * 3600 * 1000
+    return {
+        "activityId": int(activity_id_value),
+        "summaryDTO": {
+            "startTimeGMT": datetime.fromtimestamp(begin / 1000, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.0"),
+            "duration": float(ACTIVITY_SECONDS),
+            "distance": 8000.0,
+            "calories": 520,
+            "averageHR": 148,
+            "maxHR": 176,
+            "elevationGain": 42.0,
+            "elevationLoss": 41.0,
+            "startLatitude": HOME_LAT,
+            "startLongitude": HOME_LNG,
+            "endLatitude": HOME_LAT,
+            "endLongitude": HOME_LNG,
+        },
+    }
+
+
+def _track(activity_id_value):
+    """绕圈轨迹 [(ts_ms, lat, lng, hr, ele, speed, dist), ...]"""
+    day = activity_day(activity_id_value)
+    rng = _rng("track", str(activity_id_value))
+    begin = _day_start_ms(day) + 7 * 3600 * 1000
+    radius = 0.01
+    points = []
+    for i in range(ACTIVITY_SECONDS):
+        angle = 2 * math.pi * i / ACTIVITY_SECONDS
+        points.append((
+            begin + i * 1000,
+            HOME_LAT + radius * math.sin(angle) + rng.uniform(-1e-5, 1e-5),
+            HOME_LNG + radius * (1 - math.cos(angle)) + rng.uniform(-1e-5, 1e-5),
+            120 + int(50 * i / ACTIVITY_SECONDS) + rng.randint(-3, 3),
+            10.0 + 5 * math.sin(angle),
+            2.96 + rng.uniform(-0.2, 0.2),
+            8000.0 * i / ACTIVITY_SECONDS,
+        ))
+    return points
+
+
+def activity_polyline(activity_id_value):
+    return {"polyline": [[ts, lat, lng] for ts, lat, lng, *_ in _track(activity_id_value)]}
+
+
+def activity_track(activity_id_value):
+    keys = ["directTimestamp", "directLatitude", "directLongitude", "directHeartRate",
+            "directElevation", "directSpeed", "sumDistance"]
+    return {
+        "metricDescriptors": [{"key": k, "metricsIndex": i} for i, k in enumerate(keys)],
+        "activityDetailMetrics": [{"metrics": list(p)} for p in _track(activity_id_value)],
+    }
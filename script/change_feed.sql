@@ -0,0 +1,35 @@
+-- 佳明变更通知 outbox(可选)
+-- 在 datastruct.sql 之后执行(需 PostgreSQL 13+)，并在配置中开启 change_feed.enabled
+-- 采集器在写入数据的同一事务内写入本表并 pg_notify(channel, 事件 JSON)，事务提交后通知才会送达
+
+-- =============================================
+-- 佳明_变更事件表（每个已提交的写入单元一条）
+-- =============================================
+drop table if exists garmin_change_outbox cascade;
+create table garmin_change_outbox (
+  id bigserial,
+  datasource varchar(20) not null,
+  datatype varchar(50) not null,
+  dates date[],
+  activityids varchar(50)[],
+  rowcount int not null default 0,
+  xid xid8 not null default pg_current_xact_id(),
+  createdat timestamptz default current_timestamp
+);
+
+alter table garmin_change_outbox owner to user_eadm;
+alter table garmin_change_outbox drop constraint if exists pk_change_outbox_id cascade;
+alter table garmin_change_outbox add constraint pk_change_outbox_id primary key (id);
+
+drop index if exists non_change_outbox_createdat;
+create index non_change_outbox_createdat on garmin_change_outbox using btree (createdat asc);
+
+comment on column garmin_change_outbox.id is '自增主键(消费方据此记录已处理位置)';
+comment on column garmin_change_outbox.datasource is '数据来源(garmin/polar/coros)';
+comment on column garmin_change_outbox.datatype is '数据类型(heartrate/sleep/activity/activity_detail/daily_rollup等)';
+comment on column garmin_change_outbox.dates is '变更的数据日期';
+comment on column garmin_change_outbox.activityids is '变更的活动id';
+comment on column garmin_change_outbox.rowcount is '写入行数(不含同步记录)';
+comment on column garmin_change_outbox.xid is '写入事务id(只读取早于最早进行中事务的事件，按 id 顺序消费不遗漏)';
+comment on column garmin_change_outbox.createdat is '创建时间';
+comment on table garmin_change_outbox is '佳明_变更事件表(outbox)';
@@ -662,7 +662,7 @@ comment on column garmin_sync.datasource is '数据来源(garmin/polar/coros)';
 comment on column garmin_sync.datatype is '数据类型(activity/sleep/heartrate/stress/spo2/respiration/hrv)';
 comment on column garmin_sync.datadate is '数据日期';
 comment on column garmin_sync.dataid is '数据唯一标识(如activityid)';
-comment on column garmin_sync.syncstatus is '同步状态(1成功0失败)';
+comment on column garmin_sync.syncstatus is '同步状态(1成功0失败2确认无数据)';
 comment on column garmin_sync.errmessage is '错误信息';
 comment on column garmin_sync.createdat is '创建时间';
 comment on column garmin_sync.updatedat is '更新时间';
@@ -672,4 +672,383 @@ drop trigger if exists sync_lastupdate on garmin_sync cascade;
 create or replace trigger sync_lastupdate
 before update on garmin_sync
 for each row
-execute function lastupdate();
\ No newline at end of file
+execute function lastupdate();
+
+-- =============================================
+-- 佳明_明细小时汇总表（归档后保留的小时级统计）
+-- =============================================
+drop table if exists garmin_detail_hourly cascade;
+create table garmin_detail_hourly (
+  id serial,
+  datatype varchar(50) not null,
+  pointhour timestamptz not null,
+  samples int not null,
+  minvalue numeric(8,2),
+  avgvalue numeric(8,2),
+  maxvalue numeric(8,2),
+  createdat timestamptz default current_timestamp,
+  updatedat timestamptz default current_timestamp
+);
+
+alter table garmin_detail_hourly owner to user_eadm;
+alter table garmin_detail_hourly drop constraint if exists pk_detail_hourly_id cascade;
+alter table garmin_detail_hourly add constraint pk_detail_hourly_id primary key (id);
+alter table garmin_detail_hourly drop constraint if exists uni_detail_hourly_point cascade;
+alter table garmin_detail_hourly add constraint uni_detail_hourly_point unique (datatype, pointhour);
+
+comment on column garmin_detail_hourly.id is '自增主键';
+comment on column garmin_detail_hourly.datatype is '数据类型(heartrate/stress/respiration/spo2)';
+comment on column garmin_detail_hourly.pointhour is '小时';
+comment on column garmin_detail_hourly.samples is '采样点数';
+comment on column garmin_detail_hourly.minvalue is '最小值';
+comment on column garmin_detail_hourly.avgvalue is '平均值';
+comment on column garmin_detail_hourly.maxvalue is '最大值';
+comment on column garmin_detail_hourly.createdat is '创建时间';
+comment on column garmin_detail_hourly.updatedat is '更新时间';
+comment on table garmin_detail_hourly is '佳明_明细小时汇总表';
+
+drop trigger if exists detail_hourly_lastupdate on garmin_detail_hourly cascade;
+create or replace trigger detail_hourly_lastupdate
+before update on garmin_detail_hourly
+for each row
+execute function lastupdate();
+
+-- =============================================
+-- 明细归档记录表（冷归档清单，恢复时使用）
+-- =============================================
+drop table if exists garmin_archive cascade;
+create table garmin_archive (
+  id serial,
+  tablename varchar(50) not null,
+  archivemonth date not null,
+  archivemode varchar(20) not null,
+  filepath varchar(500),
+  rowcount int not null default 0,
+  status smallint not null default 1,
+  createdat timestamptz default current_timestamp,
+  updatedat timestamptz default current_timestamp
+);
+
+alter table garmin_archive owner to user_eadm;
+alter table garmin_archive drop constraint if exists pk_archive_id cascade;
+alter table garmin_archive add constraint pk_archive_id primary key (id);
+alter table garmin_archive drop constraint if exists uni_archive_table_month cascade;
+alter table garmin_archive add constraint uni_archive_table_month unique (tablename, archivemonth);
+
+comment on column garmin_archive.id is '自增主键';
+comment on column garmin_archive.tablename is '明细表名';
+comment on column garmin_archive.archivemonth is '归档月份(月初)';
+comment on column garmin_archive.archivemode is '归档模式(file文件/summary仅小时汇总)';
+comment on column garmin_archive.filepath is '归档文件路径';
+comment on column garmin_archive.rowcount is '归档行数';
+comment on column garmin_archive.status is '状态(1已归档2已恢复)';
+comment on column garmin_archive.createdat is '创建时间';
+comment on column garmin_archive.updatedat is '更新时间';
+comment on table garmin_archive is '明细归档记录表';
+
+drop trigger if exists archive_lastupdate on garmin_archive cascade;
+create or replace trigger archive_lastupdate
+before update on garmin_archive
+for each row
+execute function lastupdate();
+
+-- =============================================
+-- 采集运行日志表（每次运行的分阶段耗时及吞吐）
+-- =============================================
+drop table if exists garmin_run_journal cascade;
+create table garmin_run_journal (
+  id serial,
+  datasource varchar(20) not null,
+  startedat timestamptz not null,
+  finishedat timestamptz,
+  daysback int,
+  status smallint not null default 1,
+  duration numeric(12,3),
+  stages json,
+  requests int,
+  apiseconds numeric(12,3),
+  bytesdownloaded bigint,
+  rowswritten bigint,
+  dbseconds numeric(12,3),
+  dbcommits int,
+  errmessage text,
+  createdat timestamptz default current_timestamp,
+  updatedat timestamptz default current_timestamp
+);
+
+alter table garmin_run_journal owner to user_eadm;
+alter table garmin_run_journal drop constraint if exists pk_run_journal_id cascade;
+alter table garmin_run_journal add constraint pk_run_journal_id primary key (id);
+
+drop index if exists non_run_journal_startedat;
+create index non_run_journal_startedat on garmin_run_journal using btree (datasource asc, startedat desc);
+
+comment on column garmin_run_journal.id is '自增主键';
+comment on column garmin_run_journal.datasource is '数据来源(garmin/polar/coros)';
+comment on column garmin_run_journal.startedat is '开始时间';
+comment on column garmin_run_journal.finishedat is '结束时间';
+comment on column garmin_run_journal.daysback is '回溯天数';
+comment on column garmin_run_journal.status is '运行状态(1成功0失败)';
+comment on column garmin_run_journal.duration is '总耗时(秒)';
+comment on column garmin_run_journal.stages is '各阶段耗时(秒) {阶段: 秒}';
+comment on column garmin_run_journal.requests is '接口请求次数';
+comment on column garmin_run_journal.apiseconds is '接口请求累计耗时(秒)';
+comment on column garmin_run_journal.bytesdownloaded is '下载字节数';
+comment on column garmin_run_journal.rowswritten is '写入行数';
+comment on column garmin_run_journal.dbseconds is '数据库写入累计耗时(秒)';
+comment on column garmin_run_journal.dbcommits is '数据库提交次数';
+comment on column garmin_run_journal.errmessage is '错误信息';
+comment on column garmin_run_journal.createdat is '创建时间';
+comment on column garmin_run_journal.updatedat is '更新时间';
+comment on table garmin_run_journal is '采集运行日志表';
+
+drop trigger if exists run_journal_lastupdate on garmin_run_journal cascade;
+create or replace trigger run_journal_lastupdate
+before update on garmin_run_journal
+for each row
+execute function lastupdate();
+
+-- =============================================
+-- 佳明_回填任务表（多进程/多节点分片回填）
+-- =============================================
+drop table if exists garmin_sync_job cascade;
+create table garmin_sync_job (
+  id serial,
+  datasource varchar(20) not null,
+  datatype varchar(50) not null,
+  rangestart date not null,
+  rangeend date not null,
+  jobstatus smallint not null default 0,
+  workerid varchar(100),
+  claimedat timestamptz,
+  heartbeat timestamptz,
+  attempts int not null default 0,
+  errmessage text,
+  createdat timestamptz default current_timestamp,
+  updatedat timestamptz default current_timestamp
+);
+
+alter table garmin_sync_job owner to user_eadm;
+alter table garmin_sync_job drop constraint if exists pk_sync_job_id cascade;
+alter table garmin_sync_job add constraint pk_sync_job_id primary key (id);
+alter table garmin_sync_job drop constraint if exists uni_sync_job_source_type_range cascade;
+alter table garmin_sync_job add constraint uni_sync_job_source_type_range unique (datasource, datatype, rangestart);
+
+drop index if exists non_sync_job_claim;
+create index non_sync_job_claim on garmin_sync_job using btree (datasource asc, jobstatus asc, rangestart desc);
+
+comment on column garmin_sync_job.id is '自增主键';
+comment on column garmin_sync_job.datasource is '数据来源(garmin/polar/coros)';
+comment on column garmin_sync_job.datatype is '数据类型(activity/sleep/heartrate/stress/spo2/respiration/hrv)';
+comment on column garmin_sync_job.rangestart is '日期范围起(含)';
+comment on column garmin_sync_job.rangeend is '日期范围止(含)';
+comment on column garmin_sync_job.jobstatus is '任务状态(0待领取1执行中2完成3失败)';
+comment on column garmin_sync_job.workerid is '领取任务的工作进程标识';
+comment on column garmin_sync_job.claimedat is '领取时间';
+comment on column garmin_sync_job.heartbeat is '最近心跳时间，超过租约视为进程已退出';
+comment on column garmin_sync_job.attempts is '领取次数';
+comment on column garmin_sync_job.errmessage is '错误信息';
+comment on column garmin_sync_job.createdat is '创建时间';
+comment on column garmin_sync_job.updatedat is '更新时间';
+comment on table garmin_sync_job is '回填任务表';
+
+drop trigger if exists sync_job_lastupdate on garmin_sync_job cascade;
+create or replace trigger sync_job_lastupdate
+before update on garmin_sync_job
+for each row
+execute function lastupdate();
+
+-- =============================================
+-- 佳明_活动轨迹多分辨率表（按地图缩放级别抽稀的编码折线）
+-- =============================================
+drop table if exists garmin_activity_track_lod cascade;
+create table garmin_activity_track_lod (
+  id serial,
+  activityid varchar(50) not null,
+  zoomlevel smallint not null,
+  tolerance numeric(8,2) not null,
+  pointcount int not null,
+  polyline text not null,
+  createdat timestamptz default current_timestamp,
+  updatedat timestamptz default current_timestamp
+);
+
+alter table garmin_activity_track_lod owner to user_eadm;
+alter table garmin_activity_track_lod drop constraint if exists pk_activity_track_lod_id cascade;
+alter table garmin_activity_track_lod add constraint pk_activity_track_lod_id primary key (id);
+alter table garmin_activity_track_lod drop constraint if exists uni_activity_track_lod_zoom cascade;
+alter table garmin_activity_track_lod add constraint uni_activity_track_lod_zoom unique (activityid, zoomlevel);
+
+comment on column garmin_activity_track_lod.id is '自增主键';
+comment on column garmin_activity_track_lod.activityid is '活动id';
+comment on column garmin_activity_track_lod.zoomlevel is '地图缩放级别';
+comment on column garmin_activity_track_lod.tolerance is 'Douglas-Peucker 容差(米)';
+comment on column garmin_activity_track_lod.pointcount is '抽稀后点数';
+comment on column garmin_activity_track_lod.polyline is 'Google 编码折线(精度1e-5)';
+comment on column garmin_activity_track_lod.createdat is '创建时间';
+comment on column garmin_activity_track_lod.updatedat is '更新时间';
+comment on table garmin_activity_track_lod is '活动轨迹多分辨率表';
+
+drop trigger if exists activity_track_lod_lastupdate on garmin_activity_track_lod cascade;
+create or replace trigger activity_track_lod_lastupdate
+before update on garmin_activity_track_lod
+for each row
+execute function lastupdate();
+
+-- =============================================
+-- 佳明_每日汇总宽表（采集时按触及日期增量刷新，看板按日期点查）
+-- =============================================
+drop table if exists garmin_daily_rollup cascade;
+create table garmin_daily_rollup (
+  id serial,
+  rollupdate date not null,
+  restinghr int,
+  minhr int,
+  maxhr int,
+  avghr numeric(6,2),
+  hrsamples int,
+  totalsleep int,
+  deepsleep int,
+  lightsleep int,
+  remsleep int,
+  awaketime int,
+  sleepscore int,
+  stresslevel int,
+  stressscore int,
+  reststress int,
+  highstress int,
+  avgspo2 numeric(5,2),
+  lowspo2 numeric(5,2),
+  avgwakingresp numeric(5,2),
+  avgsleepingresp numeric(5,2),
+  hrvlastnight numeric(8,2),
+  hrvweekly numeric(8,2),
+  hrvstatus varchar(20),
+  activities int,
+  activityduration numeric(12,2),
+  activitydistance numeric(12,2),
+  activitycalories int,
+  createdat timestamptz default current_timestamp,
+  updatedat timestamptz default current_timestamp
+);
+
+alter table garmin_daily_rollup owner to user_eadm;
+alter table garmin_daily_rollup drop constraint if exists pk_daily_rollup_id cascade;
+alter table garmin_daily_rollup add constraint pk_daily_rollup_id primary key (id);
+alter table garmin_daily_rollup drop constraint if exists uni_daily_rollup_date cascade;
+alter table garmin_daily_rollup add constraint uni_daily_rollup_date unique (rollupdate);
+
+comment on column garmin_daily_rollup.id is '自增主键';
+comment on column garmin_daily_rollup.rollupdate is '日期';
+comment on column garmin_daily_rollup.restinghr is '静息心率';
+comment on column garmin_daily_rollup.minhr is '最低心率';
+comment on column garmin_daily_rollup.maxhr is '最高心率';
+comment on column garmin_daily_rollup.avghr is '全天平均心率(明细计算，明细归档后保留原值)';
+comment on column garmin_daily_rollup.hrsamples is '心率采样点数';
+comment on column garmin_daily_rollup.totalsleep is '总睡眠(分钟)';
+comment on column garmin_daily_rollup.deepsleep is '深睡(分钟)';
+comment on column garmin_daily_rollup.lightsleep is '浅睡(分钟)';
+comment on column garmin_daily_rollup.remsleep is 'REM(分钟)';
+comment on column garmin_daily_rollup.awaketime is '清醒(分钟)';
+comment on column garmin_daily_rollup.sleepscore is '睡眠分数';
+comment on column garmin_daily_rollup.stresslevel is '平均压力';
+comment on column garmin_daily_rollup.stressscore is '最高压力';
+comment on column garmin_daily_rollup.reststress is '休息状态时长(秒)';
+comment on column garmin_daily_rollup.highstress is '高压力时长(秒)';
+comment on column garmin_daily_rollup.avgspo2 is '平均血氧';
+comment on column garmin_daily_rollup.lowspo2 is '最低血氧';
+comment on column garmin_daily_rollup.avgwakingresp is '清醒平均呼吸';
+comment on column garmin_daily_rollup.avgsleepingresp is '睡眠平均呼吸';
+comment on column garmin_daily_rollup.hrvlastnight is '昨夜HRV均值';
+comment on column garmin_daily_rollup.hrvweekly is 'HRV周均值';
+comment on column garmin_daily_rollup.hrvstatus is 'HRV状态';
+comment on column garmin_daily_rollup.activities is '活动次数';
+comment on column garmin_daily_rollup.activityduration is '活动总时长(秒)';
+comment on column garmin_daily_rollup.activitydistance is '活动总距离(米)';
+comment on column garmin_daily_rollup.activitycalories is '活动总卡路里';
+comment on column garmin_daily_rollup.createdat is '创建时间';
+comment on column garmin_daily_rollup.updatedat is '更新时间';
+comment on table garmin_daily_rollup is '佳明_每日汇总宽表';
+
+drop trigger if exists daily_rollup_lastupdate on garmin_daily_rollup cascade;
+create or replace trigger daily_rollup_lastupdate
+before update on garmin_daily_rollup
+for each row
+execute function lastupdate();
+
+-- =============================================
+-- 佳明_活动训练负荷表（入库时由心率轨迹计算 TRIMP）
+-- =============================================
+drop table if exists garmin_activity_load cascade;
+create table garmin_activity_load (
+  id serial,
+  activityid varchar(50) not null,
+  activitydate date not null,
+  trimp numeric(8,2),
+  method varchar(20),
+  hrseconds int,
+  createdat timestamptz default current_timestamp,
+  updatedat timestamptz default current_timestamp
+);
+
+alter table garmin_activity_load owner to user_eadm;
+alter table garmin_activity_load drop constraint if exists pk_activity_load_id cascade;
+alter table garmin_activity_load add constraint pk_activity_load_id primary key (id);
+alter table garmin_activity_load drop constraint if exists uni_activity_load_activityid cascade;
+alter table garmin_activity_load add constraint uni_activity_load_activityid unique (activityid);
+
+drop index if exists non_activity_load_date;
+create index non_activity_load_date on garmin_activity_load using btree (activitydate);
+
+comment on column garmin_activity_load.id is '自增主键';
+comment on column garmin_activity_load.activityid is '活动ID';
+comment on column garmin_activity_load.activitydate is '活动日期';
+comment on column garmin_activity_load.trimp is 'TRIMP(Banister)';
+comment on column garmin_activity_load.method is '计算方式(hr_series心率序列/avg_hr平均心率估算)';
+comment on column garmin_activity_load.hrseconds is '心率序列覆盖时长(秒)';
+comment on column garmin_activity_load.createdat is '创建时间';
+comment on column garmin_activity_load.updatedat is '更新时间';
+comment on table garmin_activity_load is '佳明_活动训练负荷表';
+
+drop trigger if exists activity_load_lastupdate on garmin_activity_load cascade;
+create or replace trigger activity_load_lastupdate
+before update on garmin_activity_load
+for each row
+execute function lastupdate();
+
+-- =============================================
+-- 佳明_每日训练负荷表（ATL/CTL/TSB，从最早变动日期向后递推）
+-- =============================================
+drop table if exists garmin_training_load cascade;
+create table garmin_training_load (
+  id serial,
+  loaddate date not null,
+  dailyload numeric(8,2),
+  atl numeric(8,2),
+  ctl numeric(8,2),
+  tsb numeric(8,2),
+  createdat timestamptz default current_timestamp,
+  updatedat timestamptz default current_timestamp
+);
+
+alter table garmin_training_load owner to user_eadm;
+alter table garmin_training_load drop constraint if exists pk_training_load_id cascade;
+alter table garmin_training_load add constraint pk_training_load_id primary key (id);
+alter table garmin_training_load drop constraint if exists uni_training_load_date cascade;
+alter table garmin_training_load add constraint uni_training_load_date unique (loaddate);
+
+comment on column garmin_training_load.id is '自增主键';
+comment on column garmin_training_load.loaddate is '日期';
+comment on column garmin_training_load.dailyload is '当日 TRIMP 合计';
+comment on column garmin_training_load.atl is '急性负荷(7天指数加权)';
+comment on column garmin_training_load.ctl is '慢性负荷(42天指数加权)';
+comment on column garmin_training_load.tsb is '训练状态平衡(前一日 CTL - ATL)';
+comment on column garmin_training_load.createdat is '创建时间';
+comment on column garmin_training_load.updatedat is '更新时间';
+comment on table garmin_training_load is '佳明_每日训练负荷表';
+
+drop trigger if exists training_load_lastupdate on garmin_training_load cascade;
+create or replace trigger training_load_lastupdate
+before update on garmin_training_load
+for each row
+execute function lastupdate();
@@ -0,0 +1,97 @@
+-- 明细表追加写优化(可选)
+-- 在 datastruct.sql 之后执行；已有数据的库可直接执行，原地迁移、数据保留
+--
+-- 明细表只以 INSERT ... ON CONFLICT DO NOTHING 写入、从不更新，以下均为每行的无用开销:
+--   serial id 主键: 每行取一次序列值，并多维护一个 btree 索引
+--   createdat / updatedat: 每行 16 字节与默认值计算
+--   lastupdate 触发器: 仅在 UPDATE 时触发，明细表不会用到
+--   按日期(活动id)的单列索引: 已被唯一键的首列覆盖
+-- 迁移后以自然键作主键，ON CONFLICT 目标不变，代码无需改动。
+-- garmin_activity_detail 的 non_activity_detail_pointtime 供保留归档按时间范围删除，予以保留。
+--
+-- 迁移需重建主键索引并锁表，建议停止采集后执行；删除列不会立即回收空间，
+-- 如需回收可在之后执行 vacuum full <表名>。
+
+-- =============================================
+-- 心率明细
+-- =============================================
+drop trigger if exists heartrate_detail_lastupdate on garmin_heartrate_detail cascade;
+alter table garmin_heartrate_detail drop constraint if exists pk_heartrate_detail_id cascade;
+alter table garmin_heartrate_detail drop constraint if exists uni_heartrate_detail_point cascade;
+alter table garmin_heartrate_detail drop constraint if exists pk_heartrate_detail_point cascade;
+alter table garmin_heartrate_detail add constraint pk_heartrate_detail_point primary key (hrdate, pointtime);
+drop index if exists non_heartrate_detail_hrdate;
+alter table garmin_heartrate_detail
+  drop column if exists id,
+  drop column if exists createdat,
+  drop column if exists updatedat;
+
+-- =============================================
+-- 压力明细
+-- =============================================
+drop trigger if exists stress_detail_lastupdate on garmin_stress_detail cascade;
+alter table garmin_stress_detail drop constraint if exists pk_stress_detail_id cascade;
+alter table garmin_stress_detail drop constraint if exists uni_stress_detail_point cascade;
+alter table garmin_stress_detail drop constraint if exists pk_stress_detail_point cascade;
+alter table garmin_stress_detail add constraint pk_stress_detail_point primary key (stressdate, pointtime);
+drop index if exists non_stress_detail_stressdate;
+alter table garmin_stress_detail
+  drop column if exists id,
+  drop column if exists createdat,
+  drop column if exists updatedat;
+
+-- =============================================
+-- 呼吸明细
+-- =============================================
+drop trigger if exists respiration_detail_lastupdate on garmin_respiration_detail cascade;
+alter table garmin_respiration_detail drop constraint if exists pk_respiration_detail_id cascade;
+alter table garmin_respiration_detail drop constraint if exists uni_respiration_detail_point cascade;
+alter table garmin_respiration_detail drop constraint if exists pk_respiration_detail_point cascade;
+alter table garmin_respiration_detail add constraint pk_respiration_detail_point primary key (respdate, pointtime);
+drop index if exists non_respiration_detail_respdate;
+alter table garmin_respiration_detail
+  drop column if exists id,
+  drop column if exists createdat,
+  drop column if exists updatedat;
+
+-- =============================================
+-- 血氧明细
+-- =============================================
+drop trigger if exists spo2_detail_lastupdate on garmin_spo2_detail cascade;
+alter table garmin_spo2_detail drop constraint if exists pk_spo2_detail_id cascade;
+alter table garmin_spo2_detail drop constraint if exists uni_spo2_detail_point cascade;
+alter table garmin_spo2_detail drop constraint if exists pk_spo2_detail_point cascade;
+alter table garmin_spo2_detail add constraint pk_spo2_detail_point primary key (spo2date, pointtime);
+drop index if exists non_spo2_detail_spo2date;
+alter table garmin_spo2_detail
+  drop column if exists id,
+  drop column if exists createdat,
+  drop column if exists updatedat;
+
+-- =============================================
+-- 睡眠阶段明细
+-- =============================================
+drop trigger if exists sleep_detail_lastupdate on garmin_sleep_detail cascade;
+alter table garmin_sleep_detail drop constraint if exists pk_sleep_detail_id cascade;
+alter table garmin_sleep_detail drop constraint if exists uni_sleep_detail_point cascade;
+alter table garmin_sleep_detail drop constraint if exists pk_sleep_detail_point cascade;
+alter table garmin_sleep_detail add constraint pk_sleep_detail_point primary key (sleepdate, starttime);
+drop index if exists non_sleep_detail_sleepdate;
+alter table garmin_sleep_detail
+  drop column if exists id,
+  drop column if exists createdat,
+  drop column if exists updatedat;
+
+-- =============================================
+-- 活动轨迹点明细
+-- =============================================
+drop trigger if exists activity_detail_lastupdate on garmin_activity_detail cascade;
+alter table garmin_activity_detail drop constraint if exists pk_activity_detail_id cascade;
+alter table garmin_activity_detail drop constraint if exists uni_activity_detail_point cascade;
+alter table garmin_activity_detail drop constraint if exists pk_activity_detail_point cascade;
+alter table garmin_activity_detail add constraint pk_activity_detail_point primary key (activityid, pointtime);
+drop index if exists non_activity_detail_activityid;
+alter table garmin_activity_detail
+  drop column if exists id,
+  drop column if exists createdat,
+  drop column if exists updatedat;
@@ -0,0 +1,48 @@
+-- 佳明活动空间索引(可选，需 PostGIS)
+-- 在 datastruct.sql 之后执行，并在配置中开启 postgis.enabled
+
+create extension if not exists postgis;
+
+-- =============================================
+-- 佳明_活动空间表（轨迹线 / 外包框 / 起点）
+-- =============================================
+drop table if exists garmin_activity_geom cascade;
+create table garmin_activity_geom (
+  id serial,
+  activityid varchar(50) not null,
+  track geometry(LineString, 4326),
+  bbox geometry(Polygon, 4326),
+  startpoint geography(Point, 4326),
+  pointcount int,
+  createdat timestamptz default current_timestamp,
+  updatedat timestamptz default current_timestamp
+);
+
+alter table garmin_activity_geom owner to user_eadm;
+alter table garmin_activity_geom drop constraint if exists pk_activity_geom_id cascade;
+alter table garmin_activity_geom add constraint pk_activity_geom_id primary key (id);
+alter table garmin_activity_geom drop constraint if exists uni_activity_geom_activityid cascade;
+alter table garmin_activity_geom add constraint uni_activity_geom_activityid unique (activityid);
+
+drop index if exists gist_activity_geom_track;
+create index gist_activity_geom_track on garmin_activity_geom using gist (track);
+drop index if exists gist_activity_geom_bbox;
+create index gist_activity_geom_bbox on garmin_activity_geom using gist (bbox);
+drop index if exists gist_activity_geom_startpoint;
+create index gist_activity_geom_startpoint on garmin_activity_geom using gist (startpoint);
+
+comment on column garmin_activity_geom.id is '自增主键';
+comment on column garmin_activity_geom.activityid is '活动id';
+comment on column garmin_activity_geom.track is '轨迹线(WGS84)';
+comment on column garmin_activity_geom.bbox is '轨迹外包框';
+comment on column garmin_activity_geom.startpoint is '起点(geography，按米计算距离)';
+comment on column garmin_activity_geom.pointcount is '轨迹点数';
+comment on column garmin_activity_geom.createdat is '创建时间';
+comment on column garmin_activity_geom.updatedat is '更新时间';
+comment on table garmin_activity_geom is '活动空间表';
+
+drop trigger if exists activity_geom_lastupdate on garmin_activity_geom cascade;
+create or replace trigger activity_geom_lastupdate
+before update on garmin_activity_geom
+for each row
+execute function lastupdate();
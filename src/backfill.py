@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+分片回填模块
+把多年回填按 (数据类型, 日期段) 拆成任务登记到 garmin_sync_job，
+多个进程/节点各自领取任务执行，领取使用 FOR UPDATE SKIP LOCKED，互不重复
+
+任务执行期间定期心跳续约；进程退出后租约过期，任务可被其他进程重新领取。
+单日粒度的去重仍由 garmin_sync 保证，重复执行同一天只会跳过。
+"""
+
+import os
+import time
+import socket
+import logging
+from datetime import date, timedelta
+from data_types import DATA_TYPES
+
+logger = logging.getLogger(__name__)
+
+DATASOURCE = "garmin"
+BACKFILL_TYPES = ["activity"] + [dt.dtype for dt in DATA_TYPES]
+JOB_STATUS = {0: "待领取", 1: "执行中", 2: "完成", 3: "失败"}
+
+
+class LeaseLost(Exception):
+    """任务租约已被其他进程接管"""
+
+
+def split_range(start, end, chunk_days):
+    """[start, end] 按 chunk_days 切分，从新到旧 [(段起, 段止), ...]"""
+    chunks = []
+    chunk_end = end
+    while chunk_end >= start:
+        chunk_start = max(start, chunk_end - timedelta(days=chunk_days - 1))
+        chunks.append((chunk_start, chunk_end))
+        chunk_end = chunk_start - timedelta(days=1)
+    return chunks
+
+
+def plan_backfill(db, start, end=None, types=None, chunk_days=30):
+    """登记回填任务，重复登记同一范围不会产生重复任务，返回新增任务数"""
+    end = end or date.today() - timedelta(days=1)
+    types = types or BACKFILL_TYPES
+    jobs = [(DATASOURCE, dtype, chunk_start, chunk_end)
+            for dtype in types
+            for chunk_start, chunk_end in split_range(start, end, chunk_days)]
+    created = db.plan_sync_jobs(jobs)
+    print(f"🗂️ 回填任务: {start} ~ {end}, {len(types)} 种类型, 每段 {chunk_days} 天, 新增 {created}/{len(jobs)}")
+    return created
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class BackfillWorker:
+    """回填工作进程: 循环领取任务直到没有可领取的任务"""
+
+    def __init__(self, collector, worker_id=None, lease_seconds=300, types=None,
+                 heartbeat_seconds=None, max_attempts=3):
+        self.collector = collector
+        self.db = collector.db
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.types = types
+        self.max_attempts = max_attempts
+        # 默认每 1/3 租约续约一次
+        self.heartbeat_seconds = heartbeat_seconds or max(lease_seconds // 3, 1)
+        self._daily = {dt.dtype: dt for dt in collector.daily_types()}
+
+    def run(self, max_jobs=None):
+        """执行任务，返回 (完成数, 失败数)"""
+        done = failed = 0
+        while max_jobs is None or done + failed < max_jobs:
+            job = self.db.claim_sync_job(DATASOURCE, self.worker_id, self.lease_seconds,
+                                         types=self.types, max_attempts=self.max_attempts)
+            if job is None:
+                break
+            print(f"\n📌 [{self.worker_id}] 领取任务 #{job['id']} {job['datatype']} "
+                  f"{job['rangestart']} ~ {job['rangeend']} (第{job['attempts']}次)")
+            last_beat = time.monotonic()
+
+            def on_progress():
+                nonlocal last_beat
+                if time.monotonic() - last_beat < self.heartbeat_seconds:
+                    return
+                if not self.db.heartbeat_sync_job(job["id"], self.worker_id):
+                    raise LeaseLost(f"任务 #{job['id']} 已被其他进程接管")
+                last_beat = time.monotonic()
+
+            try:
+                self._process(job, on_progress)
+            except LeaseLost as e:
+                print(f"  ⚠️ {e}")
+                continue
+            except Exception as e:
+                logger.error(f"回填任务 #{job['id']} 失败: {e}", exc_info=True)
+                self.db.finish_sync_job(job["id"], self.worker_id, False, str(e))
+                failed += 1
+                continue
+            self.collector.refresh_rollups()
+            self.db.finish_sync_job(job["id"], self.worker_id, True)
+            done += 1
+
+        print(f"\n🏁 [{self.worker_id}] 回填结束: 完成 {done}, 失败 {failed}")
+        return done, failed
+
+    def _process(self, job, on_progress):
+        dtype = job["datatype"]
+        if dtype == "activity":
+            self.collector.collect_activities_between(job["rangestart"], job["rangeend"], on_progress)
+            return
+        if dtype not in self._daily:
+            raise ValueError(f"不支持的回填类型: {dtype}")
+        dates = [(job["rangeend"] - timedelta(days=i)).isoformat()
+                 for i in range((job["rangeend"] - job["rangestart"]).days + 1)]
+        self.collector.collect_daily(self._daily[dtype], dates, on_progress)
+
+
+def print_status(db):
+    rows = db.sync_job_summary(DATASOURCE)
+    if not rows:
+        print("📭 暂无回填任务")
+        return
+    print(f"{'类型':<12} {'状态':<6} {'任务数':>6} {'进程数':>6}  日期范围")
+    for r in rows:
+        print(f"{r['datatype']:<12} {JOB_STATUS.get(r['jobstatus'], r['jobstatus']):<6} {r['jobs']:>6} "
+              f"{r['workers']:>6}  {r['rangestart']} ~ {r['rangeend']}")
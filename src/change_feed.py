@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+变更通知消费
+采集器每个已提交的写入单元(一批按日数据、一批活动汇总、一个活动轨迹、一段每日汇总刷新等)
+在同一事务内写入 garmin_change_outbox 并 pg_notify(change_feed.channel, 事件 JSON)，回滚则不发布。
+
+事件: {"id", "source", "type", "dates", "activities", "rows"}，
+载荷超过 NOTIFY 上限时只含 id/source/type/rows 并带 "truncated": true。
+
+消费方记住已处理的最大 id: 先 LISTEN，再补读该 id 之后的事件，之后等待通知。
+通知只用于唤醒(断线期间的通知会丢失)，事件内容总是从 outbox 读取，按 id 顺序不丢不重。
+"""
+
+import json
+import logging
+import select
+from psycopg2 import sql
+from config import get_change_feed_config
+
+logger = logging.getLogger(__name__)
+
+# 等待通知的超时秒数，超时后也重新查询一次(兜底)
+POLL_TIMEOUT = 30
+
+
+def channel_name():
+    return get_change_feed_config().get("channel") or "garmin_changes"
+
+
+def to_event(row):
+    """outbox 行转为与通知载荷相同结构的事件"""
+    return {
+        "id": row["id"],
+        "source": row["datasource"],
+        "type": row["datatype"],
+        "dates": row["dates"] or [],
+        "activities": row["activityids"] or [],
+        "rows": row["rowcount"],
+        "createdat": row["createdat"].isoformat() if row.get("createdat") else None,
+    }
+
+
+def follow(db, after_id=0, channel=None, timeout=POLL_TIMEOUT, batch=1000):
+    """依次产出 id 大于 after_id 的变更事件，补读完后阻塞等待新事件(不结束的生成器)"""
+    conn = db._get_conn()
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL("LISTEN {}").format(sql.Identifier(channel or channel_name())))
+    conn.commit()
+    last = after_id
+    while True:
+        rows = db.changes_after(last, batch)
+        for row in rows:
+            last = row["id"]
+            yield to_event(row)
+        if len(rows) == batch:
+            continue
+        # 查询期间收到的通知已在 conn.notifies 中，否则等待连接可读
+        if not conn.notifies:
+            select.select([conn], [], [], timeout)
+        conn.poll()
+        if conn.notifies:
+            logger.debug(f"收到 {len(conn.notifies)} 条变更通知")
+        conn.notifies.clear()
+
+
+def print_changes(events):
+    """每个事件输出一行 JSON(供下游管道消费)"""
+    for event in events:
+        print(json.dumps(event, ensure_ascii=False), flush=True)
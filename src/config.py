@@ -5,7 +5,6 @@
 """
 
 import os
-import yaml
 
 
 def _find_config_path():
@@ -40,6 +39,8 @@ def get_config():
     """获取全局配置（单例）"""
     global _config
     if _config is None:
+        # 按需导入，未读取配置的命令(如 --help)不加载 yaml
+        import yaml
         with open(_find_config_path(), 'r', encoding='utf-8') as f:
             _config = yaml.safe_load(f)
     return _config
@@ -53,3 +54,48 @@ def get_db_config():
 def get_garmin_config():
     """获取佳明配置"""
     return get_config().get('garmin', {})
+
+
+def get_export_config():
+    """获取 Parquet 导出配置"""
+    return get_config().get('export', {}) or {}
+
+
+def get_retention_config():
+    """获取明细数据保留与归档配置"""
+    return get_config().get('retention', {}) or {}
+
+
+def get_backfill_config():
+    """获取分片回填配置"""
+    return get_config().get('backfill', {}) or {}
+
+
+def get_postgis_config():
+    """获取 PostGIS 空间索引配置"""
+    return get_config().get('postgis', {}) or {}
+
+
+def get_training_load_config():
+    """获取训练负荷(TRIMP)配置"""
+    return get_config().get('training_load', {}) or {}
+
+
+def get_data_types_config():
+    """获取按日数据类型的采集策略覆盖 {类型: {字段: 值}}"""
+    return get_config().get('data_types', {}) or {}
+
+
+def get_gaps_config():
+    """获取明细覆盖率缺口检测配置"""
+    return get_config().get('gaps', {}) or {}
+
+
+def get_query_api_config():
+    """获取只读查询服务配置"""
+    return get_config().get('query_api', {}) or {}
+
+
+def get_change_feed_config():
+    """获取变更通知(outbox + NOTIFY)配置"""
+    return get_config().get('change_feed', {}) or {}
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+按日采集的数据类型注册表
+每种类型声明接口、解析函数、目标表及采集策略(刷新窗口、无数据定论天数、并发数、日期段获取、批大小)，
+由 DailyTypeEngine 统一调度获取与批量写入
+
+单个类型的策略可在 config.yml 的 data_types 下覆盖，如:
+    data_types:
+      heartrate:
+        max_concurrency: 4
+"""
+
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace, fields
+from datetime import date, timedelta
+from config import get_data_types_config
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# garmin_sync.syncstatus
+SYNC_FAILED = 0
+SYNC_OK = 1
+SYNC_EMPTY = 2
+
+
+@dataclass(frozen=True)
+class DataType:
+    """按日采集的数据类型声明"""
+    dtype: str
+    label: str
+    path: str                   # 接口路径模板，可用 {date} {display_name}
+    parser: str                 # 采集器上的解析方法名 (target_date, data) -> 汇总行 | None
+    table: str                  # 汇总表
+    datecol: str                # 汇总表日期列
+    params: dict = None         # 查询参数模板
+    details: str = None         # GarminDatabase 明细写入方法名 (target_date, payload)
+    detail_key: str = None      # 明细取自响应的字段，None 表示整个响应
+    refresh_days: int = 0       # 最近 N 天内的日期即使已同步也重新获取(当天数据可能仍在补传)
+    immutable_after: int = None  # 早于 N 天仍无数据的日期记为确认无数据，不再重试
+    max_concurrency: int = 1    # 同时进行的请求数
+    range_path: str = None      # 支持按日期段获取时的路径模板，可用 {start} {end}
+    range_key: str = None       # 日期段响应中的逐日列表字段(元素含 calendarDate)
+    batch_size: int = 1         # 日期段获取时每段天数；逐日获取时每批合并写入的天数
+
+    @property
+    def range_fetch(self):
+        return self.range_path is not None
+
+
+DATA_TYPES = [
+    DataType(
+        "heartrate", "❤️ 心率", "/wellness-service/wellness/dailyHeartRate",
+        parser="_parse_heart_rate", table="garmin_heartrate", datecol="hrdate",
+        params={"date": "{date}"},
+        details="batch_upsert_heartrate_details", detail_key="heartRateValues",
+        refresh_days=2, immutable_after=30, max_concurrency=2, batch_size=7,
+    ),
+    DataType(
+        "sleep", "💤 睡眠", "/wellness-service/wellness/dailySleepData/{display_name}",
+        parser="_parse_sleep", table="garmin_sleep", datecol="sleepdate",
+        params={"date": "{date}", "nonSleepBufferMinutes": 60},
+        details="batch_upsert_sleep_details", detail_key="sleepLevels",
+        refresh_days=2, immutable_after=30, max_concurrency=2, batch_size=7,
+    ),
+    DataType(
+        "stress", "😰 压力", "/wellness-service/wellness/dailyStress/{date}",
+        parser="_parse_stress", table="garmin_stress", datecol="stressdate",
+        details="batch_upsert_stress_details", detail_key="stressValuesArray",
+        refresh_days=2, immutable_after=30, max_concurrency=2, batch_size=7,
+    ),
+    DataType(
+        "spo2", "🩸 血氧", "/wellness-service/wellness/daily/spo2/{date}",
+        parser="_parse_spo2", table="garmin_spo2", datecol="spo2date",
+        details="batch_upsert_spo2_details",
+        refresh_days=2, immutable_after=30, max_concurrency=2, batch_size=7,
+    ),
+    DataType(
+        "respiration", "🌬️ 呼吸", "/wellness-service/wellness/daily/respiration/{date}",
+        parser="_parse_respiration", table="garmin_respiration", datecol="respdate",
+        details="batch_upsert_respiration_details", detail_key="respirationValuesArray",
+        refresh_days=2, immutable_after=30, max_concurrency=2, batch_size=7,
+    ),
+    # 日期段接口 /hrv-service/hrv/daily/{start}/{end} 只返回逐日汇总(不含 hrvReadings)，
+    # rawjson 需保存完整响应供重算，逐日获取
+    DataType(
+        "hrv", "💓 HRV", "/hrv-service/hrv/{date}",
+        parser="_parse_hrv", table="garmin_hrv", datecol="hrvdate",
+        refresh_days=1, immutable_after=30, max_concurrency=2, batch_size=7,
+    ),
+]
+
+
+def data_types(names=None):
+    """按名称取数据类型声明(默认全部)，合并配置中的策略覆盖"""
+    overrides = get_data_types_config()
+    allowed = {f.name for f in fields(DataType)} - {"dtype", "parser", "table", "datecol"}
+    result = []
+    for dt in DATA_TYPES:
+        if names and dt.dtype not in names:
+            continue
+        custom = {k: v for k, v in (overrides.get(dt.dtype) or {}).items() if k in allowed}
+        result.append(replace(dt, **custom) if custom else dt)
+    return result
+
+
+def get_data_type(name):
+    for dt in data_types([name]):
+        return dt
+    raise ValueError(f"未知数据类型: {name}")
+
+
+def _contiguous(days):
+    """已排序日期拆成连续段 [[d1, d2, ...], ...]"""
+    runs = []
+    for d in days:
+        if runs and d - runs[-1][-1] == timedelta(days=1):
+            runs[-1].append(d)
+        else:
+            runs.append([d])
+    return runs
+
+
+class DailyTypeEngine:
+    """按数据类型声明调度按日采集: 筛选待采集日期、并发获取、按批写入"""
+
+    def __init__(self, collector, datasource="garmin"):
+        self.collector = collector
+        self.db = collector.db
+        self.datasource = datasource
+
+    # ==================== 调度 ====================
+
+    def pending_dates(self, dt, dates, today=None):
+        """需要获取的日期: 未同步，或已同步但仍在刷新窗口内；确认无数据的日期跳过"""
+        today = today or date.today()
+        states = self.db.sync_states(self.datasource, dt.dtype, dates)
+        pending = []
+        for d in dates:
+            status = states.get(d)
+            if status == SYNC_EMPTY:
+                continue
+            if status == SYNC_OK and (today - date.fromisoformat(d)).days > dt.refresh_days:
+                continue
+            pending.append(d)
+        return pending
+
+    def _units(self, dt, dates):
+        """拆分获取单元 [(日期列表, 获取函数), ...]，获取函数返回 {日期: (成功, 数据)}"""
+        if not dt.range_fetch:
+            return [([d], lambda d=d: {d: self._fetch_day(dt, d)}) for d in dates]
+        units = []
+        days = sorted(date.fromisoformat(d) for d in dates)
+        for run in _contiguous(days):
+            for i in range(0, len(run), dt.batch_size):
+                chunk = [d.isoformat() for d in run[i:i + dt.batch_size]]
+                units.append((chunk, lambda chunk=chunk: self._fetch_range(dt, chunk)))
+        # 与逐日一致，新日期在前
+        units.reverse()
+        return units
+
+    def _fetch_day(self, dt, target_date):
+        fmt = {"date": target_date, "display_name": self.collector._display_name}
+        params = {k: v.format(**fmt) if isinstance(v, str) else v for k, v in (dt.params or {}).items()}
+        try:
+            data = self.collector._connectapi(dt.dtype, dt.path.format(**fmt), params=params or None)
+            return True, data
+        except Exception as e:
+            logger.warning(f"{dt.label}数据获取失败 {target_date}: {e}")
+            return False, None
+
+    def _fetch_range(self, dt, chunk):
+        start, end = min(chunk), max(chunk)
+        try:
+            data = self.collector._connectapi(dt.dtype, dt.range_path.format(start=start, end=end))
+        except Exception as e:
+            logger.warning(f"{dt.label}数据获取失败 {start} ~ {end}: {e}")
+            return {d: (False, None) for d in chunk}
+        by_date = {}
+        for item in (data or {}).get(dt.range_key) or []:
+            if isinstance(item, dict) and item.get("calendarDate"):
+                by_date[str(item["calendarDate"])[:10]] = item
+        return {d: (True, by_date.get(d)) for d in chunk}
+
+    def _fetched(self, dt, units):
+        """按顺序产出每个获取单元的结果，最多 max_concurrency 个请求同时进行"""
+        if dt.max_concurrency <= 1:
+            for _, fetch in units:
+                yield fetch()
+            return
+        # 工作线程继承所属数据源，请求计入本数据源的运行日志
+        with ThreadPoolExecutor(max_workers=dt.max_concurrency, thread_name_prefix=f"fetch-{dt.dtype}",
+                                initializer=metrics.set_source, initargs=(metrics.current_source(),)) as pool:
+            window = deque()
+            it = iter(units)
+            for _, fetch in it:
+                window.append(pool.submit(fetch))
+                if len(window) >= dt.max_concurrency * 2:
+                    break
+            for _, fetch in it:
+                yield window.popleft().result()
+                window.append(pool.submit(fetch))
+            while window:
+                yield window.popleft().result()
+
+    def run(self, dt, dates, on_progress=None, force=False):
+        """采集一种数据类型的日期列表，返回成功(含已同步)天数；force=True 时不按同步状态跳过"""
+        print(f"\n{dt.label} 数据...")
+        queue = metrics.QUEUE_DEPTH.labels(dt.dtype)
+        queue.set(len(dates))
+        pending = list(dates) if force else self.pending_dates(dt, dates)
+        success = len(dates) - len(pending)
+        if success:
+            print(f"  ⏭️ 已同步 {success} 天")
+            queue.inc(-success)
+
+        batch = []
+        write_size = 1 if dt.range_fetch else dt.batch_size
+        for results in self._fetched(dt, self._units(dt, pending)):
+            for target_date in sorted(results, reverse=True):
+                queue.inc(-1)
+                if on_progress:
+                    on_progress()
+                batch.append((target_date,) + results[target_date])
+            if len(batch) >= write_size:
+                success += self._save_batch(dt, batch)
+                batch = []
+        if batch:
+            success += self._save_batch(dt, batch)
+
+        print(f"  📊 {dt.label} {success}/{len(dates)}")
+        return success
+
+    # ==================== 写入 ====================
+
+    def _write_details(self, dt, target_date, data):
+        if not dt.details:
+            return
+        payload = data if dt.detail_key is None else data.get(dt.detail_key)
+        if payload:
+            getattr(self.db, dt.details)(target_date, payload)
+
+    def _save_batch(self, dt, items):
+        """items: [(日期, 获取成功, 数据), ...]，汇总多行一次写入、同步记录一次登记，返回保存天数"""
+        parse = getattr(self.collector, dt.parser)
+        rows = []
+        empty = []
+        for target_date, ok, data in items:
+            parsed = parse(target_date, data) if ok else None
+            if parsed:
+                rows.append((target_date, parsed, data))
+                continue
+            print(f"  ⚠️ {target_date}: 无数据")
+            if ok and dt.immutable_after is not None and \
+                    (date.today() - date.fromisoformat(target_date)).days > dt.immutable_after:
+                empty.append(target_date)
+            elif data:
+                logger.info(f"{dt.label}数据 {target_date} 无有效数据,不记录同步状态")
+        if empty:
+            self.db.upsert_syncs(self.datasource, dt.dtype, empty, status=SYNC_EMPTY, errmsg="无数据")
+        if not rows:
+            return 0
+
+        try:
+            self._write_rows(dt, rows)
+        except Exception as e:
+            if len(rows) == 1:
+                target_date = rows[0][0]
+                logger.error(f"{dt.label}存储失败 {target_date}: {e}")
+                self.db.upsert_sync(self.datasource, dt.dtype, target_date, status=SYNC_FAILED, errmsg=str(e))
+                return 0
+            # 整批失败时逐日重试，定位出错的日期
+            logger.warning(f"{dt.label}批量写入失败，逐日重试: {e}")
+            return sum(self._save_batch(dt, [(d, True, data)]) for d, _, data in rows)
+
+        for target_date, _, _ in rows:
+            print(f"  ✅ {target_date}: 已保存")
+        return len(rows)
+
+    def _write_rows(self, dt, rows):
+        """汇总 -> 明细 -> 同步记录(及变更事件)在同一事务内写入，中途失败整批回滚，下次重新获取"""
+        with self.db.transaction():
+            self.db.bulk_upsert_summaries(dt.table, dt.datecol, [parsed for _, parsed, _ in rows])
+            for target_date, _, data in rows:
+                self._write_details(dt, target_date, data)
+            dates = [d for d, _, _ in rows]
+            self.db.upsert_syncs(self.datasource, dt.dtype, dates, status=SYNC_OK)
+            self.db.record_change(self.datasource, dt.dtype, dates=dates)
@@ -6,10 +6,13 @@
 
 import json
 import logging
+import time
 import psycopg2
-from psycopg2.extras import execute_values
+from contextlib import contextmanager
+from psycopg2.extras import execute_values, RealDictCursor
 from datetime import datetime, timezone
-from config import get_db_config
+from config import get_db_config, get_postgis_config, get_change_feed_config
+import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -17,7 +20,100 @@ logger = logging.getLogger(__name__)
 class GarminDatabase:
     """佳明数据库操作类"""
 
-    def __init__(self):
+    # 明细表写入语句(按数据类型)
+    DETAIL_SQL = {
+        "heartrate": """
+            INSERT INTO garmin_heartrate_detail (hrdate, pointtime, heartrate)
+            VALUES %s
+            ON CONFLICT (hrdate, pointtime) DO NOTHING
+        """,
+        "sleep": """
+            INSERT INTO garmin_sleep_detail (sleepdate, starttime, endtime, activitylevel)
+            VALUES %s
+            ON CONFLICT (sleepdate, starttime) DO NOTHING
+        """,
+        "stress": """
+            INSERT INTO garmin_stress_detail (stressdate, pointtime, stresslevel)
+            VALUES %s
+            ON CONFLICT (stressdate, pointtime) DO NOTHING
+        """,
+        "spo2": """
+            INSERT INTO garmin_spo2_detail (spo2date, pointtime, spo2value, readingsource)
+            VALUES %s
+            ON CONFLICT (spo2date, pointtime) DO NOTHING
+        """,
+        "respiration": """
+            INSERT INTO garmin_respiration_detail (respdate, pointtime, respvalue)
+            VALUES %s
+            ON CONFLICT (respdate, pointtime) DO NOTHING
+        """,
+    }
+
+    # 单日明细以 (毫秒时间戳数组, 数值数组) 一条语句写入，时间转换在服务端完成
+    ARRAY_SQL = {
+        "heartrate": """
+            INSERT INTO garmin_heartrate_detail (hrdate, pointtime, heartrate)
+            SELECT %(datadate)s, to_timestamp(t / 1000.0), v
+            FROM unnest(%(ts)s::bigint[], %(vals)s::int[]) AS u(t, v)
+            ON CONFLICT (hrdate, pointtime) DO NOTHING
+        """,
+        "stress": """
+            INSERT INTO garmin_stress_detail (stressdate, pointtime, stresslevel)
+            SELECT %(datadate)s, to_timestamp(t / 1000.0), v
+            FROM unnest(%(ts)s::bigint[], %(vals)s::int[]) AS u(t, v)
+            ON CONFLICT (stressdate, pointtime) DO NOTHING
+        """,
+        "spo2": """
+            INSERT INTO garmin_spo2_detail (spo2date, pointtime, spo2value, readingsource)
+            SELECT %(datadate)s, to_timestamp(t / 1000.0), v, 'hourly'
+            FROM unnest(%(ts)s::bigint[], %(vals)s::numeric[]) AS u(t, v)
+            ON CONFLICT (spo2date, pointtime) DO NOTHING
+        """,
+        "respiration": """
+            INSERT INTO garmin_respiration_detail (respdate, pointtime, respvalue)
+            SELECT %(datadate)s, to_timestamp(t / 1000.0), v
+            FROM unnest(%(ts)s::bigint[], %(vals)s::numeric[]) AS u(t, v)
+            ON CONFLICT (respdate, pointtime) DO NOTHING
+        """,
+    }
+
+    # 小时汇总来源: 数据类型 -> (明细表, 日期列, 取值列)
+    HOURLY_SOURCES = {
+        "heartrate": ("garmin_heartrate_detail", "hrdate", "heartrate"),
+        "stress": ("garmin_stress_detail", "stressdate", "stresslevel"),
+        "respiration": ("garmin_respiration_detail", "respdate", "respvalue"),
+        "spo2": ("garmin_spo2_detail", "spo2date", "spo2value"),
+    }
+
+    # 数据类型 -> 明细表
+    DETAIL_TABLES = {
+        "heartrate": "garmin_heartrate_detail",
+        "sleep": "garmin_sleep_detail",
+        "stress": "garmin_stress_detail",
+        "spo2": "garmin_spo2_detail",
+        "respiration": "garmin_respiration_detail",
+    }
+
+    # 变更事件的写入行数不计入这些表(同步记录与事件本身)
+    CHANGE_UNCOUNTED = ("garmin_sync", "garmin_change_outbox")
+
+    # NOTIFY 载荷上限 8000 字节，超出时只发送事件 id 等，消费方从 outbox 读取完整事件
+    CHANGE_SQL = """
+        WITH e AS (
+            INSERT INTO garmin_change_outbox (datasource, datatype, dates, activityids, rowcount)
+            VALUES (%(datasource)s, %(datatype)s, %(dates)s::date[], %(activities)s::varchar[], %(rows)s)
+            RETURNING id, datasource, datatype, dates, activityids, rowcount
+        ), p AS (
+            SELECT json_build_object('id', id, 'source', datasource, 'type', datatype, 'dates', dates,
+                                     'activities', activityids, 'rows', rowcount)::text AS payload,
+                   json_build_object('id', id, 'source', datasource, 'type', datatype,
+                                     'rows', rowcount, 'truncated', true)::text AS brief
+            FROM e
+        )
+        SELECT pg_notify(%(channel)s, CASE WHEN octet_length(payload) < 7900 THEN payload ELSE brief END) FROM p
+    """
+
+    def __init__(self, readonly=False):
         db_cfg = get_db_config()
         self.conn_params = {
             "host": db_cfg.get("host"),
@@ -27,16 +123,211 @@ class GarminDatabase:
             "password": db_cfg.get("password"),
         }
         self._conn = None
+        # 只读连接(查询服务)，误调用写入方法时由数据库拒绝
+        self.readonly = readonly
+        # 开启后入库时维护 garmin_activity_geom(需执行 script/postgis.sql)
+        self.postgis = bool(get_postgis_config().get("enabled"))
+        # 本连接写入过的数据日期，用于增量刷新每日汇总
+        self.touched_dates = set()
+        # 本连接写入过的活动id，用于查询服务缓存失效
+        self.touched_activities = set()
+        # transaction() 嵌套层数，大于 0 时写入不单独提交
+        self._tx_depth = 0
+        # 开启后每个已提交的写入单元发布变更事件(需执行 script/change_feed.sql)
+        change_cfg = get_change_feed_config()
+        self.change_feed = bool(change_cfg.get("enabled")) and not readonly
+        self.change_channel = change_cfg.get("channel") or "garmin_changes"
+        # 当前事务内登记的变更 [(数据源, 类型, 日期, 活动id, 行数)] 与各表写入行数
+        self._changes = []
+        self._tx_rows = {}
 
     def _get_conn(self):
         if self._conn is None or self._conn.closed:
             self._conn = psycopg2.connect(**self.conn_params)
+            if self.readonly:
+                self._conn.set_session(readonly=True)
         return self._conn
 
     def close(self):
         if self._conn and not self._conn.closed:
             self._conn.close()
 
+    @contextmanager
+    def transaction(self):
+        """多条写入合并为一个事务: 其间 _write/_fetchall 不单独提交，退出时一次提交，出错整体回滚
+
+        可嵌套，内层并入最外层事务。事务内只应调用经 _write/_fetchall 的方法。
+        """
+        if self._tx_depth:
+            self._tx_depth += 1
+            try:
+                yield
+            finally:
+                self._tx_depth -= 1
+            return
+        conn = self._get_conn()
+        self._tx_depth = 1
+        try:
+            yield
+            self._emit_changes()
+            t0 = time.monotonic()
+            conn.commit()
+            metrics.record_db_write("transaction", 0, time.monotonic() - t0)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._tx_depth = 0
+            self._changes = []
+            self._tx_rows = {}
+
+    # ==================== 变更事件 ====================
+
+    def record_change(self, datasource: str, datatype: str, dates=(), activities=(), rows: int = None):
+        """登记一个写入单元的变更，随所在事务提交写入 outbox 并 NOTIFY(事务回滚则不发布)
+
+        rows 为空时取本事务写入行数(不含同步记录)；事务外调用时单独提交一个事件。
+        """
+        if not self.change_feed:
+            return
+        dates = sorted({str(d)[:10] for d in dates})
+        activities = sorted({str(a) for a in activities})
+        if not dates and not activities:
+            return
+        if self._tx_depth:
+            self._changes.append((datasource, datatype, dates, activities, rows))
+            return
+        with self.transaction():
+            self._changes.append((datasource, datatype, dates, activities, rows or 0))
+
+    def _transaction_rows(self) -> int:
+        """本事务已写入的行数(不含同步记录与事件)"""
+        return sum(n for table, n in self._tx_rows.items() if table not in self.CHANGE_UNCOUNTED)
+
+    def _emit_changes(self):
+        """在提交前写入本事务登记的变更事件"""
+        if not self._changes:
+            return
+        tx_rows = self._transaction_rows()
+        changes, self._changes = self._changes, []
+        for datasource, datatype, dates, activities, rows in changes:
+            self._write("garmin_change_outbox", self.CHANGE_SQL, params={
+                "datasource": datasource,
+                "datatype": datatype,
+                "dates": dates,
+                "activities": activities,
+                "rows": tx_rows if rows is None else rows,
+                "channel": self.change_channel,
+            }, error="变更事件写入失败")
+
+    def changes_after(self, after_id: int = 0, limit: int = 1000) -> list:
+        """id 大于 after_id 的变更事件(按 id 升序)
+
+        id 在事务内分配、提交顺序可能不同: 只返回早于最早进行中事务写入的事件，
+        仍在提交中的较小 id 不会被跳过(长事务期间事件会相应延后)。
+        """
+        return self._fetchall("""
+            SELECT id, datasource, datatype, dates::text[] AS dates, activityids, rowcount, createdat
+            FROM garmin_change_outbox
+            WHERE id > %s AND xid < pg_snapshot_xmin(pg_current_snapshot())
+            ORDER BY id
+            LIMIT %s
+        """, (after_id, limit), dict_rows=True)
+
+    def prune_changes(self, days: int) -> int:
+        """删除 days 天前的变更事件，返回删除条数"""
+        return self._write("garmin_change_outbox", """
+            DELETE FROM garmin_change_outbox WHERE createdat < now() - make_interval(days => %s)
+        """, params=(int(days),), error="变更事件清理失败")
+
+    def _write(self, table, sql, params=None, values=None, page_size=500,
+               template=None, error="写入失败", fetch=False):
+        """执行单条写入并提交(事务内由 transaction 统一提交)，记录写入行数/耗时/提交次数，
+        返回实际影响的行数(ON CONFLICT DO NOTHING 跳过的行不计；fetch=True 时返回 RETURNING 结果)"""
+        conn = self._get_conn()
+        t0 = time.monotonic()
+        returned = None
+        try:
+            with conn.cursor() as cur:
+                if values is not None:
+                    # 逐页执行并累计 rowcount(execute_values 分页时只保留最后一页的 rowcount)
+                    returned = [] if fetch else None
+                    rows = 0
+                    for i in range(0, len(values), page_size):
+                        page = values[i:i + page_size]
+                        result = execute_values(cur, sql, page, template=template,
+                                                page_size=len(page), fetch=fetch)
+                        rows += max(cur.rowcount, 0)
+                        if fetch:
+                            returned.extend(result)
+                else:
+                    cur.execute(sql, params)
+                    rows = max(cur.rowcount, 0)
+            if not self._tx_depth:
+                conn.commit()
+            else:
+                self._tx_rows[table] = self._tx_rows.get(table, 0) + rows
+        except Exception as e:
+            if not self._tx_depth:
+                conn.rollback()
+            metrics.DB_ERRORS.labels(table).inc()
+            logger.error(f"{error}: {e}")
+            raise
+        metrics.record_db_write(table, rows, time.monotonic() - t0, commits=0 if self._tx_depth else 1)
+        return returned if fetch else rows
+
+    def _fetchall(self, sql, params=None, dict_rows=False) -> list:
+        """执行查询并提交(事务内不提交)，返回全部行"""
+        conn = self._get_conn()
+        try:
+            with conn.cursor(cursor_factory=RealDictCursor if dict_rows else None) as cur:
+                cur.execute(sql, params)
+                rows = cur.fetchall()
+            if not self._tx_depth:
+                conn.commit()
+            return rows
+        except Exception:
+            if not self._tx_depth:
+                conn.rollback()
+            raise
+
+    def stream_rows(self, sql, params=None, itersize=2000, name="garmin_stream"):
+        """服务端游标流式读取，使用独立连接，不影响写入事务"""
+        conn = psycopg2.connect(**self.conn_params)
+        try:
+            conn.set_session(readonly=True)
+            with conn.cursor(name=name) as cur:
+                cur.itersize = itersize
+                cur.execute(sql, params)
+                for row in cur:
+                    yield row
+        finally:
+            conn.close()
+
+    # ==================== 批量写入(重算/导入) ====================
+
+    def bulk_upsert_summaries(self, table: str, key: str, rows: list):
+        """多行汇总一次性 upsert，冲突时以新值覆盖除主键外的全部列"""
+        if not rows:
+            return 0
+        columns = list(rows[0].keys())
+        updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in columns if c != key)
+        sql = f"""
+            INSERT INTO {table} ({", ".join(columns)})
+            VALUES %s
+            ON CONFLICT ({key}) DO UPDATE SET {updates}
+        """
+        template = "(" + ", ".join(f"%({c})s" for c in columns) + ")"
+        return self._write(table, sql, values=rows, template=template, error=f"{table} 批量写入失败")
+
+    def bulk_insert_details(self, dtype: str, values: list):
+        """多日明细一次性写入(单事务)"""
+        if not values:
+            return 0
+        table = self.DETAIL_TABLES[dtype]
+        return self._write(table, self.DETAIL_SQL[dtype], values=values, page_size=2000,
+                           error=f"{dtype} 明细批量写入失败")
+
     @staticmethod
     def _ts_to_dt(ts_ms):
         """毫秒时间戳转 datetime (UTC)"""
@@ -44,50 +335,75 @@ class GarminDatabase:
             return None
         return datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc)
 
+    @staticmethod
+    def _series_arrays(points, cast, min_value=None):
+        """[[timestamp_ms, value], ...] 转为 (时间戳数组, 数值数组)，跳过空值及小于 min_value 的点"""
+        ts, vals = [], []
+        for p in points or []:
+            if p is None or len(p) < 2 or p[0] is None or p[1] is None:
+                continue
+            if min_value is not None and p[1] < min_value:
+                continue
+            ts.append(int(p[0]))
+            vals.append(cast(p[1]))
+        return ts, vals
+
+    def _write_series(self, dtype, datadate, ts, vals, error):
+        """单日时序一条语句写入，返回新增行数"""
+        return self._write(self.DETAIL_TABLES[dtype], self.ARRAY_SQL[dtype],
+                           params={"datadate": datadate, "ts": ts, "vals": vals}, error=error)
+
     # ==================== 活动汇总 ====================
 
+    ACTIVITY_COLUMNS = (
+        "activityid", "activityname", "activitytype", "sporttype",
+        "starttime", "endtime", "duration", "distance", "calories",
+        "avghr", "maxhr", "avgspeed", "maxspeed", "avgcadence", "maxcadence",
+        "elevationgain", "elevationloss", "startlat", "startlng", "endlat", "endlng",
+        "trainingeffect", "anaerobiceffect", "avgpower", "maxpower", "vo2max", "rawjson",
+    )
+    # 已存在活动覆盖除主键外的全部字段(写入的总是含详情字段的完整汇总)
+    ACTIVITY_UPDATE_COLUMNS = tuple(c for c in ACTIVITY_COLUMNS if c != "activityid")
+
     def upsert_activity(self, data: dict):
         """插入或更新活动汇总"""
-        sql = """
-            INSERT INTO garmin_activity
-                (activityid, activityname, activitytype, sporttype,
-                 starttime, endtime, duration, distance, calories,
-                 avghr, maxhr, avgspeed, maxspeed, avgcadence, maxcadence,
-                 elevationgain, elevationloss, startlat, startlng, endlat, endlng,
-                 trainingeffect, anaerobiceffect, avgpower, maxpower, vo2max, rawjson)
-            VALUES
-                (%(activityid)s, %(activityname)s, %(activitytype)s, %(sporttype)s,
-                 %(starttime)s, %(endtime)s, %(duration)s, %(distance)s, %(calories)s,
-                 %(avghr)s, %(maxhr)s, %(avgspeed)s, %(maxspeed)s, %(avgcadence)s, %(maxcadence)s,
-                 %(elevationgain)s, %(elevationloss)s, %(startlat)s, %(startlng)s, %(endlat)s, %(endlng)s,
-                 %(trainingeffect)s, %(anaerobiceffect)s, %(avgpower)s, %(maxpower)s, %(vo2max)s, %(rawjson)s)
-            ON CONFLICT (activityid) DO UPDATE SET
-                activityname = EXCLUDED.activityname,
-                duration = EXCLUDED.duration,
-                distance = EXCLUDED.distance,
-                calories = EXCLUDED.calories,
-                avghr = EXCLUDED.avghr,
-                maxhr = EXCLUDED.maxhr,
-                avgspeed = EXCLUDED.avgspeed,
-                maxspeed = EXCLUDED.maxspeed,
-                rawjson = EXCLUDED.rawjson
+        self.batch_upsert_activities([data], update=True)
+
+    def batch_upsert_activities(self, rows: list, update: bool = False, page_size: int = 500) -> set:
+        """多行写入活动汇总，返回本次新插入的活动id
+
+        update=False 时已存在的活动保持不变(ON CONFLICT DO NOTHING)，update=True 时覆盖除主键外的全部字段。
         """
-        conn = self._get_conn()
-        try:
-            with conn.cursor() as cur:
-                cur.execute(sql, data)
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"活动汇总写入失败: {e}")
-            raise
+        if not rows:
+            return set()
+        columns = ", ".join(self.ACTIVITY_COLUMNS)
+        if update:
+            conflict = "DO UPDATE SET " + ", ".join(f"{c} = EXCLUDED.{c}" for c in self.ACTIVITY_UPDATE_COLUMNS)
+        else:
+            conflict = "DO NOTHING"
+        sql = f"""
+            INSERT INTO garmin_activity ({columns})
+            VALUES %s
+            ON CONFLICT (activityid) {conflict}
+            RETURNING activityid, (xmax = 0) AS inserted
+        """
+        template = "(" + ", ".join(f"%({c})s" for c in self.ACTIVITY_COLUMNS) + ")"
+        returned = self._write("garmin_activity", sql, values=rows, page_size=page_size,
+                               template=template, fetch=True, error="活动汇总写入失败")
+        new_ids = {aid for aid, inserted in returned if inserted}
+        for data in rows:
+            if update or data["activityid"] in new_ids:
+                self.touched_activities.add(data["activityid"])
+                if data.get("starttime"):
+                    self.touched_dates.add(str(data["starttime"])[:10])
+        return new_ids
 
     # ==================== 活动详情(GPS轨迹点) ====================
 
-    def batch_upsert_activity_details(self, activity_id: str, points: list):
-        """批量插入活动轨迹点"""
+    def batch_upsert_activity_details(self, activity_id: str, points: list) -> int:
+        """批量插入活动轨迹点(已有的点跳过)，返回实际写入行数"""
         if not points:
-            return
+            return 0
         sql = """
             INSERT INTO garmin_activity_detail
                 (activityid, pointtime, latitude, longitude, elevation,
@@ -114,17 +430,189 @@ class GarminDatabase:
                 p.get("distance"),
             ))
         if not values:
-            return
-        conn = self._get_conn()
-        try:
-            with conn.cursor() as cur:
-                execute_values(cur, sql, values, page_size=500)
-            conn.commit()
-            logger.info(f"活动 {activity_id} 写入 {len(values)} 个轨迹点")
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"活动详情写入失败 {activity_id}: {e}")
-            raise
+            return 0
+        rows = self._write("garmin_activity_detail", sql, values=values, error=f"活动详情写入失败 {activity_id}")
+        self.touched_activities.add(activity_id)
+        logger.info(f"活动 {activity_id} 写入 {len(values)} 个轨迹点")
+        return rows
+
+    # ==================== 轨迹 LOD ====================
+
+    def upsert_track_lods(self, activity_id: str, lods: list):
+        """写入各级别抽稀轨迹 lods: [(zoomlevel, tolerance, pointcount, polyline), ...]"""
+        sql = """
+            INSERT INTO garmin_activity_track_lod (activityid, zoomlevel, tolerance, pointcount, polyline)
+            VALUES %s
+            ON CONFLICT (activityid, zoomlevel) DO UPDATE SET
+                tolerance = EXCLUDED.tolerance,
+                pointcount = EXCLUDED.pointcount,
+                polyline = EXCLUDED.polyline
+        """
+        values = [(activity_id, zoom, tol, count, encoded) for zoom, tol, count, encoded in lods]
+        self._write("garmin_activity_track_lod", sql, values=values, error=f"轨迹LOD写入失败 {activity_id}")
+        self.touched_activities.add(activity_id)
+
+    def get_track_lod(self, activity_id: str, zoom: int):
+        """取不超过 zoom 的最精细级别(没有则取最粗级别)，返回 {zoomlevel, pointcount, polyline}"""
+        sql = """
+            SELECT zoomlevel, pointcount, polyline FROM garmin_activity_track_lod
+            WHERE activityid = %s
+            ORDER BY zoomlevel <= %s DESC,
+                     CASE WHEN zoomlevel <= %s THEN -zoomlevel ELSE zoomlevel END
+            LIMIT 1
+        """
+        rows = self._fetchall(sql, (activity_id, zoom, zoom), dict_rows=True)
+        return rows[0] if rows else None
+
+    def activities_without_lod(self) -> list:
+        """有轨迹点但尚未生成 LOD 的活动id"""
+        sql = """
+            SELECT a.activityid FROM garmin_activity a
+            WHERE EXISTS (SELECT 1 FROM garmin_activity_detail d WHERE d.activityid = a.activityid)
+              AND NOT EXISTS (SELECT 1 FROM garmin_activity_track_lod l WHERE l.activityid = a.activityid)
+            ORDER BY a.starttime DESC
+        """
+        return [r[0] for r in self._fetchall(sql)]
+
+    # ==================== 活动空间索引(PostGIS) ====================
+
+    def upsert_activity_geom(self, activity_id: str):
+        """由已入库轨迹点在服务端生成轨迹线/外包框/起点，返回写入行数(少于 2 个点时为 0)"""
+        sql = """
+            WITH pts AS (
+                SELECT ST_MakeLine(ST_SetSRID(ST_MakePoint(longitude::float8, latitude::float8), 4326)
+                                   ORDER BY pointtime) AS track,
+                       count(*) AS n
+                FROM garmin_activity_detail
+                WHERE activityid = %(aid)s AND latitude IS NOT NULL AND longitude IS NOT NULL
+                HAVING count(*) >= 2
+            )
+            INSERT INTO garmin_activity_geom (activityid, track, bbox, startpoint, pointcount)
+            SELECT %(aid)s, p.track,
+                   ST_MakeEnvelope(ST_XMin(p.track), ST_YMin(p.track), ST_XMax(p.track), ST_YMax(p.track), 4326),
+                   coalesce(ST_SetSRID(ST_MakePoint(a.startlng::float8, a.startlat::float8), 4326),
+                            ST_StartPoint(p.track))::geography,
+                   p.n
+            FROM pts p
+            LEFT JOIN garmin_activity a ON a.activityid = %(aid)s
+            ON CONFLICT (activityid) DO UPDATE SET
+                track = EXCLUDED.track,
+                bbox = EXCLUDED.bbox,
+                startpoint = EXCLUDED.startpoint,
+                pointcount = EXCLUDED.pointcount
+        """
+        return self._write("garmin_activity_geom", sql, params={"aid": activity_id},
+                           error=f"活动空间数据写入失败 {activity_id}")
+
+    def activities_without_geom(self) -> list:
+        """有轨迹点但尚未生成空间数据的活动id"""
+        sql = """
+            SELECT a.activityid FROM garmin_activity a
+            WHERE EXISTS (SELECT 1 FROM garmin_activity_detail d WHERE d.activityid = a.activityid)
+              AND NOT EXISTS (SELECT 1 FROM garmin_activity_geom g WHERE g.activityid = a.activityid)
+            ORDER BY a.starttime DESC
+        """
+        return [r[0] for r in self._fetchall(sql)]
+
+    def _geo_query(self, where: str, params: dict, order: str = "a.starttime DESC", limit: int = 100) -> list:
+        sql = f"""
+            SELECT a.activityid, a.activityname, a.activitytype, a.starttime, a.distance,
+                   ST_Distance(g.startpoint, ST_SetSRID(ST_MakePoint(%(lng)s, %(lat)s), 4326)::geography)
+                       AS startdistance
+            FROM garmin_activity_geom g
+            JOIN garmin_activity a ON a.activityid = g.activityid
+            WHERE {where}
+            ORDER BY {order}
+            LIMIT %(limit)s
+        """
+        return self._fetchall(sql, {"lat": None, "lng": None, **params, "limit": limit}, dict_rows=True)
+
+    def find_activities_near(self, lat: float, lng: float, radius_m: float, limit: int = 100) -> list:
+        """起点在 (lat, lng) 半径 radius_m 米内的活动，按距离排序"""
+        return self._geo_query(
+            "ST_DWithin(g.startpoint, ST_SetSRID(ST_MakePoint(%(lng)s, %(lat)s), 4326)::geography, %(radius)s)",
+            {"lat": lat, "lng": lng, "radius": radius_m}, order="startdistance", limit=limit)
+
+    def find_activities_through(self, wkt: str = None, bbox: tuple = None, limit: int = 100) -> list:
+        """轨迹经过某区域的活动: wkt 为 WGS84 多边形，或 bbox=(min_lng, min_lat, max_lng, max_lat)"""
+        if wkt:
+            area = "ST_GeomFromText(%(wkt)s, 4326)"
+            params = {"wkt": wkt}
+        elif bbox:
+            area = "ST_MakeEnvelope(%(x1)s, %(y1)s, %(x2)s, %(y2)s, 4326)"
+            params = dict(zip(("x1", "y1", "x2", "y2"), bbox))
+        else:
+            raise ValueError("需指定区域 wkt 或 bbox")
+        # && 先用 GiST 索引按外包框过滤，ST_Intersects 再精确判断
+        return self._geo_query(f"g.track && {area} AND ST_Intersects(g.track, {area})", params, limit=limit)
+
+    # ==================== 训练负荷 ====================
+
+    def upsert_activity_load(self, data: dict):
+        """写入单次活动 TRIMP"""
+        sql = """
+            INSERT INTO garmin_activity_load (activityid, activitydate, trimp, method, hrseconds)
+            VALUES (%(activityid)s, %(activitydate)s, %(trimp)s, %(method)s, %(hrseconds)s)
+            ON CONFLICT (activityid) DO UPDATE SET
+                activitydate = EXCLUDED.activitydate,
+                trimp = EXCLUDED.trimp,
+                method = EXCLUDED.method,
+                hrseconds = EXCLUDED.hrseconds
+        """
+        self._write("garmin_activity_load", sql, params=data, error="活动负荷写入失败")
+
+    def latest_resting_hr(self, day: str):
+        """当日或之前最近一次静息心率"""
+        rows = self._fetchall("""
+            SELECT restinghr FROM garmin_heartrate
+            WHERE hrdate <= %s AND restinghr IS NOT NULL
+            ORDER BY hrdate DESC LIMIT 1
+        """, (day,))
+        return rows[0][0] if rows else None
+
+    def training_load_before(self, day):
+        """day 之前最近一条记录 (日期, ATL, CTL)，无记录时返回 None"""
+        rows = self._fetchall("""
+            SELECT loaddate, atl, ctl FROM garmin_training_load
+            WHERE loaddate < %s ORDER BY loaddate DESC LIMIT 1
+        """, (day,))
+        return (rows[0][0], float(rows[0][1]), float(rows[0][2])) if rows else None
+
+    def daily_activity_loads(self, start, end) -> dict:
+        """[start, end] 每日 TRIMP 合计 {date: trimp}"""
+        rows = self._fetchall("""
+            SELECT activitydate, sum(trimp) FROM garmin_activity_load
+            WHERE activitydate BETWEEN %s AND %s
+            GROUP BY activitydate
+        """, (start, end))
+        return {d: float(v) for d, v in rows}
+
+    def upsert_training_load(self, rows: list):
+        """rows: [(loaddate, dailyload, atl, ctl, tsb), ...]"""
+        sql = """
+            INSERT INTO garmin_training_load (loaddate, dailyload, atl, ctl, tsb)
+            VALUES %s
+            ON CONFLICT (loaddate) DO UPDATE SET
+                dailyload = EXCLUDED.dailyload,
+                atl = EXCLUDED.atl,
+                ctl = EXCLUDED.ctl,
+                tsb = EXCLUDED.tsb
+        """
+        return self._write("garmin_training_load", sql, values=rows, error="训练负荷写入失败")
+
+    def activities_without_load(self) -> list:
+        """尚未计算负荷的活动"""
+        return self._fetchall("""
+            SELECT a.activityid, a.starttime, a.duration, a.avghr FROM garmin_activity a
+            WHERE NOT EXISTS (SELECT 1 FROM garmin_activity_load l WHERE l.activityid = a.activityid)
+            ORDER BY a.starttime
+        """, dict_rows=True)
+
+    def recent_training_load(self, days: int = 30) -> list:
+        return self._fetchall("""
+            SELECT loaddate, dailyload, atl, ctl, tsb FROM garmin_training_load
+            ORDER BY loaddate DESC LIMIT %s
+        """, (days,), dict_rows=True)
 
     # ==================== 睡眠 ====================
 
@@ -150,47 +638,32 @@ class GarminDatabase:
                 sleepscore = EXCLUDED.sleepscore,
                 rawjson = EXCLUDED.rawjson
         """
-        conn = self._get_conn()
-        try:
-            with conn.cursor() as cur:
-                cur.execute(sql, data)
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"睡眠数据写入失败: {e}")
-            raise
+        self._write("garmin_sleep", sql, params=data, error="睡眠数据写入失败")
 
     # ==================== 睡眠明细(阶段) ====================
 
-    def batch_upsert_sleep_details(self, sleep_date: str, levels: list):
-        """批量插入睡眠阶段数据 levels: [{startGMT, endGMT, activityLevel}, ...]"""
-        if not levels:
-            return
-        sql = """
-            INSERT INTO garmin_sleep_detail (sleepdate, starttime, endtime, activitylevel)
-            VALUES %s
-            ON CONFLICT (sleepdate, starttime) DO NOTHING
-        """
+    @staticmethod
+    def _sleep_detail_values(sleep_date, levels):
         values = []
-        for lv in levels:
+        for lv in levels or []:
             start = lv.get("startGMT")
             end = lv.get("endGMT")
             al = lv.get("activityLevel")
             if start is None or al is None:
                 continue
             values.append((sleep_date, start, end, al))
+        return values
+
+    def batch_upsert_sleep_details(self, sleep_date: str, levels: list):
+        """批量插入睡眠阶段数据 levels: [{startGMT, endGMT, activityLevel}, ...]"""
+        if not levels:
+            return
+        values = self._sleep_detail_values(sleep_date, levels)
         if not values:
             return
-        conn = self._get_conn()
-        try:
-            with conn.cursor() as cur:
-                execute_values(cur, sql, values, page_size=500)
-            conn.commit()
-            logger.info(f"睡眠明细 {sleep_date} 写入 {len(values)} 条")
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"睡眠明细写入失败 {sleep_date}: {e}")
-            raise
+        self._write("garmin_sleep_detail", self.DETAIL_SQL["sleep"], values=values,
+                    error=f"睡眠明细写入失败 {sleep_date}")
+        logger.info(f"睡眠明细 {sleep_date} 写入 {len(values)} 条")
 
     # ==================== 心率汇总 ====================
 
@@ -204,48 +677,31 @@ class GarminDatabase:
                 minhr = EXCLUDED.minhr,
                 rawjson = EXCLUDED.rawjson
         """
-        conn = self._get_conn()
-        try:
-            with conn.cursor() as cur:
-                cur.execute(sql, data)
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"心率汇总写入失败: {e}")
-            raise
+        self._write("garmin_heartrate", sql, params=data, error="心率汇总写入失败")
 
     # ==================== 心率时序明细 ====================
 
-    def batch_upsert_heartrate_details(self, hr_date: str, points: list):
-        """批量插入心率时序数据 points: [[timestamp_ms, hr_value], ...]"""
-        if not points:
-            return
-        sql = """
-            INSERT INTO garmin_heartrate_detail (hrdate, pointtime, heartrate)
-            VALUES %s
-            ON CONFLICT (hrdate, pointtime) DO NOTHING
-        """
+    @classmethod
+    def _heartrate_detail_values(cls, hr_date, points):
         values = []
-        for p in points:
+        for p in points or []:
             if p is None or len(p) < 2 or p[1] is None:
                 continue
-            pt = self._ts_to_dt(p[0])
+            pt = cls._ts_to_dt(p[0])
             if pt is None:
                 continue
             values.append((hr_date, pt, int(p[1])))
+        return values
 
-        if not values:
+    def batch_upsert_heartrate_details(self, hr_date: str, points: list):
+        """批量插入心率时序数据 points: [[timestamp_ms, hr_value], ...]"""
+        if not points:
             return
-        conn = self._get_conn()
-        try:
-            with conn.cursor() as cur:
-                execute_values(cur, sql, values, page_size=500)
-            conn.commit()
-            logger.info(f"心率明细 {hr_date} 写入 {len(values)} 条")
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"心率明细写入失败 {hr_date}: {e}")
-            raise
+        ts, vals = self._series_arrays(points, int)
+        if not ts:
+            return
+        self._write_series("heartrate", hr_date, ts, vals, error=f"心率明细写入失败 {hr_date}")
+        logger.info(f"心率明细 {hr_date} 写入 {len(ts)} 条")
 
     # ==================== 压力汇总 ====================
 
@@ -259,53 +715,42 @@ class GarminDatabase:
                  %(mediumduration)s, %(highduration)s, %(stressscore)s, %(rawjson)s)
             ON CONFLICT (stressdate) DO UPDATE SET
                 overalllevel = EXCLUDED.overalllevel,
+                restduration = EXCLUDED.restduration,
+                lowduration = EXCLUDED.lowduration,
+                mediumduration = EXCLUDED.mediumduration,
+                highduration = EXCLUDED.highduration,
+                stressscore = EXCLUDED.stressscore,
                 rawjson = EXCLUDED.rawjson
         """
-        conn = self._get_conn()
-        try:
-            with conn.cursor() as cur:
-                cur.execute(sql, data)
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"压力汇总写入失败: {e}")
-            raise
+        self._write("garmin_stress", sql, params=data, error="压力汇总写入失败")
 
     # ==================== 压力时序明细 ====================
 
-    def batch_upsert_stress_details(self, stress_date: str, points: list):
-        """批量插入压力时序数据 points: [[timestamp_ms, stress_level], ...]"""
-        if not points:
-            return
-        sql = """
-            INSERT INTO garmin_stress_detail (stressdate, pointtime, stresslevel)
-            VALUES %s
-            ON CONFLICT (stressdate, pointtime) DO NOTHING
-        """
+    @classmethod
+    def _stress_detail_values(cls, stress_date, points):
         values = []
-        for p in points:
+        for p in points or []:
             if p is None or len(p) < 2 or p[1] is None:
                 continue
             # 压力值 -1/-2 代表无数据/休息，跳过
             if p[1] < 0:
                 continue
-            pt = self._ts_to_dt(p[0])
+            pt = cls._ts_to_dt(p[0])
             if pt is None:
                 continue
             values.append((stress_date, pt, int(p[1])))
+        return values
 
-        if not values:
+    def batch_upsert_stress_details(self, stress_date: str, points: list):
+        """批量插入压力时序数据 points: [[timestamp_ms, stress_level], ...]"""
+        if not points:
             return
-        conn = self._get_conn()
-        try:
-            with conn.cursor() as cur:
-                execute_values(cur, sql, values, page_size=500)
-            conn.commit()
-            logger.info(f"压力明细 {stress_date} 写入 {len(values)} 条")
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"压力明细写入失败 {stress_date}: {e}")
-            raise
+        # 压力值 -1/-2 代表无数据/休息，跳过
+        ts, vals = self._series_arrays(points, int, min_value=0)
+        if not ts:
+            return
+        self._write_series("stress", stress_date, ts, vals, error=f"压力明细写入失败 {stress_date}")
+        logger.info(f"压力明细 {stress_date} 写入 {len(ts)} 条")
 
     # ==================== 血氧 ====================
 
@@ -318,28 +763,20 @@ class GarminDatabase:
                 lowspo2 = EXCLUDED.lowspo2,
                 rawjson = EXCLUDED.rawjson
         """
-        conn = self._get_conn()
-        try:
-            with conn.cursor() as cur:
-                cur.execute(sql, data)
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"血氧数据写入失败: {e}")
-            raise
+        self._write("garmin_spo2", sql, params=data, error="血氧数据写入失败")
 
     # ==================== 血氧明细(时序) ====================
 
-    def batch_upsert_spo2_details(self, spo2_date: str, data: dict):
-        """批量插入血氧时序数据，从多个来源合并"""
+    @classmethod
+    def _spo2_detail_values(cls, spo2_date, data, include_hourly=True):
         values = []
 
         # spO2HourlyAverages: [[timestamp_ms, value], ...]
-        hourly = data.get("spO2HourlyAverages")
+        hourly = data.get("spO2HourlyAverages") if include_hourly else None
         if hourly and isinstance(hourly, list):
             for p in hourly:
                 if p and len(p) >= 2 and p[1] is not None:
-                    pt = self._ts_to_dt(p[0])
+                    pt = cls._ts_to_dt(p[0])
                     if pt:
                         values.append((spo2_date, pt, float(p[1]), "hourly"))
 
@@ -350,26 +787,23 @@ class GarminDatabase:
                 ts = p.get("readingTimeGMT")
                 val = p.get("spo2")
                 if ts and val:
-                    pt = self._ts_to_dt(ts) if isinstance(ts, (int, float)) else ts
+                    pt = cls._ts_to_dt(ts) if isinstance(ts, (int, float)) else ts
                     values.append((spo2_date, pt, float(val), "continuous"))
+        return values
 
-        if not values:
-            return
-        sql = """
-            INSERT INTO garmin_spo2_detail (spo2date, pointtime, spo2value, readingsource)
-            VALUES %s
-            ON CONFLICT (spo2date, pointtime) DO NOTHING
-        """
-        conn = self._get_conn()
-        try:
-            with conn.cursor() as cur:
-                execute_values(cur, sql, values, page_size=500)
-            conn.commit()
-            logger.info(f"血氧明细 {spo2_date} 写入 {len(values)} 条")
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"血氧明细写入失败 {spo2_date}: {e}")
-            raise
+    def batch_upsert_spo2_details(self, spo2_date: str, data: dict):
+        """批量插入血氧时序数据，从多个来源合并"""
+        hourly = data.get("spO2HourlyAverages")
+        ts, vals = self._series_arrays(hourly if isinstance(hourly, list) else None, float)
+        if ts:
+            self._write_series("spo2", spo2_date, ts, vals, error=f"血氧明细写入失败 {spo2_date}")
+        # 连续读数时间可能是字符串，仍按行写入
+        values = self._spo2_detail_values(spo2_date, data, include_hourly=False)
+        if values:
+            self._write("garmin_spo2_detail", self.DETAIL_SQL["spo2"], values=values,
+                        error=f"血氧明细写入失败 {spo2_date}")
+        if ts or values:
+            logger.info(f"血氧明细 {spo2_date} 写入 {len(ts) + len(values)} 条")
 
     # ==================== 呼吸 ====================
 
@@ -385,48 +819,31 @@ class GarminDatabase:
                 avgsleeping = EXCLUDED.avgsleeping,
                 rawjson = EXCLUDED.rawjson
         """
-        conn = self._get_conn()
-        try:
-            with conn.cursor() as cur:
-                cur.execute(sql, data)
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"呼吸数据写入失败: {e}")
-            raise
+        self._write("garmin_respiration", sql, params=data, error="呼吸数据写入失败")
 
     # ==================== 呼吸明细(时序) ====================
 
-    def batch_upsert_respiration_details(self, resp_date: str, points: list):
-        """批量插入呼吸时序数据 points: [[timestamp_ms, resp_value], ...]"""
-        if not points:
-            return
-        sql = """
-            INSERT INTO garmin_respiration_detail (respdate, pointtime, respvalue)
-            VALUES %s
-            ON CONFLICT (respdate, pointtime) DO NOTHING
-        """
+    @classmethod
+    def _respiration_detail_values(cls, resp_date, points):
         values = []
-        for p in points:
+        for p in points or []:
             if p is None or len(p) < 2 or p[1] is None:
                 continue
-            pt = self._ts_to_dt(p[0])
+            pt = cls._ts_to_dt(p[0])
             if pt is None:
                 continue
             values.append((resp_date, pt, float(p[1])))
+        return values
 
-        if not values:
+    def batch_upsert_respiration_details(self, resp_date: str, points: list):
+        """批量插入呼吸时序数据 points: [[timestamp_ms, resp_value], ...]"""
+        if not points:
             return
-        conn = self._get_conn()
-        try:
-            with conn.cursor() as cur:
-                execute_values(cur, sql, values, page_size=500)
-            conn.commit()
-            logger.info(f"呼吸明细 {resp_date} 写入 {len(values)} 条")
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"呼吸明细写入失败 {resp_date}: {e}")
-            raise
+        ts, vals = self._series_arrays(points, float)
+        if not ts:
+            return
+        self._write_series("respiration", resp_date, ts, vals, error=f"呼吸明细写入失败 {resp_date}")
+        logger.info(f"呼吸明细 {resp_date} 写入 {len(ts)} 条")
 
     # ==================== HRV ====================
 
@@ -445,29 +862,26 @@ class GarminDatabase:
                 lastnightavg = EXCLUDED.lastnightavg,
                 rawjson = EXCLUDED.rawjson
         """
-        conn = self._get_conn()
-        try:
-            with conn.cursor() as cur:
-                cur.execute(sql, data)
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            logger.error(f"HRV数据写入失败: {e}")
-            raise
+        self._write("garmin_hrv", sql, params=data, error="HRV数据写入失败")
 
     # ==================== 活动去重 ====================
 
     def activity_exists(self, activity_id: str) -> bool:
         """检查活动是否已存在"""
         sql = "SELECT 1 FROM garmin_activity WHERE activityid = %s"
-        conn = self._get_conn()
         try:
-            with conn.cursor() as cur:
-                cur.execute(sql, (activity_id,))
-                return cur.fetchone() is not None
+            return bool(self._fetchall(sql, (activity_id,)))
         except Exception:
             return False
 
+    def existing_activity_ids(self, activity_ids: list) -> set:
+        """一次查询多个活动id中已入库的"""
+        if not activity_ids:
+            return set()
+        rows = self._fetchall("SELECT activityid FROM garmin_activity WHERE activityid = ANY(%s)",
+                              (list(activity_ids),))
+        return {r[0] for r in rows}
+
     # ==================== 同步记录 ====================
 
     def upsert_sync(self, datasource: str, datatype: str, datadate: str,
@@ -480,22 +894,57 @@ class GarminDatabase:
                 syncstatus = EXCLUDED.syncstatus,
                 errmessage = EXCLUDED.errmessage
         """
-        conn = self._get_conn()
+        self._write("garmin_sync", sql, params={
+            "datasource": datasource,
+            "datatype": datatype,
+            "datadate": datadate,
+            "dataid": dataid,
+            "syncstatus": status,
+            "errmessage": errmsg,
+        }, error="同步记录写入失败")
+        if status == 1:
+            self.touched_dates.add(str(datadate)[:10])
+
+    def upsert_syncs(self, datasource: str, datatype: str, dates: list,
+                     status: int = 1, errmsg: str = None) -> int:
+        """多个日期的同步记录一次写入"""
+        if not dates:
+            return 0
+        sql = """
+            INSERT INTO garmin_sync (datasource, datatype, datadate, syncstatus, errmessage)
+            VALUES %s
+            ON CONFLICT (datasource, datatype, datadate) DO UPDATE SET
+                syncstatus = EXCLUDED.syncstatus,
+                errmessage = EXCLUDED.errmessage
+        """
+        rows = self._write("garmin_sync", sql, values=[(datasource, datatype, d, status, errmsg) for d in dates],
+                           error="同步记录写入失败")
+        if status == 1:
+            self.touched_dates.update(str(d)[:10] for d in dates)
+        return rows
+
+    def sync_states(self, datasource: str, datatype: str, dates: list) -> dict:
+        """一次查询多个日期的同步状态 {日期字符串: syncstatus}"""
+        if not dates:
+            return {}
+        rows = self._fetchall("""
+            SELECT datadate::text, syncstatus FROM garmin_sync
+            WHERE datasource = %s AND datatype = %s AND datadate = ANY(%s::date[])
+        """, (datasource, datatype, list(dates)))
+        return dict(rows)
+
+    def latest_synced_dates(self, datasource: str = "garmin") -> dict:
+        """各数据类型最新同步成功的日期 {datatype: date}"""
+        sql = """
+            SELECT datatype, max(datadate) FROM garmin_sync
+            WHERE datasource = %s AND syncstatus = 1
+            GROUP BY datatype
+        """
         try:
-            with conn.cursor() as cur:
-                cur.execute(sql, {
-                    "datasource": datasource,
-                    "datatype": datatype,
-                    "datadate": datadate,
-                    "dataid": dataid,
-                    "syncstatus": status,
-                    "errmessage": errmsg,
-                })
-            conn.commit()
+            return dict(self._fetchall(sql, (datasource,)))
         except Exception as e:
-            conn.rollback()
-            logger.error(f"同步记录写入失败: {e}")
-            raise
+            logger.warning(f"同步进度查询失败: {e}")
+            return {}
 
     def is_synced(self, datasource: str, datatype: str, datadate: str) -> bool:
         """检查某日数据是否已同步"""
@@ -503,10 +952,383 @@ class GarminDatabase:
             SELECT 1 FROM garmin_sync
             WHERE datasource = %s AND datatype = %s AND datadate = %s AND syncstatus = 1
         """
-        conn = self._get_conn()
         try:
-            with conn.cursor() as cur:
-                cur.execute(sql, (datasource, datatype, datadate))
-                return cur.fetchone() is not None
+            return bool(self._fetchall(sql, (datasource, datatype, datadate)))
         except Exception:
             return False
+
+    # ==================== 每日汇总 / 小时汇总 ====================
+
+    def refresh_detail_hourly(self, dates: list) -> int:
+        """按明细重算触及日期所在小时的汇总(跨日的小时整体重算)，返回写入行数"""
+        total = 0
+        for dtype, (table, datecol, valuecol) in self.HOURLY_SOURCES.items():
+            sql = f"""
+                WITH hours AS (
+                    SELECT DISTINCT date_trunc('hour', pointtime) AS pointhour
+                    FROM {table} WHERE {datecol} = ANY(%(dates)s::date[])
+                )
+                INSERT INTO garmin_detail_hourly (datatype, pointhour, samples, minvalue, avgvalue, maxvalue)
+                SELECT %(dtype)s, date_trunc('hour', t.pointtime), count(*),
+                       min(t.{valuecol}), avg(t.{valuecol}), max(t.{valuecol})
+                FROM {table} t
+                WHERE t.{datecol} BETWEEN %(lo)s::date - 1 AND %(hi)s::date + 1
+                  AND date_trunc('hour', t.pointtime) IN (SELECT pointhour FROM hours)
+                GROUP BY 2
+                ON CONFLICT (datatype, pointhour) DO UPDATE SET
+                    samples = EXCLUDED.samples,
+                    minvalue = EXCLUDED.minvalue,
+                    avgvalue = EXCLUDED.avgvalue,
+                    maxvalue = EXCLUDED.maxvalue
+            """
+            total += self._write("garmin_detail_hourly", sql, params={
+                "dtype": dtype, "dates": dates, "lo": min(dates), "hi": max(dates),
+            }, error=f"{dtype} 小时汇总刷新失败")
+        return total
+
+    def refresh_daily_rollup(self, dates: list) -> int:
+        """按各汇总表重算触及日期的每日汇总宽表，返回写入行数"""
+        sql = """
+            INSERT INTO garmin_daily_rollup
+                (rollupdate, restinghr, minhr, maxhr, avghr, hrsamples,
+                 totalsleep, deepsleep, lightsleep, remsleep, awaketime, sleepscore,
+                 stresslevel, stressscore, reststress, highstress,
+                 avgspo2, lowspo2, avgwakingresp, avgsleepingresp,
+                 hrvlastnight, hrvweekly, hrvstatus,
+                 activities, activityduration, activitydistance, activitycalories)
+            SELECT d.day, hr.restinghr, hr.minhr, hr.maxhr, hd.avghr, hd.samples,
+                   sl.totalsleep, sl.deepsleep, sl.lightsleep, sl.remsleep, sl.awaketime, sl.sleepscore,
+                   st.overalllevel, st.stressscore, st.restduration, st.highduration,
+                   sp.avgspo2, sp.lowspo2, rp.avgwaking, rp.avgsleeping,
+                   hv.lastnightavg, hv.weeklyavg, hv.hrvstatus,
+                   act.n, act.duration, act.distance, act.calories
+            FROM unnest(%(dates)s::date[]) AS d(day)
+            LEFT JOIN garmin_heartrate hr ON hr.hrdate = d.day
+            LEFT JOIN garmin_sleep sl ON sl.sleepdate = d.day
+            LEFT JOIN garmin_stress st ON st.stressdate = d.day
+            LEFT JOIN garmin_spo2 sp ON sp.spo2date = d.day
+            LEFT JOIN garmin_respiration rp ON rp.respdate = d.day
+            LEFT JOIN garmin_hrv hv ON hv.hrvdate = d.day
+            LEFT JOIN LATERAL (
+                SELECT avg(heartrate) AS avghr, nullif(count(*), 0) AS samples
+                FROM garmin_heartrate_detail WHERE hrdate = d.day
+            ) hd ON true
+            LEFT JOIN LATERAL (
+                SELECT count(*) AS n, sum(duration) AS duration, sum(distance) AS distance,
+                       sum(calories) AS calories
+                FROM garmin_activity WHERE starttime >= d.day AND starttime < d.day + 1
+            ) act ON true
+            ON CONFLICT (rollupdate) DO UPDATE SET
+                restinghr = EXCLUDED.restinghr,
+                minhr = EXCLUDED.minhr,
+                maxhr = EXCLUDED.maxhr,
+                -- 明细已归档时保留原值
+                avghr = coalesce(EXCLUDED.avghr, garmin_daily_rollup.avghr),
+                hrsamples = coalesce(EXCLUDED.hrsamples, garmin_daily_rollup.hrsamples),
+                totalsleep = EXCLUDED.totalsleep,
+                deepsleep = EXCLUDED.deepsleep,
+                lightsleep = EXCLUDED.lightsleep,
+                remsleep = EXCLUDED.remsleep,
+                awaketime = EXCLUDED.awaketime,
+                sleepscore = EXCLUDED.sleepscore,
+                stresslevel = EXCLUDED.stresslevel,
+                stressscore = EXCLUDED.stressscore,
+                reststress = EXCLUDED.reststress,
+                highstress = EXCLUDED.highstress,
+                avgspo2 = EXCLUDED.avgspo2,
+                lowspo2 = EXCLUDED.lowspo2,
+                avgwakingresp = EXCLUDED.avgwakingresp,
+                avgsleepingresp = EXCLUDED.avgsleepingresp,
+                hrvlastnight = EXCLUDED.hrvlastnight,
+                hrvweekly = EXCLUDED.hrvweekly,
+                hrvstatus = EXCLUDED.hrvstatus,
+                activities = EXCLUDED.activities,
+                activityduration = EXCLUDED.activityduration,
+                activitydistance = EXCLUDED.activitydistance,
+                activitycalories = EXCLUDED.activitycalories
+        """
+        return self._write("garmin_daily_rollup", sql, params={"dates": dates},
+                           error="每日汇总刷新失败")
+
+    def refresh_rollups(self, dates=None, chunk_days=31) -> int:
+        """刷新指定日期(默认本连接写入过的日期)的小时汇总与每日汇总，返回刷新天数"""
+        pending = dates is None
+        if pending:
+            dates = set(self.touched_dates)
+        days = sorted({str(d)[:10] for d in dates})
+        for i in range(0, len(days), chunk_days):
+            chunk = days[i:i + chunk_days]
+            with self.transaction():
+                self.refresh_detail_hourly(chunk)
+                self.refresh_daily_rollup(chunk)
+                self.record_change("garmin", "daily_rollup", dates=chunk)
+        # 刷新成功后才清除，失败的日期留待下次
+        if pending:
+            self.touched_dates -= dates
+        return len(days)
+
+    # ==================== 只读查询(查询服务) ====================
+
+    # 查询服务返回的活动汇总字段
+    ACTIVITY_LIST_COLUMNS = (
+        "activityid", "activityname", "activitytype", "starttime", "endtime", "duration",
+        "distance", "calories", "avghr", "maxhr", "avgspeed", "elevationgain",
+        "trainingeffect", "avgpower",
+    )
+
+    def daily_rollups(self, dates: list) -> dict:
+        """多个日期的每日汇总宽表行 {日期字符串: 行}"""
+        rows = self._fetchall("""
+            SELECT * FROM garmin_daily_rollup WHERE rollupdate = ANY(%s::date[])
+        """, (list(dates),), dict_rows=True)
+        result = {}
+        for row in rows:
+            for col in ("id", "createdat", "updatedat"):
+                row.pop(col, None)
+            result[str(row["rollupdate"])] = row
+        return result
+
+    def detail_series(self, dtype: str, dates: list) -> dict:
+        """多个日期的明细时序 {日期字符串: [(毫秒时间戳, 数值), ...]}"""
+        table, datecol, valuecol = self.HOURLY_SOURCES[dtype]
+        rows = self._fetchall(f"""
+            SELECT {datecol}::text, (extract(epoch FROM pointtime) * 1000)::bigint, {valuecol}
+            FROM {table} WHERE {datecol} = ANY(%s::date[])
+            ORDER BY {datecol}, pointtime
+        """, (list(dates),))
+        result = {}
+        for day, ts, value in rows:
+            result.setdefault(day, []).append((ts, value))
+        return result
+
+    def hourly_series(self, dtype: str, dates: list) -> dict:
+        """多个日期的小时汇总 {日期字符串: [(毫秒时间戳, 最小, 平均, 最大, 样本数), ...]}"""
+        rows = self._fetchall("""
+            SELECT pointhour::date::text, (extract(epoch FROM pointhour) * 1000)::bigint,
+                   minvalue, avgvalue, maxvalue, samples
+            FROM garmin_detail_hourly
+            WHERE datatype = %(dtype)s AND pointhour >= %(lo)s::date AND pointhour < %(hi)s::date + 1
+              AND pointhour::date = ANY(%(dates)s::date[])
+            ORDER BY pointhour
+        """, {"dtype": dtype, "dates": list(dates), "lo": min(dates), "hi": max(dates)})
+        result = {}
+        for day, ts, lo, avg, hi, samples in rows:
+            result.setdefault(day, []).append((ts, lo, avg, hi, samples))
+        return result
+
+    def activities_on(self, dates: list) -> dict:
+        """多个日期开始的活动汇总 {日期字符串: [行, ...]}"""
+        columns = ", ".join(self.ACTIVITY_LIST_COLUMNS)
+        rows = self._fetchall(f"""
+            SELECT starttime::date::text AS day, {columns} FROM garmin_activity
+            WHERE starttime >= %(lo)s::date AND starttime < %(hi)s::date + 1
+              AND starttime::date = ANY(%(dates)s::date[])
+            ORDER BY starttime
+        """, {"dates": list(dates), "lo": min(dates), "hi": max(dates)}, dict_rows=True)
+        result = {}
+        for row in rows:
+            result.setdefault(row.pop("day"), []).append(row)
+        return result
+
+    def activity_track(self, activity_id: str) -> list:
+        """活动完整轨迹 [(毫秒时间戳, 纬度, 经度, 海拔, 心率, 速度), ...]"""
+        return self._fetchall("""
+            SELECT (extract(epoch FROM pointtime) * 1000)::bigint, latitude, longitude,
+                   elevation, heartrate, speed
+            FROM garmin_activity_detail WHERE activityid = %s
+            ORDER BY pointtime
+        """, (activity_id,))
+
+    # ==================== 覆盖率缺口 ====================
+
+    def detail_coverage_gaps(self, datasource: str, datatype: str, table: str, datecol: str,
+                             start, end, expected: int, min_coverage: float,
+                             settle_hours: int, where: str = None) -> list:
+        """已同步但明细点数低于 expected * min_coverage 的日期 [(日期, 点数), ...]
+
+        只返回在当日结束后 settle_hours 小时内同步的日期(手表可能尚未上传完)，
+        之后同步仍稀疏的视为确实没有佩戴，不再重复获取。已冷归档(未恢复)月份的明细不在热表，不视为缺口。
+        """
+        sql = f"""
+            WITH days AS (
+                SELECT d::date AS day FROM generate_series(%(start)s::date, %(end)s::date, interval '1 day') d
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM garmin_archive a
+                    WHERE a.tablename = %(table)s AND a.status = 1
+                      AND a.archivemonth = date_trunc('month', d)::date
+                )
+            ), points AS (
+                SELECT {datecol} AS day, count(*) AS n FROM {table}
+                WHERE {datecol} BETWEEN %(start)s AND %(end)s {f"AND {where}" if where else ""}
+                GROUP BY {datecol}
+            )
+            SELECT days.day, coalesce(points.n, 0)
+            FROM days
+            JOIN garmin_sync s ON s.datasource = %(datasource)s AND s.datatype = %(datatype)s
+                AND s.datadate = days.day AND s.syncstatus = 1
+            LEFT JOIN points ON points.day = days.day
+            WHERE coalesce(points.n, 0) < %(expected)s * %(min_coverage)s
+              AND s.updatedat < days.day + 1 + %(settle_hours)s * interval '1 hour'
+            ORDER BY days.day DESC
+        """
+        return self._fetchall(sql, {
+            "datasource": datasource, "datatype": datatype, "table": table, "start": start, "end": end,
+            "expected": expected, "min_coverage": min_coverage, "settle_hours": settle_hours,
+        })
+
+    def failed_sync_dates(self, datasource: str, start, end) -> list:
+        """[start, end] 内同步失败(状态 0)的 [(类型, 日期), ...]"""
+        return self._fetchall("""
+            SELECT datatype, datadate FROM garmin_sync
+            WHERE datasource = %s AND syncstatus = 0 AND datadate BETWEEN %s AND %s
+            ORDER BY datatype, datadate DESC
+        """, (datasource, start, end))
+
+    # ==================== 回填任务 ====================
+
+    def plan_sync_jobs(self, jobs: list) -> int:
+        """登记回填任务 [(datasource, datatype, rangestart, rangeend), ...]，已存在的忽略，返回新增数"""
+        if not jobs:
+            return 0
+        sql = """
+            INSERT INTO garmin_sync_job (datasource, datatype, rangestart, rangeend)
+            VALUES %s
+            ON CONFLICT (datasource, datatype, rangestart) DO NOTHING
+            RETURNING id
+        """
+        return len(self._write("garmin_sync_job", sql, values=jobs, page_size=1000,
+                               fetch=True, error="回填任务登记失败"))
+
+    def requeue_sync_jobs(self, jobs: list) -> int:
+        """重新登记回填任务 [(datasource, datatype, rangestart, rangeend), ...]
+
+        同一起始日期已有已完成/失败的任务时重置为待领取(日期范围取并集)，待领取/执行中的不动，返回登记数
+        """
+        if not jobs:
+            return 0
+        sql = """
+            INSERT INTO garmin_sync_job (datasource, datatype, rangestart, rangeend)
+            VALUES %s
+            ON CONFLICT (datasource, datatype, rangestart) DO UPDATE SET
+                rangeend = greatest(garmin_sync_job.rangeend, EXCLUDED.rangeend),
+                jobstatus = 0,
+                attempts = 0,
+                workerid = NULL,
+                errmessage = NULL
+            WHERE garmin_sync_job.jobstatus IN (2, 3)
+            RETURNING id
+        """
+        return len(self._write("garmin_sync_job", sql, values=jobs, page_size=1000,
+                               fetch=True, error="回填任务重新登记失败"))
+
+    def claim_sync_job(self, datasource: str, worker_id: str, lease_seconds: int = 300,
+                       types: list = None, max_attempts: int = 3):
+        """领取一个回填任务
+
+        待领取、租约过期(心跳超时)或失败次数未超限的任务均可领取；
+        FOR UPDATE SKIP LOCKED 保证并发领取的进程/节点不会拿到同一任务。
+        """
+        sql = """
+            UPDATE garmin_sync_job j SET
+                jobstatus = 1, workerid = %(worker)s, claimedat = now(), heartbeat = now(),
+                attempts = j.attempts + 1, errmessage = NULL
+            WHERE j.id = (
+                SELECT id FROM garmin_sync_job
+                WHERE datasource = %(datasource)s
+                  AND (%(types)s::varchar[] IS NULL OR datatype = ANY(%(types)s::varchar[]))
+                  AND (jobstatus = 0
+                       OR (jobstatus = 1 AND heartbeat < now() - %(lease)s * interval '1 second')
+                       OR (jobstatus = 3 AND attempts < %(max_attempts)s))
+                ORDER BY jobstatus = 3, rangestart DESC, datatype
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING j.id, j.datatype, j.rangestart, j.rangeend, j.attempts
+        """
+        try:
+            rows = self._fetchall(sql, {
+                "worker": worker_id,
+                "datasource": datasource,
+                "types": list(types) if types else None,
+                "lease": lease_seconds,
+                "max_attempts": max_attempts,
+            }, dict_rows=True)
+        except Exception as e:
+            logger.error(f"回填任务领取失败: {e}")
+            raise
+        return rows[0] if rows else None
+
+    def heartbeat_sync_job(self, job_id: int, worker_id: str) -> bool:
+        """续约，返回 False 表示任务已被其他进程接管"""
+        sql = """
+            UPDATE garmin_sync_job SET heartbeat = now()
+            WHERE id = %s AND workerid = %s AND jobstatus = 1
+        """
+        return self._write("garmin_sync_job", sql, params=(job_id, worker_id),
+                           error="回填任务心跳失败") > 0
+
+    def finish_sync_job(self, job_id: int, worker_id: str, success: bool, errmsg: str = None) -> bool:
+        sql = """
+            UPDATE garmin_sync_job SET jobstatus = %s, heartbeat = now(), errmessage = %s
+            WHERE id = %s AND workerid = %s AND jobstatus = 1
+        """
+        return self._write("garmin_sync_job", sql, params=(2 if success else 3, errmsg, job_id, worker_id),
+                           error="回填任务状态更新失败") > 0
+
+    def sync_job_summary(self, datasource: str = "garmin") -> list:
+        """各类型回填任务按状态计数"""
+        sql = """
+            SELECT datatype, jobstatus, count(*) AS jobs,
+                   min(rangestart) AS rangestart, max(rangeend) AS rangeend,
+                   count(DISTINCT workerid) AS workers
+            FROM garmin_sync_job
+            WHERE datasource = %s
+            GROUP BY datatype, jobstatus
+            ORDER BY datatype, jobstatus
+        """
+        return self._fetchall(sql, (datasource,), dict_rows=True)
+
+    def try_advisory_lock(self, key: str) -> bool:
+        """会话级咨询锁(非阻塞)，连接关闭时自动释放；加锁与释放经同一写入连接"""
+        return self._fetchall("SELECT pg_try_advisory_lock(hashtext(%s))", (key,))[0][0]
+
+    def advisory_unlock(self, key: str):
+        try:
+            self._fetchall("SELECT pg_advisory_unlock(hashtext(%s))", (key,))
+        except Exception as e:
+            logger.warning(f"释放咨询锁失败: {e}")
+
+    # ==================== 运行日志 ====================
+
+    def insert_run_journal(self, data: dict):
+        sql = """
+            INSERT INTO garmin_run_journal
+                (datasource, startedat, finishedat, daysback, status, duration, stages,
+                 requests, apiseconds, bytesdownloaded, rowswritten, dbseconds, dbcommits, errmessage)
+            VALUES
+                (%(datasource)s, %(startedat)s, %(finishedat)s, %(daysback)s, %(status)s, %(duration)s,
+                 %(stages)s, %(requests)s, %(apiseconds)s, %(bytesdownloaded)s, %(rowswritten)s,
+                 %(dbseconds)s, %(dbcommits)s, %(errmessage)s)
+        """
+        self._write("garmin_run_journal", sql, params=data, error="运行日志写入失败")
+
+    def recent_run_journals(self, datasource: str = "garmin", limit: int = 100) -> list:
+        """最近运行记录(按开始时间倒序)"""
+        sql = """
+            SELECT * FROM garmin_run_journal
+            WHERE datasource = %s
+            ORDER BY startedat DESC
+            LIMIT %s
+        """
+        return self._fetchall(sql, (datasource, limit), dict_rows=True)
+
+
+def create_database(readonly=False):
+    """按配置 database.driver 创建数据库操作对象: psycopg2(默认) / pipeline(psycopg 3 管道模式)"""
+    driver = get_db_config().get("driver") or "psycopg2"
+    if driver == "pipeline":
+        from database_pipeline import PipelinedGarminDatabase
+        return PipelinedGarminDatabase(readonly=readonly)
+    if driver != "psycopg2":
+        raise ValueError(f"未知数据库驱动: {driver}，可选 psycopg2 / pipeline")
+    return GarminDatabase(readonly=readonly)
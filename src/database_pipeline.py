@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+psycopg 3 管道模式数据库写入
+接口与 GarminDatabase 相同(配置 database.driver: pipeline 时由 create_database 创建)
+
+transaction() 内的写入只发送、不等待回复，退出事务时随 COMMIT 一次同步:
+一批数据的汇总、逐日明细与同步记录只等待一次网络往返，而不是每条语句(及每次提交)各一次。
+写入语句首次执行即在服务端预备(prepared)，重复执行时只传参数、不再解析与规划；
+经 PgBouncer 事务池连接时需配置 database.prepare: false。
+
+事务外的单条写入/查询使用自动提交，每条一次往返(psycopg2 还需额外一次 COMMIT)。
+事务内写入的错误在退出事务时抛出并整体回滚。
+未改写的方法(回填任务、归档、空间数据等)仍走父类的 psycopg2 连接。
+"""
+
+import logging
+import re
+import time
+from contextlib import contextmanager
+import metrics
+from config import get_db_config
+from database import GarminDatabase
+
+try:
+    import psycopg
+    from psycopg.rows import dict_row, tuple_row
+except ImportError:
+    psycopg = None
+
+logger = logging.getLogger(__name__)
+
+# execute_values 风格的 "VALUES %s"，改写为单行占位符后 executemany
+_VALUES = re.compile(r"VALUES\s+%s", re.IGNORECASE)
+
+
+class PipelinedGarminDatabase(GarminDatabase):
+    """GarminDatabase 的 psycopg 3 管道模式实现，_write / _fetchall / transaction 使用独立的 psycopg 3 连接"""
+
+    def __init__(self, readonly=False):
+        if psycopg is None:
+            raise RuntimeError('database.driver: pipeline 需要安装 psycopg 3 (pip install "psycopg[binary]>=3.1")')
+        super().__init__(readonly=readonly)
+        self.prepare = get_db_config().get("prepare", True)
+        self._pconn = None
+        # 事务内已发送、尚未确认的写入 [(表, 游标, 行数), ...]，行数为 None 时同步后取游标 rowcount
+        self._queued = []
+
+    def _get_pconn(self):
+        if self._pconn is None or self._pconn.closed:
+            options = "-c default_transaction_read_only=on" if self.readonly else None
+            self._pconn = psycopg.connect(**self.conn_params, autocommit=True, options=options)
+            # 0: 每条语句首次执行即预备；None: 不使用预备语句
+            self._pconn.prepare_threshold = 0 if self.prepare else None
+        return self._pconn
+
+    def close(self):
+        if self._pconn and not self._pconn.closed:
+            self._pconn.close()
+        super().close()
+
+    @contextmanager
+    def transaction(self):
+        """事务内写入进入管道，退出时 COMMIT 并一次同步全部结果；出错整体回滚后抛出"""
+        if self._tx_depth:
+            self._tx_depth += 1
+            try:
+                yield
+            finally:
+                self._tx_depth -= 1
+            return
+        conn = self._get_pconn()
+        self._tx_depth = 1
+        t0 = time.monotonic()
+        try:
+            with conn.pipeline() as pipeline, conn.transaction():
+                yield
+                if self._changes:
+                    # 变更事件的行数须等已发送的写入确认后才知道，多一次同步往返
+                    pipeline.sync()
+                    self._emit_changes()
+        except Exception as e:
+            for table, _, _ in self._queued:
+                metrics.DB_ERRORS.labels(table).inc()
+            if self._queued:
+                logger.error(f"管道事务失败({len(self._queued)} 条写入已回滚): {e}")
+            raise
+        else:
+            # 管道内各语句的耗时无法区分，按条数分摊整个事务的耗时
+            elapsed = time.monotonic() - t0
+            for table, cur, rows in self._queued:
+                if rows is None:
+                    rows = max(cur.rowcount, 0)
+                metrics.record_db_write(table, rows, elapsed / len(self._queued), commits=0)
+            metrics.record_db_commit("transaction")
+        finally:
+            for _, cur, _ in self._queued:
+                cur.close()
+            self._tx_depth = 0
+            self._queued = []
+            self._changes = []
+
+    def _transaction_rows(self) -> int:
+        """本事务已确认的写入行数(须在同步后调用)"""
+        return sum(max(cur.rowcount, 0) if rows is None else rows
+                   for table, cur, rows in self._queued if table not in self.CHANGE_UNCOUNTED)
+
+    def _write(self, table, sql, params=None, values=None, page_size=500,
+               template=None, error="写入失败", fetch=False):
+        """事务内只发送不等待(fetch=True 时需等待结果)；事务外自动提交。返回值同 GarminDatabase._write，
+        事务内的写入影响行数要到同步后才知道，返回 0(指标与变更事件在同步后按实际行数记录)"""
+        if values is not None and not values:
+            return [] if fetch else 0
+        conn = self._get_pconn()
+        t0 = time.monotonic()
+        cur = conn.cursor()
+        try:
+            if values is not None:
+                row = template or "(" + ", ".join(["%s"] * len(values[0])) + ")"
+                cur.executemany(_VALUES.sub(lambda m: "VALUES " + row, sql, count=1), values, returning=fetch)
+            else:
+                cur.execute(sql, params)
+            # 影响行数(executemany 为各行之和)同步后才可读取
+            rows = None
+            returned = None
+            if fetch:
+                returned = []
+                while True:
+                    returned.extend(cur.fetchall())
+                    if not cur.nextset():
+                        break
+                rows = len(returned)
+        except Exception as e:
+            cur.close()
+            metrics.DB_ERRORS.labels(table).inc()
+            logger.error(f"{error}: {e}")
+            raise
+        if self._tx_depth:
+            # 游标保留到退出事务，同步后读取 rowcount
+            self._queued.append((table, cur, rows))
+            return returned if fetch else (rows or 0)
+        if rows is None:
+            rows = max(cur.rowcount, 0)
+        cur.close()
+        metrics.record_db_write(table, rows, time.monotonic() - t0)
+        return returned if fetch else rows
+
+    def _fetchall(self, sql, params=None, dict_rows=False) -> list:
+        """执行查询返回全部行；事务内会同步管道(读到本事务已发送的写入)"""
+        conn = self._get_pconn()
+        with conn.cursor(row_factory=dict_row if dict_rows else tuple_row) as cur:
+            cur.execute(sql, params)
+            return cur.fetchall()
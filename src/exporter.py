@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Parquet 导出模块
+将时序明细表及活动轨迹按 类型/月份 分区导出为 Parquet 数据集，
+服务端游标流式读取，按各月行数与最大 updatedat 增量导出，供分析及冷归档使用
+
+依赖 pyarrow(可选): pip install pyarrow
+"""
+
+import json
+import logging
+import os
+import time
+from datetime import date, timedelta
+from database import GarminDatabase
+from config import get_export_config
+from retention import ARCHIVED
+
+logger = logging.getLogger(__name__)
+
+# 数据集定义: 类型 -> (表, 分区日期列, [(查询表达式, 列名, arrow类型), ...])
+EXPORT_DATASETS = {
+    "heartrate": ("garmin_heartrate_detail", "hrdate", [
+        ("hrdate", "hrdate", "date32"),
+        ("pointtime", "pointtime", "timestamp"),
+        ("heartrate", "heartrate", "int32"),
+    ]),
+    "stress": ("garmin_stress_detail", "stressdate", [
+        ("stressdate", "stressdate", "date32"),
+        ("pointtime", "pointtime", "timestamp"),
+        ("stresslevel", "stresslevel", "int32"),
+    ]),
+    "respiration": ("garmin_respiration_detail", "respdate", [
+        ("respdate", "respdate", "date32"),
+        ("pointtime", "pointtime", "timestamp"),
+        ("respvalue::float8", "respvalue", "float64"),
+    ]),
+    "spo2": ("garmin_spo2_detail", "spo2date", [
+        ("spo2date", "spo2date", "date32"),
+        ("pointtime", "pointtime", "timestamp"),
+        ("spo2value::float8", "spo2value", "float64"),
+        ("readingsource", "readingsource", "string"),
+    ]),
+    "sleep": ("garmin_sleep_detail", "sleepdate", [
+        ("sleepdate", "sleepdate", "date32"),
+        ("starttime", "starttime", "timestamp"),
+        ("endtime", "endtime", "timestamp"),
+        ("activitylevel::float8", "activitylevel", "float64"),
+    ]),
+    "activity": ("garmin_activity_detail", "pointtime", [
+        ("activityid", "activityid", "string"),
+        ("pointtime", "pointtime", "timestamp"),
+        ("latitude::float8", "latitude", "float64"),
+        ("longitude::float8", "longitude", "float64"),
+        ("elevation::float8", "elevation", "float64"),
+        ("heartrate", "heartrate", "int32"),
+        ("speed::float8", "speed", "float64"),
+        ("cadence", "cadence", "int32"),
+        ("power", "power", "int32"),
+        ("temperature::float8", "temperature", "float64"),
+        ("distance::float8", "distance", "float64"),
+    ]),
+}
+
+WATERMARK_FILE = "_watermark.json"
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        return pyarrow
+    except ImportError:
+        raise RuntimeError("导出 Parquet 需要 pyarrow，请先执行 pip install pyarrow")
+
+
+def _next_month(d):
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _arrow_schema(pa, columns):
+    types = {
+        "date32": pa.date32(),
+        "timestamp": pa.timestamp("us", tz="UTC"),
+        "int32": pa.int32(),
+        "float64": pa.float64(),
+        "string": pa.string(),
+    }
+    return pa.schema([(name, types[t]) for _, name, t in columns])
+
+
+def read_dataset(out_dir, dtype, start=None, end=None, columns=None):
+    """读取导出的数据集，返回 pyarrow.Table(按需 .to_pandas())
+
+    按月分区裁剪，start/end 为 YYYY-MM 字符串(含)
+    """
+    _require_pyarrow()
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(os.path.join(out_dir, dtype), format="parquet", partitioning="hive")
+    expr = None
+    if start:
+        expr = ds.field("month") >= start
+    if end:
+        cond = ds.field("month") <= end
+        expr = cond if expr is None else expr & cond
+    return dataset.to_table(columns=columns, filter=expr)
+
+
+class ParquetExporter:
+    """按月分区的 Parquet 增量导出器"""
+
+    def __init__(self, out_dir=None, batch_rows=None):
+        cfg = get_export_config()
+        self.out_dir = out_dir or cfg.get("path", "./export")
+        self.batch_rows = batch_rows or cfg.get("batch_rows", 50000)
+        self.compression = cfg.get("compression", "zstd")
+        self.db = GarminDatabase()
+
+    # ==================== 导出记录 ====================
+
+    def _watermark_path(self):
+        return os.path.join(self.out_dir, WATERMARK_FILE)
+
+    def _load_watermarks(self):
+        try:
+            with open(self._watermark_path(), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _save_watermarks(self, marks):
+        os.makedirs(self.out_dir, exist_ok=True)
+        tmp = self._watermark_path() + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(marks, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self._watermark_path())
+
+    # ==================== 导出 ====================
+
+    def _month_stats(self, table, datecol):
+        """各月份分区状态 {月份: "行数|最大updatedat"}，与上次导出时不同即需重新导出
+
+        追加写优化(detail_append_only.sql)后明细表无 updatedat 列，只写入不更新，仅按行数判断
+        """
+        has_updatedat = self.db._fetchall("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = %s AND column_name = 'updatedat'
+        """, (table,))
+        rows = self.db._fetchall(f"""
+            SELECT date_trunc('month', {datecol})::date, count(*), {"max(updatedat)" if has_updatedat else "NULL"}
+            FROM {table} GROUP BY 1
+        """)
+        return {month: f"{n}|{updated.isoformat() if updated else ''}" for month, n, updated in rows}
+
+    def _archived_months(self, table):
+        """已冷归档(未恢复)的月份，明细已移出在线表，分区保留不动"""
+        rows = self.db._fetchall(
+            "SELECT archivemonth FROM garmin_archive WHERE tablename = %s AND status = %s",
+            (table, ARCHIVED),
+        )
+        return {r[0] for r in rows}
+
+    def _export_month(self, pa, dtype, month):
+        """导出单个月份分区，先写临时文件再原子替换，返回行数"""
+        import pyarrow.parquet as pq
+
+        table, datecol, columns = EXPORT_DATASETS[dtype]
+        schema = _arrow_schema(pa, columns)
+        select = ", ".join(expr for expr, _, _ in columns)
+        sql = f"""
+            SELECT {select} FROM {table}
+            WHERE {datecol} >= %(start)s AND {datecol} < %(end)s
+            ORDER BY {datecol}
+        """
+        part_dir = os.path.join(self.out_dir, dtype, f"month={month:%Y-%m}")
+        target = os.path.join(part_dir, "part-0.parquet")
+        tmp = target + ".tmp"
+
+        rows = self.db.stream_rows(sql, {"start": month, "end": _next_month(month)},
+                                   itersize=self.batch_rows, name=f"export_{dtype}")
+        writer = None
+        total = 0
+        batch = []
+        try:
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= self.batch_rows:
+                    writer = self._write_batch(pa, pq, writer, tmp, schema, batch)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                writer = self._write_batch(pa, pq, writer, tmp, schema, batch)
+                total += len(batch)
+            if writer:
+                writer.close()
+                writer = None
+            if total:
+                os.replace(tmp, target)
+            elif os.path.exists(target):
+                # 该月已无数据，删除上次导出的分区，避免读到已删除的行
+                os.remove(target)
+        finally:
+            if writer:
+                writer.close()
+            # 导出中途失败时清理临时文件
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return total
+
+    def _write_batch(self, pa, pq, writer, path, schema, batch):
+        arrays = [pa.array([r[i] for r in batch], type=field.type)
+                  for i, field in enumerate(schema)]
+        record_batch = pa.RecordBatch.from_arrays(arrays, schema=schema)
+        if writer is None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            writer = pq.ParquetWriter(path, schema, compression=self.compression)
+        writer.write_batch(record_batch)
+        return writer
+
+    def export_type(self, pa, dtype, marks, full=False):
+        table, datecol, _ = EXPORT_DATASETS[dtype]
+        stats = self._month_stats(table, datecol)
+        archived = self._archived_months(table)
+        # 旧版水位线只记录月份，无法判断各月是否变化，按全量重新导出一次
+        recorded = marks.get(dtype)
+        if not isinstance(recorded, dict):
+            recorded = {}
+        exported = {} if full else dict(recorded)
+        marks[dtype] = exported
+
+        months = sorted(set(stats) | {date.fromisoformat(m + "-01") for m in recorded})
+        if not months:
+            print(f"  ⏭️ {dtype}: 无数据")
+            return 0
+
+        total = 0
+        partitions = 0
+        skipped = 0
+        for month in months:
+            key = f"{month:%Y-%m}"
+            if month in archived:
+                # 明细已归档移出在线表，保留上次导出的分区
+                if key in recorded:
+                    exported[key] = recorded[key]
+                skipped += 1
+                continue
+            state = stats.get(month)
+            if state is not None and exported.get(key) == state:
+                continue
+            t0 = time.monotonic()
+            n = self._export_month(pa, dtype, month)
+            if n:
+                partitions += 1
+                total += n
+                print(f"  ✅ {dtype} {key}: {n} 行 ({time.monotonic() - t0:.1f}s)")
+            else:
+                print(f"  🗑️ {dtype} {key}: 已无数据，删除分区")
+            # 记录导出前的分区状态，导出期间新写入的行下次会重新导出
+            if state is None:
+                exported.pop(key, None)
+            else:
+                exported[key] = state
+            self._save_watermarks(marks)
+        print(f"  📊 {dtype}: 导出 {partitions} 个分区, 共 {total} 行"
+              + (f", 跳过 {skipped} 个已归档月份" if skipped else ""))
+        return total
+
+    def run(self, types=None, full=False):
+        pa = _require_pyarrow()
+        types = types or list(EXPORT_DATASETS)
+        unknown = [t for t in types if t not in EXPORT_DATASETS]
+        if unknown:
+            raise ValueError(f"不支持导出的数据类型: {', '.join(unknown)}")
+
+        print(f"\n📦 Parquet 导出开始 -> {self.out_dir}")
+        marks = self._load_watermarks()
+        try:
+            for dtype in types:
+                self.export_type(pa, dtype, marks, full=full)
+        finally:
+            self.db.close()
+        print("✅ Parquet 导出完成")
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+明细覆盖率缺口检测
+按明细表逐日统计点数(generate_series + 分组计数，每种类型一条查询)，与预期采样密度比较，
+找出"已同步但明细稀疏"的日期，只对这些日期重新获取，而不是按 sync_days 滑动窗口全部重采
+
+同步时手表可能尚未上传完当天数据；只有在当日结束后 settle_hours 内同步的稀疏日期才视为缺口，
+更晚同步仍稀疏的视为未佩戴，不会反复重采。
+"""
+
+import logging
+from datetime import date, timedelta
+from config import get_gaps_config
+
+logger = logging.getLogger(__name__)
+
+DATASOURCE = "garmin"
+
+# 数据类型 -> (明细表, 日期列, 额外过滤, 每日预期点数)
+GAP_TYPES = {
+    # 全天心率 2 分钟一个点
+    "heartrate": ("garmin_heartrate_detail", "hrdate", None, 720),
+    # 压力 3 分钟一个点
+    "stress": ("garmin_stress_detail", "stressdate", None, 480),
+    # 呼吸 2 分钟一个点
+    "respiration": ("garmin_respiration_detail", "respdate", None, 720),
+    # 血氧只统计每小时均值(连续读数仅睡眠期间有)
+    "spo2": ("garmin_spo2_detail", "spo2date", "readingsource = 'hourly'", 24),
+}
+
+
+def _settings():
+    cfg = get_gaps_config()
+    return {
+        "min_coverage": float(cfg.get("min_coverage", 0.6)),
+        "settle_hours": int(cfg.get("settle_hours", 36)),
+        "expected": {**{k: v[3] for k, v in GAP_TYPES.items()}, **(cfg.get("expected") or {})},
+    }
+
+
+def find_gaps(db, start, end=None, types=None):
+    """[start, end] 内各类型覆盖率不足的日期 {类型: [(日期, 点数, 预期点数), ...]}"""
+    end = end or date.today() - timedelta(days=1)
+    settings = _settings()
+    gaps = {}
+    for dtype in types or GAP_TYPES:
+        if dtype not in GAP_TYPES:
+            continue
+        table, datecol, where, _ = GAP_TYPES[dtype]
+        expected = int(settings["expected"][dtype])
+        rows = db.detail_coverage_gaps(DATASOURCE, dtype, table, datecol, start, end, expected,
+                                       settings["min_coverage"], settings["settle_hours"], where=where)
+        if rows:
+            gaps[dtype] = [(day, points, expected) for day, points in rows]
+    return gaps
+
+
+def find_failed(db, start, end):
+    """[start, end] 内同步失败(状态 0)的日期 {类型: [日期, ...]}"""
+    failed = {}
+    for dtype, day in db.failed_sync_dates(DATASOURCE, start, end):
+        failed.setdefault(dtype, []).append(day)
+    return failed
+
+
+def mark_incomplete(db, gaps):
+    """把缺口日期的同步状态置为失败，回填任务按同步状态重新获取"""
+    for dtype, rows in gaps.items():
+        db.upsert_syncs(DATASOURCE, dtype, [day for day, _, _ in rows], status=0, errmsg="明细覆盖率不足")
+
+
+def requeue(db, gaps):
+    """标记缺口并按连续日期登记回填任务，由回填进程领取重采，返回登记任务数"""
+    mark_incomplete(db, gaps)
+    jobs = []
+    for dtype, rows in gaps.items():
+        days = sorted(day for day, _, _ in rows)
+        run_start = prev = days[0]
+        for day in days[1:] + [None]:
+            if day is not None and day - prev == timedelta(days=1):
+                prev = day
+                continue
+            jobs.append((DATASOURCE, dtype, run_start, prev))
+            run_start = prev = day
+    return db.requeue_sync_jobs(jobs)
+
+
+def print_gaps(gaps):
+    if not gaps:
+        print("✅ 未发现覆盖率缺口")
+        return
+    for dtype, rows in gaps.items():
+        print(f"\n{dtype}: {len(rows)} 天")
+        for day, points, expected in rows[:20]:
+            print(f"  {day}  {points}/{expected} ({points / expected * 100:.0f}%)")
+        if len(rows) > 20:
+            print(f"  ... 另有 {len(rows) - 20} 天")
@@ -5,69 +5,211 @@
 """
 
 import json
+import time
+import argparse
 import garth
 import logging
-from datetime import datetime, timedelta, timezone
+import metrics
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
 from garth_utils import GarminLogin
 from database import GarminDatabase
+from track_lod import TrackCollector
+from data_types import DailyTypeEngine, data_types
+from sources import DataSource
+import training_load
+import gaps
+import query_api
+import http_transport
+from config import get_gaps_config
+
+try:
+    import ijson
+except ImportError:  # 可选依赖，缺失时轨迹接口整包解析
+    ijson = None
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 
-class GarminDataCollector:
-    """佳明数据收集器"""
+class GarminDataCollector(DataSource):
+    """佳明数据收集器(数据源插件)
+
+    garth 客户端为进程级全局对象，一个进程只能采集一个佳明账号。
+    """
+
+    name = "garmin"
+    label = "佳明"
 
     ACTIVITIES_URL = "/activitylist-service/activities/search/activities"
+    # 流式解析轨迹时每批写入的点数
+    STREAM_CHUNK_POINTS = 2000
+    # 活动汇总每批写入条数
+    ACTIVITY_BATCH = 100
 
-    def __init__(self):
+    def __init__(self, db=None):
+        super().__init__(db)
         self.garmin_login = GarminLogin()
         self._display_name = None
-        self.db = GarminDatabase()
+        self.configure_transport()
+        self.daily_engine = DailyTypeEngine(self)
+        # 本进程写入活动负荷的最早日期，ATL/CTL 从此日起递推
+        self._load_from = None
+
+    def configure_transport(self):
+        """连接池按最大并发请求数设置(max_connections 可覆盖)；garth 登录/恢复会话后需重新调用"""
+        workers = max([dt.max_concurrency for dt in self.daily_types()] + [1])
+        http_transport.configure(garth.client, self.cfg, workers)
+
+    def _connectapi(self, endpoint, path, **kwargs):
+        """调用佳明接口并记录耗时与线上/解压后字节数，endpoint 为指标标签"""
+        self.throttle()
+        t0 = time.monotonic()
+        try:
+            # 直接取本次响应(而非 client.last_resp)，并发获取时字节数不串
+            resp = garth.client.request("GET", "connectapi", path, api=True, **kwargs)
+            http_transport.record_response(endpoint, resp, len(resp.content))
+            return None if resp.status_code == 204 else resp.json()
+        except Exception:
+            metrics.API_ERRORS.labels(endpoint).inc()
+            raise
+        finally:
+            metrics.record_api_request(endpoint, time.monotonic() - t0)
+
+    @contextmanager
+    def _stream_connectapi(self, endpoint, path, **kwargs):
+        """流式调用佳明接口，产出 (Response, 解压后的响应体流)，结束后记录耗时与线上/解压后字节数"""
+        self.throttle()
+        t0 = time.monotonic()
+        resp = body = None
+        try:
+            resp = garth.client.request("GET", "connectapi", path, api=True, stream=True, **kwargs)
+            resp.raw.decode_content = True
+            body = http_transport.CountingReader(resp.raw)
+            yield resp, body
+        except Exception:
+            metrics.API_ERRORS.labels(endpoint).inc()
+            raise
+        finally:
+            if resp is not None:
+                http_transport.record_response(endpoint, resp, body.bytes)
+                resp.close()
+            metrics.record_api_request(endpoint, time.monotonic() - t0)
 
-    def ensure_login(self):
-        """确保佳明登录状态"""
-        self.garmin_login.ensure_login()
+    def login(self):
+        self.ensure_login()
+
+    def collect(self, days_back):
+        self.collect_all_data(days_back=days_back)
+
+    def ensure_login(self, fast=False):
+        """确保佳明登录状态
+
+        fast=True 时直接使用本地缓存的会话，不预先请求验证(省去一次请求)，
+        由第一个接口请求(用户设置)验证，失败时再走完整的检查与登录。
+        """
+        fast = fast and self.garmin_login.resume()
+        if not fast:
+            self.garmin_login.ensure_login()
+        self.configure_transport()
         try:
-            settings = garth.connectapi("/userprofile-service/userprofile/user-settings")
+            settings = self._connectapi("user_settings", "/userprofile-service/userprofile/user-settings")
             self._display_name = settings.get("userData", {}).get("displayName")
-        except Exception:
-            pass
+        except Exception as e:
+            if fast:
+                logger.info(f"缓存会话不可用，重新登录: {e}")
+                return self.ensure_login()
         if not self._display_name:
             self._display_name = garth.client.username
 
     # ==================== 活动数据 ====================
 
     def get_activities(self, start=0, limit=20):
-        return garth.connectapi(self.ACTIVITIES_URL, params={"start": str(start), "limit": str(limit)})
+        return self._connectapi("activities", self.ACTIVITIES_URL, params={"start": str(start), "limit": str(limit)})
 
     def get_activity_detail(self, activity_id):
-        try:
-            return garth.connectapi(f"/activity-service/activity/{activity_id}")
-        except Exception as e:
-            logger.warning(f"获取活动详情失败 {activity_id}: {e}")
-            return None
+        """获取活动详情，失败时抛出异常(该活动不入库，下次采集重新获取)"""
+        return self._connectapi("activity_detail", f"/activity-service/activity/{activity_id}")
 
     def get_activity_polyline(self, activity_id):
-        """获取活动高分辨率GPS轨迹 (polyline full-resolution API)"""
-        try:
-            import time
-            timestamp = int(time.time() * 1000)
-            return garth.connectapi(
-                f"/activity-service/activity/{activity_id}/polyline/full-resolution/",
-                params={"_": str(timestamp)}
-            )
-        except Exception as e:
-            logger.warning(f"获取高分辨率轨迹失败 {activity_id}: {e}")
-            return None
+        """获取活动高分辨率GPS轨迹 (polyline full-resolution API)，失败时抛出异常"""
+        timestamp = int(time.time() * 1000)
+        return self._connectapi(
+            "activity_polyline",
+            f"/activity-service/activity/{activity_id}/polyline/full-resolution/",
+            params={"_": str(timestamp)}
+        )
 
     def get_activity_track(self, activity_id):
-        """获取活动GPS轨迹点 (details API - 备用方案)"""
-        try:
-            return garth.connectapi(f"/activity-service/activity/{activity_id}/details")
-        except Exception as e:
-            logger.warning(f"获取活动轨迹失败 {activity_id}: {e}")
-            return None
+        """获取活动GPS轨迹点 (details API - 备用方案，含心率序列)，失败时抛出异常"""
+        return self._connectapi("activity_track", f"/activity-service/activity/{activity_id}/details")
+
+    def stream_activity_polyline(self, activity_id):
+        """流式获取高分辨率轨迹，边下载边解析，按 STREAM_CHUNK_POINTS 分批产出轨迹点"""
+        path = f"/activity-service/activity/{activity_id}/polyline/full-resolution/"
+        params = {"_": str(int(time.time() * 1000))}
+        with self._stream_connectapi("activity_polyline", path, params=params) as (resp, body):
+            if resp.status_code == 204:
+                return
+            chunk = []
+            for p in ijson.items(body, "polyline.item", use_float=True):
+                point = self._polyline_point(p)
+                if point is None:
+                    continue
+                chunk.append(point)
+                if len(chunk) >= self.STREAM_CHUNK_POINTS:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+
+    def stream_activity_track(self, activity_id, activity_start_gmt):
+        """流式获取 details 轨迹，按 STREAM_CHUNK_POINTS 分批产出轨迹点
+
+        activityDetailMetrics 逐行解析；若响应中指标描述出现在数据之后，先缓存行再统一转换。
+        """
+        path = f"/activity-service/activity/{activity_id}/details"
+        base = self._track_start(activity_start_gmt)
+        idx_map = {}
+        desc_key = desc_index = None
+        row = None
+        pending = []
+        chunk = []
+        with self._stream_connectapi("activity_track", path) as (resp, body):
+            if resp.status_code == 204:
+                return
+            for prefix, event, value in ijson.parse(body, use_float=True):
+                if prefix == "activityDetailMetrics.item.metrics.item":
+                    row.append(value)
+                elif prefix == "activityDetailMetrics.item.metrics":
+                    if event == "start_array":
+                        row = []
+                    elif event == "end_array":
+                        if not idx_map:
+                            pending.append(row)
+                            continue
+                        point = self._track_point(row, idx_map, base)
+                        if point:
+                            chunk.append(point)
+                        if len(chunk) >= self.STREAM_CHUNK_POINTS:
+                            yield chunk
+                            chunk = []
+                elif prefix == "metricDescriptors.item.key":
+                    desc_key = value
+                elif prefix == "metricDescriptors.item.metricsIndex":
+                    desc_index = value
+                elif prefix == "metricDescriptors.item" and event == "end_map":
+                    idx_map[desc_key] = int(desc_index) if desc_index is not None else None
+                    desc_key = desc_index = None
+        for metrics_row in pending:
+            point = self._track_point(metrics_row, idx_map, base)
+            if point:
+                chunk.append(point)
+            if len(chunk) >= self.STREAM_CHUNK_POINTS:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
 
     def _parse_activity_summary(self, act_list_item, detail=None):
         """从活动列表项 + 详情API 解析汇总数据"""
@@ -109,6 +251,31 @@ class GarminDataCollector:
             "rawjson": json.dumps(act_list_item, ensure_ascii=False, default=str),
         }
 
+    @staticmethod
+    def _polyline_point(p):
+        """单个 polyline 点 [timestamp_ms, lat, lng] 转轨迹点，无效返回 None"""
+        if not p or len(p) < 3:
+            return None
+        # p[0]: 时间戳(毫秒), p[1]: 纬度, p[2]: 经度
+        try:
+            timestamp_ms = float(p[0])
+            pt = datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc)
+            return {
+                "pointtime": pt,
+                "latitude": float(p[1]),
+                "longitude": float(p[2]),
+                "elevation": None,
+                "heartrate": None,
+                "speed": None,
+                "cadence": None,
+                "power": None,
+                "temperature": None,
+                "distance": None,
+            }
+        except (ValueError, TypeError, IndexError) as e:
+            logger.debug(f"跳过无效polyline点: {p}, 错误: {e}")
+            return None
+
     def _parse_polyline_points(self, polyline_data):
         """解析高分辨率polyline数据
         格式: {"polyline": [[timestamp_ms, lat, lng], ...]}
@@ -123,29 +290,58 @@ class GarminDataCollector:
 
         points = []
         for p in polyline:
-            if not p or len(p) < 3:
-                continue
-            # p[0]: 时间戳(毫秒), p[1]: 纬度, p[2]: 经度
+            point = self._polyline_point(p)
+            if point is not None:
+                points.append(point)
+        return points
+
+    @staticmethod
+    def _track_start(activity_start_gmt):
+        """活动开始时间(GMT 字符串) 转 datetime，用于相对秒数推算轨迹点时间"""
+        if not activity_start_gmt:
+            return None
+        for fmt in ("%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S"):
             try:
-                timestamp_ms = float(p[0])
-                pt = datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc)
-                points.append({
-                    "pointtime": pt,
-                    "latitude": float(p[1]),
-                    "longitude": float(p[2]),
-                    "elevation": None,
-                    "heartrate": None,
-                    "speed": None,
-                    "cadence": None,
-                    "power": None,
-                    "temperature": None,
-                    "distance": None,
-                })
-            except (ValueError, TypeError, IndexError) as e:
-                logger.debug(f"跳过无效polyline点: {p}, 错误: {e}")
+                return datetime.strptime(activity_start_gmt, fmt).replace(tzinfo=timezone.utc)
+            except ValueError:
                 continue
+        logger.debug(f"无法解析活动开始时间: {activity_start_gmt}")
+        return None
 
-        return points
+    @staticmethod
+    def _track_point(metrics, idx_map, base):
+        """单行 activityDetailMetrics 按指标索引转轨迹点，无时间返回 None"""
+        if not metrics:
+            return None
+
+        def _get(key):
+            i = idx_map.get(key)
+            if i is not None and i < len(metrics):
+                return metrics[i]
+            return None
+
+        # 用 directTimestamp (毫秒) 或相对秒数推算时间
+        ts = _get("directTimestamp")
+        if ts:
+            pt = datetime.fromtimestamp(ts / 1000, tz=timezone.utc)
+        else:
+            elapsed = _get("sumElapsedDuration")
+            if elapsed is None or base is None:
+                return None
+            pt = base + timedelta(seconds=elapsed)
+
+        return {
+            "pointtime": pt,
+            "latitude": _get("directLatitude"),
+            "longitude": _get("directLongitude"),
+            "elevation": _get("directElevation"),
+            "heartrate": int(_get("directHeartRate")) if _get("directHeartRate") else None,
+            "speed": _get("directSpeed"),
+            "cadence": int(_get("directRunCadence")) if _get("directRunCadence") else None,
+            "power": int(_get("directPower")) if _get("directPower") else None,
+            "temperature": _get("directAirTemperature"),
+            "distance": _get("sumDistance"),
+        }
 
     def _parse_track_points(self, track_data, activity_start_gmt):
         """解析轨迹点数据(details API - 备用方案)"""
@@ -158,135 +354,267 @@ class GarminDataCollector:
         for desc in descriptors:
             idx_map[desc.get("key")] = desc.get("metricsIndex")
 
+        base = self._track_start(activity_start_gmt)
         points = []
-        metrics_list = track_data.get("activityDetailMetrics", [])
-        for m in metrics_list:
-            metrics = m.get("metrics", [])
-            if not metrics:
-                continue
-
-            def _get(key):
-                i = idx_map.get(key)
-                if i is not None and i < len(metrics):
-                    return metrics[i]
-                return None
-
-            # 用 directTimestamp (毫秒) 或相对秒数推算时间
-            ts = _get("directTimestamp")
-            if ts:
-                pt = datetime.fromtimestamp(ts / 1000, tz=timezone.utc)
-            else:
-                elapsed = _get("sumElapsedDuration")
-                if elapsed is not None and activity_start_gmt:
-                    try:
-                        base = datetime.strptime(activity_start_gmt, "%Y-%m-%dT%H:%M:%S.%f")
-                        base = base.replace(tzinfo=timezone.utc)
-                    except ValueError:
-                        base = datetime.strptime(activity_start_gmt, "%Y-%m-%dT%H:%M:%S")
-                        base = base.replace(tzinfo=timezone.utc)
-                    pt = base + timedelta(seconds=elapsed)
-                else:
-                    continue
-
-            points.append({
-                "pointtime": pt,
-                "latitude": _get("directLatitude"),
-                "longitude": _get("directLongitude"),
-                "elevation": _get("directElevation"),
-                "heartrate": int(_get("directHeartRate")) if _get("directHeartRate") else None,
-                "speed": _get("directSpeed"),
-                "cadence": int(_get("directRunCadence")) if _get("directRunCadence") else None,
-                "power": int(_get("directPower")) if _get("directPower") else None,
-                "temperature": _get("directAirTemperature"),
-                "distance": _get("sumDistance"),
-            })
+        for m in track_data.get("activityDetailMetrics", []):
+            point = self._track_point(m.get("metrics", []), idx_map, base)
+            if point is not None:
+                points.append(point)
         return points
 
-    def collect_activities(self, days_back=7):
-        """收集活动数据并存入数据库"""
-        print(f"🏃 获取最近{days_back}天的活动数据...")
-        cutoff_date = datetime.now() - timedelta(days=days_back)
-        cutoff_ts = int(cutoff_date.timestamp() * 1000)
+    def _list_activities(self, cutoff_ts, until_ts=None, params=None):
+        """分页获取开始时间在 [cutoff_ts, until_ts)(毫秒) 内的活动列表"""
         all_activities = []
         start = 0
 
         while True:
-            activities = self.get_activities(start=start, limit=20)
+            if params:
+                activities = self._connectapi("activities", self.ACTIVITIES_URL,
+                                              params={**params, "start": str(start), "limit": "20"})
+            else:
+                activities = self.get_activities(start=start, limit=20)
             if not activities:
                 break
             for act in activities:
-                if act.get("beginTimestamp", 0) < cutoff_ts:
+                begin = act.get("beginTimestamp", 0)
+                if begin < cutoff_ts:
                     break
-                all_activities.append(act)
+                if until_ts is None or begin < until_ts:
+                    all_activities.append(act)
             else:
                 start += 20
                 continue
             break
+        return all_activities
+
+    def collect_activities_between(self, start_date, end_date, on_progress=None):
+        """收集 [start_date, end_date] 内的活动(分片回填用)，日期为 date"""
+        print(f"🏃 获取 {start_date} ~ {end_date} 的活动数据...")
+        cutoff_ts = int(datetime(start_date.year, start_date.month, start_date.day).timestamp() * 1000)
+        until = end_date + timedelta(days=1)
+        until_ts = int(datetime(until.year, until.month, until.day).timestamp() * 1000)
+        params = {"startDate": start_date.isoformat(), "endDate": end_date.isoformat()}
+        with self.journal.stage("activity_paging"):
+            all_activities = self._list_activities(cutoff_ts, until_ts, params=params)
+        self._save_activities(all_activities, on_progress)
+
+    def collect_activities(self, days_back=7):
+        """收集活动数据并存入数据库"""
+        print(f"🏃 获取最近{days_back}天的活动数据...")
+        cutoff_date = datetime.now() - timedelta(days=days_back)
+        cutoff_ts = int(cutoff_date.timestamp() * 1000)
+        with self.journal.stage("activity_paging"):
+            all_activities = self._list_activities(cutoff_ts)
+        self._save_activities(all_activities)
+
+    def _save_activity_track(self, aid, start_gmt, trimp=None):
+        """获取并写入活动轨迹及多分辨率 LOD，心率点同时交给 trimp 累计，返回写入点数
+
+        不在事务内下载: 每批轨迹点单独提交，下载期间不占用数据库事务(共享写入时不阻塞其他数据源)。
+        中途失败时已写入的点保留，活动汇总不写入，下次重新获取时已有的点被跳过。
+        """
+        track = TrackCollector()
+        sinks = (track, trimp) if trimp is not None else (track,)
+        count, rows = self._write_activity_track(aid, start_gmt, *sinks)
+        if count:
+            self.db.record_change(self.name, "activity_detail", activities=[aid], rows=rows)
+            try:
+                track.save(self.db, aid)
+            except Exception as e:
+                logger.warning(f"轨迹LOD生成失败 {aid}: {e}")
+        return count
+
+    def _save_activity_geom(self, aid):
+        """由已入库轨迹生成空间数据(起点取活动汇总，须在汇总写入后调用)，失败不影响活动入库"""
+        try:
+            self.db.upsert_activity_geom(aid)
+        except Exception as e:
+            logger.warning(f"活动空间数据生成失败 {aid}: {e}")
+
+    def _write_activity_track(self, aid, start_gmt, *sinks):
+        """获取并写入活动轨迹，每批轨迹点同时交给 sinks 收集，返回 (轨迹点数, 实际写入行数)
 
+        安装 ijson 时流式下载解析，每 STREAM_CHUNK_POINTS 点写一批，峰值内存与活动长度无关；
+        否则整包解析后一次写入。polyline 失败时回退到 details；没有接口完整获取到轨迹且有接口失败时抛出异常。
+        """
+        if ijson is None:
+            points = []
+            failed = None
+            # 1. 优先尝试高分辨率polyline接口
+            try:
+                points = self._parse_polyline_points(self.get_activity_polyline(aid))
+                if points:
+                    logger.info(f"使用高分辨率polyline接口获取到 {len(points)} 个轨迹点")
+            except Exception as e:
+                logger.warning(f"获取高分辨率轨迹失败 {aid}: {e}")
+                failed = e
+
+            # 2. 如果polyline接口失败,回退到details接口
+            if not points:
+                logger.info(f"polyline接口无数据,尝试使用details接口")
+                try:
+                    points = self._parse_track_points(self.get_activity_track(aid), start_gmt)
+                except Exception as e:
+                    logger.warning(f"获取活动轨迹失败 {aid}: {e}")
+                    raise
+            if not points and failed is not None:
+                raise failed
+
+            rows = 0
+            if points:
+                rows = self.db.batch_upsert_activity_details(aid, points)
+                for sink in sinks:
+                    sink.add(points)
+            return len(points), rows
+
+        sources = (
+            ("polyline", lambda: self.stream_activity_polyline(aid)),
+            ("details", lambda: self.stream_activity_track(aid, start_gmt)),
+        )
+        total = rows = 0
+        failed = None
+        for name, stream in sources:
+            chunks = stream()
+            count = 0
+            complete = True
+            while True:
+                # 只捕获下载/解析异常，写库异常照常抛出
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    break
+                except Exception as e:
+                    logger.warning(f"流式获取{name}轨迹失败 {aid}: {e}")
+                    failed = e
+                    complete = False
+                    break
+                rows += self.db.batch_upsert_activity_details(aid, chunk)
+                for sink in sinks:
+                    sink.add(chunk)
+                count += len(chunk)
+            total += count
+            if count and complete:
+                logger.info(f"使用{name}接口流式写入 {count} 个轨迹点")
+                return total, rows
+            if not count and complete:
+                logger.info(f"{name}接口无数据")
+        if failed is not None:
+            raise failed
+        return total, rows
+
+    def _heart_rate_series(self, aid, start_gmt, trimp):
+        """由 details 心率序列累计 TRIMP(polyline 轨迹不含心率，无 GPS 的活动不获取轨迹)
+
+        只用于计算负荷，不写入轨迹；获取失败返回 None，负荷按平均心率估算
+        """
+        try:
+            if ijson is None:
+                trimp.add(self._parse_track_points(self.get_activity_track(aid), start_gmt))
+            else:
+                for chunk in self.stream_activity_track(aid, start_gmt):
+                    trimp.add(chunk)
+            return trimp
+        except Exception as e:
+            logger.warning(f"获取活动心率序列失败 {aid}: {e}")
+            return None
+
+    def _save_activities(self, all_activities, on_progress=None):
+        """按 ACTIVITY_BATCH 条一批查询已存在的活动，只为新活动获取详情与轨迹，on_progress 在每条活动处理后调用
+
+        新活动的汇总(含详情字段)在其详情与轨迹写入后才整批写入，作为该活动已完成的标记:
+        详情获取失败或进程中途退出的活动不会登记为已存在，下次采集重新获取。
+        """
         print(f"  📋 获取到 {len(all_activities)} 条活动")
         saved = 0
         skipped = 0
-        for act in all_activities:
-            aid = str(act.get("activityId", ""))
-            # 检查活动是否已存在
-            if self.db.activity_exists(aid):
-                print(f"  ⏭️ {act.get('activityName')} (已存在)")
-                skipped += 1
-                continue
-            try:
-                # 获取活动详情
-                detail = self.get_activity_detail(aid)
-                parsed = self._parse_activity_summary(act, detail)
-                self.db.upsert_activity(parsed)
-
-                # 获取GPS轨迹 - 优先使用高分辨率polyline接口
-                if act.get("hasPolyline", False):
-                    points = []
-                    # 1. 优先尝试高分辨率polyline接口
-                    polyline_data = self.get_activity_polyline(aid)
-                    if polyline_data:
-                        points = self._parse_polyline_points(polyline_data)
-                        if points:
-                            logger.info(f"使用高分辨率polyline接口获取到 {len(points)} 个轨迹点")
-                    
-                    # 2. 如果polyline接口失败,回退到details接口
-                    if not points:
-                        logger.info(f"polyline接口无数据,尝试使用details接口")
-                        track = self.get_activity_track(aid)
-                        start_gmt = None
-                        if detail:
-                            start_gmt = detail.get("summaryDTO", {}).get("startTimeGMT")
-                        points = self._parse_track_points(track, start_gmt)
-                    
-                    if points:
-                        self.db.batch_upsert_activity_details(aid, points)
-                        print(f"  ✅ {act.get('activityName')} - {len(points)} 个轨迹点")
-                    else:
-                        print(f"  ✅ {act.get('activityName')} (无轨迹)")
-                else:
-                    print(f"  ✅ {act.get('activityName')} (无GPS)")
-
-                saved += 1
-            except Exception as e:
-                logger.error(f"活动 {aid} 处理失败: {e}")
+        queue = metrics.QUEUE_DEPTH.labels("activity")
+        queue.set(len(all_activities))
+        with self.journal.stage("activity_details"):
+            for i in range(0, len(all_activities), self.ACTIVITY_BATCH):
+                batch = all_activities[i:i + self.ACTIVITY_BATCH]
+                existing = self.db.existing_activity_ids([str(act.get("activityId", "")) for act in batch])
+                enriched = []
+                tracked = []
+                for act in batch:
+                    queue.inc(-1)
+                    if on_progress:
+                        on_progress()
+                    aid = str(act.get("activityId", ""))
+                    if aid in existing:
+                        print(f"  ⏭️ {act.get('activityName')} (已存在)")
+                        skipped += 1
+                        continue
+                    # 同一批内重复出现的活动只处理一次(同一语句不能两次更新同一行)
+                    existing.add(aid)
+                    try:
+                        parsed, count = self._save_activity(act)
+                        enriched.append(parsed)
+                        if count:
+                            tracked.append(aid)
+                        saved += 1
+                    except Exception as e:
+                        logger.error(f"活动 {aid} 处理失败: {e}")
+                self._upsert_activities(enriched)
+                if self.db.postgis:
+                    for aid in tracked:
+                        self._save_activity_geom(aid)
 
         print(f"  📊 活动数据: 新增{saved}, 跳过{skipped}, 共{len(all_activities)}")
 
-    # ==================== 心率数据 ====================
+    def _upsert_activities(self, rows):
+        """写入(或覆盖)完整的活动汇总，与变更事件同一事务提交"""
+        if not rows:
+            return
+        with self.db.transaction():
+            self.db.batch_upsert_activities(rows, update=True)
+            self.db.record_change(self.name, "activity", activities=[r["activityid"] for r in rows],
+                                  dates=[str(r["starttime"])[:10] for r in rows if r.get("starttime")])
+
+    def _save_activity(self, act):
+        """获取新活动的详情与轨迹并写入，返回 (含详情字段的汇总, 轨迹点数)，汇总由调用方批量写入
 
-    def collect_heart_rate_data(self, target_date):
+        详情或轨迹获取失败时抛出异常，调用方不写该活动的汇总，下次采集重新获取
+        """
+        aid = str(act.get("activityId", ""))
+        detail = self.get_activity_detail(aid)
+        parsed = self._parse_activity_summary(act, detail)
+        start_gmt = detail.get("summaryDTO", {}).get("startTimeGMT") if detail else None
+        trimp = training_load.new_accumulator(self.db, str(parsed["starttime"])[:10])
+
+        # 获取GPS轨迹 - 优先使用高分辨率polyline接口
+        count = 0
+        if act.get("hasPolyline", False):
+            count = self._save_activity_track(aid, start_gmt, trimp)
+            if count:
+                print(f"  ✅ {act.get('activityName')} - {count} 个轨迹点")
+            else:
+                print(f"  ✅ {act.get('activityName')} (无轨迹)")
+        else:
+            print(f"  ✅ {act.get('activityName')} (无GPS)")
+
+        # 轨迹取自 polyline(不含心率)或无轨迹时，另取 details 心率序列计算 TRIMP
+        if not trimp.seconds and parsed.get("avghr"):
+            trimp = self._heart_rate_series(aid, start_gmt, trimp)
+        self._save_activity_load(parsed, trimp)
+        return parsed, count
+
+    def _save_activity_load(self, parsed, trimp=None):
+        """写入单次活动 TRIMP 并记录最早变动日期，失败不影响活动入库"""
         try:
-            return garth.connectapi(
-                "/wellness-service/wellness/dailyHeartRate",
-                params={"date": target_date}
-            )
+            load = training_load.activity_load(self.db, parsed, trimp)
+            if load:
+                self.db.upsert_activity_load(load)
+                self._load_from = min(self._load_from or load["activitydate"], load["activitydate"])
         except Exception as e:
-            logger.warning(f"心率数据获取失败 {target_date}: {e}")
-            return None
+            logger.warning(f"活动负荷计算失败 {parsed.get('activityid')}: {e}")
 
-    def _save_heart_rate(self, target_date, data):
+    # ==================== 心率数据 ====================
+
+    @staticmethod
+    def _parse_heart_rate(target_date, data):
+        """解析心率汇总，无有效数据返回 None"""
         if not data:
-            return False
+            return None
         # 检查是否有有效数据
         has_data = any([
             data.get("restingHeartRate"),
@@ -295,94 +623,90 @@ class GarminDataCollector:
             data.get("heartRateValues")
         ])
         if not has_data:
-            logger.info(f"心率数据 {target_date} 无有效数据,不记录同步状态")
-            return False
-        try:
-            # 汇总
-            self.db.upsert_heartrate({
-                "hrdate": target_date,
-                "restinghr": data.get("restingHeartRate"),
-                "maxhr": data.get("maxHeartRate"),
-                "minhr": data.get("minHeartRate"),
-                "rawjson": json.dumps(data, ensure_ascii=False, default=str),
-            })
-            # 时序明细
-            hr_values = data.get("heartRateValues")
-            if hr_values:
-                self.db.batch_upsert_heartrate_details(target_date, hr_values)
-            # 只有成功保存数据后才记录同步状态
-            self.db.upsert_sync("garmin", "heartrate", target_date)
-            return True
-        except Exception as e:
-            logger.error(f"心率存储失败 {target_date}: {e}")
-            self.db.upsert_sync("garmin", "heartrate", target_date, status=0, errmsg=str(e))
-            return False
+            return None
+        return {
+            "hrdate": target_date,
+            "restinghr": data.get("restingHeartRate"),
+            "maxhr": data.get("maxHeartRate"),
+            "minhr": data.get("minHeartRate"),
+            "rawjson": json.dumps(data, ensure_ascii=False, default=str),
+        }
 
     # ==================== 睡眠数据 ====================
 
-    def collect_sleep_data(self, target_date):
-        try:
-            return garth.connectapi(
-                f"/wellness-service/wellness/dailySleepData/{self._display_name}",
-                params={"date": target_date, "nonSleepBufferMinutes": 60}
-            )
-        except Exception as e:
-            logger.warning(f"睡眠数据获取失败 {target_date}: {e}")
-            return None
-
-    def _save_sleep(self, target_date, data):
+    @staticmethod
+    def _parse_sleep(target_date, data):
+        """解析睡眠汇总，无有效数据返回 None"""
         if not data:
-            return False
+            return None
         dto = data.get("dailySleepDTO", {})
         # 检查是否有有效的睡眠数据(睡眠时长必须存在)
         if not dto or dto.get("sleepTimeSeconds") is None:
-            logger.info(f"睡眠数据 {target_date} 无有效数据,不记录同步状态")
-            return False
-        try:
-            scores = dto.get("sleepScores", {})
-            overall = scores.get("overall", {})
-            self.db.upsert_sleep({
-                "sleepdate": target_date,
-                "sleepstart": GarminDatabase._ts_to_dt(dto.get("sleepStartTimestampGMT")),
-                "sleepend": GarminDatabase._ts_to_dt(dto.get("sleepEndTimestampGMT")),
-                "totalsleep": (dto.get("sleepTimeSeconds") or 0) // 60,
-                "deepsleep": (dto.get("deepSleepSeconds") or 0) // 60,
-                "lightsleep": (dto.get("lightSleepSeconds") or 0) // 60,
-                "remsleep": (dto.get("remSleepSeconds") or 0) // 60,
-                "awaketime": (dto.get("awakeSleepSeconds") or 0) // 60,
-                "sleepscore": overall.get("value"),
-                "sleepquality": overall.get("qualifierKey"),
-                "restlesscount": dto.get("awakeCount"),
-                "avgspo2": dto.get("averageSpO2Value"),
-                "lowspo2": dto.get("lowestSpO2Value"),
-                "highspo2": dto.get("highestSpO2Value"),
-                "avgrespiration": dto.get("averageRespirationValue"),
-                "rawjson": json.dumps(data, ensure_ascii=False, default=str),
-            })
-            # 睡眠阶段明细
-            sleep_levels = data.get("sleepLevels")
-            if sleep_levels:
-                self.db.batch_upsert_sleep_details(target_date, sleep_levels)
-            # 只有成功保存数据后才记录同步状态
-            self.db.upsert_sync("garmin", "sleep", target_date)
-            return True
-        except Exception as e:
-            logger.error(f"睡眠存储失败 {target_date}: {e}")
-            self.db.upsert_sync("garmin", "sleep", target_date, status=0, errmsg=str(e))
-            return False
+            return None
+        scores = dto.get("sleepScores", {})
+        overall = scores.get("overall", {})
+        return {
+            "sleepdate": target_date,
+            "sleepstart": GarminDatabase._ts_to_dt(dto.get("sleepStartTimestampGMT")),
+            "sleepend": GarminDatabase._ts_to_dt(dto.get("sleepEndTimestampGMT")),
+            "totalsleep": (dto.get("sleepTimeSeconds") or 0) // 60,
+            "deepsleep": (dto.get("deepSleepSeconds") or 0) // 60,
+            "lightsleep": (dto.get("lightSleepSeconds") or 0) // 60,
+            "remsleep": (dto.get("remSleepSeconds") or 0) // 60,
+            "awaketime": (dto.get("awakeSleepSeconds") or 0) // 60,
+            "sleepscore": overall.get("value"),
+            "sleepquality": overall.get("qualifierKey"),
+            "restlesscount": dto.get("awakeCount"),
+            "avgspo2": dto.get("averageSpO2Value"),
+            "lowspo2": dto.get("lowestSpO2Value"),
+            "highspo2": dto.get("highestSpO2Value"),
+            "avgrespiration": dto.get("averageRespirationValue"),
+            "rawjson": json.dumps(data, ensure_ascii=False, default=str),
+        }
 
     # ==================== 压力数据 ====================
 
-    def collect_stress_data(self, target_date):
-        try:
-            return garth.connectapi(f"/wellness-service/wellness/dailyStress/{target_date}")
-        except Exception as e:
-            logger.warning(f"压力数据获取失败 {target_date}: {e}")
-            return None
+    # 压力区间上限(含): 休息 0-25 / 低 26-50 / 中 51-75 / 高 76-100
+    STRESS_BANDS = (
+        ("restduration", 25),
+        ("lowduration", 50),
+        ("mediumduration", 75),
+        ("highduration", 100),
+    )
+    # 压力采样默认间隔(秒)
+    STRESS_SAMPLE_SECONDS = 180
+
+    @classmethod
+    def _stress_durations(cls, stress_values):
+        """按压力区间统计时长(秒)，采样间隔取相邻时间戳差值的中位数"""
+        durations = {name: None for name, _ in cls.STRESS_BANDS}
+        valid = [p for p in (stress_values or [])
+                 if p and len(p) >= 2 and p[0] is not None and p[1] is not None]
+        if not valid:
+            return durations
+
+        interval = cls.STRESS_SAMPLE_SECONDS
+        stamps = sorted(p[0] for p in valid)
+        gaps = sorted(b - a for a, b in zip(stamps, stamps[1:]) if b > a)
+        if gaps:
+            interval = int(gaps[len(gaps) // 2] / 1000) or interval
+
+        counts = {name: 0 for name, _ in cls.STRESS_BANDS}
+        for p in valid:
+            # 压力值 -1/-2 代表无数据/运动中，不计入
+            if p[1] < 0:
+                continue
+            for name, upper in cls.STRESS_BANDS:
+                if p[1] <= upper:
+                    counts[name] += 1
+                    break
+        return {name: cnt * interval for name, cnt in counts.items()}
 
-    def _save_stress(self, target_date, data):
+    @classmethod
+    def _parse_stress(cls, target_date, data):
+        """解析压力汇总，无有效数据返回 None"""
         if not data:
-            return False
+            return None
         # 检查是否有有效数据
         has_data = any([
             data.get("avgStressLevel"),
@@ -390,43 +714,23 @@ class GarminDataCollector:
             data.get("stressValuesArray")
         ])
         if not has_data:
-            logger.info(f"压力数据 {target_date} 无有效数据,不记录同步状态")
-            return False
-        try:
-            self.db.upsert_stress({
-                "stressdate": target_date,
-                "overalllevel": data.get("avgStressLevel"),
-                "restduration": None,
-                "lowduration": None,
-                "mediumduration": None,
-                "highduration": None,
-                "stressscore": data.get("maxStressLevel"),
-                "rawjson": json.dumps(data, ensure_ascii=False, default=str),
-            })
-            # 时序明细
-            stress_values = data.get("stressValuesArray")
-            if stress_values:
-                self.db.batch_upsert_stress_details(target_date, stress_values)
-            # 只有成功保存数据后才记录同步状态
-            self.db.upsert_sync("garmin", "stress", target_date)
-            return True
-        except Exception as e:
-            logger.error(f"压力存储失败 {target_date}: {e}")
-            self.db.upsert_sync("garmin", "stress", target_date, status=0, errmsg=str(e))
-            return False
+            return None
+        parsed = {
+            "stressdate": target_date,
+            "overalllevel": data.get("avgStressLevel"),
+            "stressscore": data.get("maxStressLevel"),
+            "rawjson": json.dumps(data, ensure_ascii=False, default=str),
+        }
+        parsed.update(cls._stress_durations(data.get("stressValuesArray")))
+        return parsed
 
     # ==================== 血氧数据 ====================
 
-    def collect_spo2_data(self, target_date):
-        try:
-            return garth.connectapi(f"/wellness-service/wellness/daily/spo2/{target_date}")
-        except Exception as e:
-            logger.warning(f"血氧数据获取失败 {target_date}: {e}")
-            return None
-
-    def _save_spo2(self, target_date, data):
+    @staticmethod
+    def _parse_spo2(target_date, data):
+        """解析血氧汇总，无有效数据返回 None"""
         if not data:
-            return False
+            return None
         # 检查是否有有效数据
         has_data = any([
             data.get("averageSpO2"),
@@ -436,39 +740,23 @@ class GarminDataCollector:
             data.get("continuousReadingDTOList")
         ])
         if not has_data:
-            logger.info(f"血氧数据 {target_date} 无有效数据,不记录同步状态")
-            return False
-        try:
-            self.db.upsert_spo2({
-                "spo2date": target_date,
-                "avgspo2": data.get("averageSpO2"),
-                "lowspo2": data.get("lowestSpO2"),
-                "highspo2": data.get("lastSevenDaysAvgSpO2"),
-                "latestspo2": data.get("latestSpO2"),
-                "rawjson": json.dumps(data, ensure_ascii=False, default=str),
-            })
-            # 血氧时序明细
-            self.db.batch_upsert_spo2_details(target_date, data)
-            # 只有成功保存数据后才记录同步状态
-            self.db.upsert_sync("garmin", "spo2", target_date)
-            return True
-        except Exception as e:
-            logger.error(f"血氧存储失败 {target_date}: {e}")
-            self.db.upsert_sync("garmin", "spo2", target_date, status=0, errmsg=str(e))
-            return False
+            return None
+        return {
+            "spo2date": target_date,
+            "avgspo2": data.get("averageSpO2"),
+            "lowspo2": data.get("lowestSpO2"),
+            "highspo2": data.get("lastSevenDaysAvgSpO2"),
+            "latestspo2": data.get("latestSpO2"),
+            "rawjson": json.dumps(data, ensure_ascii=False, default=str),
+        }
 
     # ==================== 呼吸数据 ====================
 
-    def collect_respiration_data(self, target_date):
-        try:
-            return garth.connectapi(f"/wellness-service/wellness/daily/respiration/{target_date}")
-        except Exception as e:
-            logger.warning(f"呼吸数据获取失败 {target_date}: {e}")
-            return None
-
-    def _save_respiration(self, target_date, data):
+    @staticmethod
+    def _parse_respiration(target_date, data):
+        """解析呼吸汇总，无有效数据返回 None"""
         if not data:
-            return False
+            return None
         # 检查是否有有效数据
         has_data = any([
             data.get("avgWakingRespirationValue"),
@@ -478,43 +766,25 @@ class GarminDataCollector:
             data.get("respirationValuesArray")
         ])
         if not has_data:
-            logger.info(f"呼吸数据 {target_date} 无有效数据,不记录同步状态")
-            return False
-        try:
-            self.db.upsert_respiration({
-                "respdate": target_date,
-                "avgwaking": data.get("avgWakingRespirationValue"),
-                "highwaking": data.get("highestRespirationValue"),
-                "lowwaking": data.get("lowestRespirationValue"),
-                "avgsleeping": data.get("avgSleepRespirationValue"),
-                "highsleeping": data.get("highestRespirationValue"),
-                "lowsleeping": data.get("lowestRespirationValue"),
-                "rawjson": json.dumps(data, ensure_ascii=False, default=str),
-            })
-            # 呼吸时序明细
-            resp_values = data.get("respirationValuesArray")
-            if resp_values:
-                self.db.batch_upsert_respiration_details(target_date, resp_values)
-            # 只有成功保存数据后才记录同步状态
-            self.db.upsert_sync("garmin", "respiration", target_date)
-            return True
-        except Exception as e:
-            logger.error(f"呼吸存储失败 {target_date}: {e}")
-            self.db.upsert_sync("garmin", "respiration", target_date, status=0, errmsg=str(e))
-            return False
+            return None
+        return {
+            "respdate": target_date,
+            "avgwaking": data.get("avgWakingRespirationValue"),
+            "highwaking": data.get("highestRespirationValue"),
+            "lowwaking": data.get("lowestRespirationValue"),
+            "avgsleeping": data.get("avgSleepRespirationValue"),
+            "highsleeping": data.get("highestRespirationValue"),
+            "lowsleeping": data.get("lowestRespirationValue"),
+            "rawjson": json.dumps(data, ensure_ascii=False, default=str),
+        }
 
     # ==================== HRV数据 ====================
 
-    def collect_hrv_data(self, target_date):
-        try:
-            return garth.connectapi(f"/hrv-service/hrv/{target_date}")
-        except Exception as e:
-            logger.warning(f"HRV数据获取失败 {target_date}: {e}")
-            return None
-
-    def _save_hrv(self, target_date, data):
+    @staticmethod
+    def _parse_hrv(target_date, data):
+        """解析HRV汇总，无有效数据返回 None"""
         if not data:
-            return False
+            return None
         summary = data.get("hrvSummary", data)
         baseline = summary.get("baseline", {})
         # 检查是否有有效数据
@@ -524,31 +794,33 @@ class GarminDataCollector:
             summary.get("lastNight5MinHigh")
         ])
         if not has_data:
-            logger.info(f"HRV数据 {target_date} 无有效数据,不记录同步状态")
-            return False
-        try:
-            self.db.upsert_hrv({
-                "hrvdate": target_date,
-                "weeklyavg": summary.get("weeklyAvg"),
-                "lastnightavg": summary.get("lastNightAvg"),
-                "lastnight5minhigh": summary.get("lastNight5MinHigh"),
-                "baselinelowupper": baseline.get("lowUpper"),
-                "baselinebalancedlow": baseline.get("balancedLow"),
-                "baselinebalancedupper": baseline.get("balancedUpper"),
-                "hrvstatus": summary.get("status"),
-                "rawjson": json.dumps(data, ensure_ascii=False, default=str),
-            })
-            # 只有成功保存数据后才记录同步状态
-            self.db.upsert_sync("garmin", "hrv", target_date)
-            return True
-        except Exception as e:
-            logger.error(f"HRV存储失败 {target_date}: {e}")
-            self.db.upsert_sync("garmin", "hrv", target_date, status=0, errmsg=str(e))
-            return False
+            return None
+        return {
+            "hrvdate": target_date,
+            "weeklyavg": summary.get("weeklyAvg"),
+            "lastnightavg": summary.get("lastNightAvg"),
+            "lastnight5minhigh": summary.get("lastNight5MinHigh"),
+            "baselinelowupper": baseline.get("lowUpper"),
+            "baselinebalancedlow": baseline.get("balancedLow"),
+            "baselinebalancedupper": baseline.get("balancedUpper"),
+            "hrvstatus": summary.get("status"),
+            "rawjson": json.dumps(data, ensure_ascii=False, default=str),
+        }
 
     # ==================== 汇总采集 ====================
 
+    def daily_types(self, names=None):
+        """按日采集的数据类型声明(见 data_types.DATA_TYPES)"""
+        return data_types(names)
+
+    def collect_daily(self, dt, dates, on_progress=None, force=False):
+        """按日期列表采集一种数据类型，调度策略由类型声明决定，on_progress 在每天处理后调用，
+        force=True 时已同步的日期也重新获取"""
+        with self.journal.stage(f"daily:{dt.dtype}"):
+            return self.daily_engine.run(dt, dates, on_progress, force=force)
+
     def collect_all_data(self, days_back=7):
+        self.journal.days_back = days_back
         print(f"\n🚀 开始采集最近{days_back}天的佳明健康数据...")
         print(f"{'='*60}")
 
@@ -556,52 +828,88 @@ class GarminDataCollector:
         self.collect_activities(days_back)
 
         # 按日采集的数据类型
-        daily_types = [
-            ("❤️ 心率", "heartrate", self.collect_heart_rate_data, self._save_heart_rate),
-            ("💤 睡眠", "sleep", self.collect_sleep_data, self._save_sleep),
-            ("😰 压力", "stress", self.collect_stress_data, self._save_stress),
-            ("🩸 血氧", "spo2", self.collect_spo2_data, self._save_spo2),
-            ("🌬️ 呼吸", "respiration", self.collect_respiration_data, self._save_respiration),
-            ("💓 HRV", "hrv", self.collect_hrv_data, self._save_hrv),
-        ]
-
-        for label, dtype, fetch_func, save_func in daily_types:
-            print(f"\n{label} 数据...")
-            success = 0
-            for i in range(days_back):
-                target_date = (datetime.now() - timedelta(days=i+1)).strftime('%Y-%m-%d')
-
-                # 检查是否已同步
-                if self.db.is_synced("garmin", dtype, target_date):
-                    print(f"  ⏭️ {target_date}: 已同步")
-                    success += 1
-                    continue
-
-                data = fetch_func(target_date)
-                if save_func(target_date, data):
-                    print(f"  ✅ {target_date}: 已保存")
-                    success += 1
-                else:
-                    print(f"  ⚠️ {target_date}: 无数据")
+        dates = [(datetime.now() - timedelta(days=i+1)).strftime('%Y-%m-%d') for i in range(days_back)]
+        for dt in self.daily_types():
+            self.collect_daily(dt, dates)
+        # 本次窗口之前、明细覆盖率不足或获取失败的日期(days_back=0 时只采集活动)
+        if dates:
+            self.refetch_gaps(date.fromisoformat(dates[-1]) - timedelta(days=1))
 
-            print(f"  📊 {label} {success}/{days_back}")
+        self.refresh_rollups()
+        metrics.set_sync_progress(self.db.latest_synced_dates("garmin"))
+        http_transport.report(garth.client.sess)
 
         print(f"\n{'='*60}")
         print("✅ 数据采集完成！")
         print(f"{'='*60}")
 
-    def cleanup(self):
-        """清理资源"""
-        self.db.close()
+    def refetch_gaps(self, end):
+        """重新获取最近 lookback_days 天(截至 end)内明细覆盖率不足，以及同步失败的日期
+
+        缺口日期不预先改写同步状态: 重新获取失败时仍为已同步，下次运行会再次检出；
+        同步失败(状态 0)的日期已滑出 days_back 窗口，在此一并重试。
+        """
+        cfg = get_gaps_config()
+        if not cfg.get("enabled", True):
+            return
+        start = date.today() - timedelta(days=int(cfg.get("lookback_days", 30)))
+        if start > end:
+            return
+        with self.journal.stage("gaps"):
+            found = gaps.find_gaps(self.db, start, end)
+            failed = gaps.find_failed(self.db, start, end)
+        by_type = {dt.dtype: dt for dt in self.daily_types()}
+        for dtype, rows in found.items():
+            if dtype in by_type:
+                print(f"\n🩹 {dtype} 明细覆盖率不足 {len(rows)} 天，重新获取")
+                self.collect_daily(by_type[dtype], [day.isoformat() for day, _, _ in rows], force=True)
+        for dtype, days in failed.items():
+            if dtype in by_type:
+                print(f"\n🔁 {dtype} 同步失败 {len(days)} 天，重新获取")
+                self.collect_daily(by_type[dtype], [day.isoformat() for day in days])
+
+    def refresh_rollups(self):
+        """增量刷新本次写入日期的每日汇总与小时汇总，以及新活动之后的训练负荷；完成后失效查询缓存"""
+        dates = set(self.db.touched_dates)
+        activities = set(self.db.touched_activities)
+        try:
+            with self.journal.stage("rollup"):
+                days = self.db.refresh_rollups()
+        finally:
+            # 汇总刷新后再失效，看板下次请求读到完整数据
+            query_api.invalidate(dates, activities)
+            self.db.touched_activities.difference_update(activities)
+        if days:
+            print(f"\n📅 每日汇总已刷新 {days} 天")
+        if self._load_from:
+            with self.journal.stage("training_load"):
+                days = training_load.update_daily(self.db, self._load_from)
+            print(f"📈 训练负荷自 {self._load_from} 起递推 {days} 天")
+            self._load_from = None
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="佳明数据采集")
+    parser.add_argument("--days", type=int, default=7, help="回溯天数")
+    parser.add_argument("--profile", nargs="?", const="./profiles", metavar="DIR",
+                        help="开启分阶段剖析，结果写入 DIR(默认 ./profiles)")
+    parser.add_argument("--profile-top", type=int, default=15, help="剖析摘要显示的函数数")
+    args = parser.parse_args()
+
+    profiler = None
+    if args.profile:
+        from profiling import StageProfiler
+        profiler = StageProfiler(args.profile, top_n=args.profile_top).start()
     collector = GarminDataCollector()
+    collector.journal.profiler = profiler
     try:
-        collector.ensure_login()
-        collector.collect_all_data(days_back=7)
+        with collector.journal.stage("login"):
+            collector.ensure_login()
+        collector.collect_all_data(days_back=args.days)
     except Exception as e:
         print(f"❌ 数据采集失败: {e}")
         logger.error(f"数据采集失败: {e}", exc_info=True)
     finally:
-        collector.cleanup()
\ No newline at end of file
+        collector.cleanup()
+        if profiler:
+            profiler.stop()
@@ -7,6 +7,10 @@ import garth
 from config import get_garmin_config
 
 
+class LoginError(Exception):
+    """佳明登录失败(账号密码错误、需要验证码或会话无法恢复)"""
+
+
 class GarminLogin:
 
     def __init__(self):
@@ -31,6 +35,14 @@ class GarminLogin:
             print(f"❌ 登录失败: {e}")
             return False
 
+    def resume(self):
+        """只加载本地缓存的会话令牌，不访问网络；令牌是否有效由之后的第一个接口请求验证"""
+        try:
+            garth.resume(self.save_path)
+            return True
+        except Exception:
+            return False
+
     def is_logged_in(self):
         try:
             garth.resume(self.save_path)
@@ -43,7 +55,7 @@ class GarminLogin:
         if not self.is_logged_in():
             print("🔐 未登录，开始登录...")
             if not self.login():
-                raise Exception("佳明登录失败")
+                raise LoginError("佳明登录失败")
         else:
             garth.resume(self.save_path)
             print(f"✅ 佳明会话恢复: {garth.client.username}")
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+佳明接口 HTTP 传输层
+为 garth 全局客户端的 requests 会话挂载按采集并发数设置的连接池:
+- 每主机连接数等于并发请求数，池满时等待空闲连接(pool_block)，而不是临时新建、用完即关(每次重新 TCP/TLS 握手)
+- 连接开启 TCP keepalive，一次运行内各类型之间的空闲间隔后连接仍可复用
+- 显式声明可接受的压缩格式(默认 urllib3 可解码的全部格式，安装 brotli 后包含 br)
+
+garth 登录/恢复会话时会重新挂载默认适配器，须在其后重新调用 configure。
+"""
+
+import logging
+import socket
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# TCP keepalive: 空闲多少秒后开始探测
+KEEPALIVE_IDLE = 60
+
+
+def socket_options(keepalive_idle=KEEPALIVE_IDLE):
+    """urllib3 默认选项(TCP_NODELAY) + TCP keepalive"""
+    options = list(HTTPConnection.default_socket_options)
+    if not keepalive_idle:
+        return options
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    # TCP_KEEPIDLE 等仅 Linux 提供，其余平台使用系统默认探测间隔
+    if hasattr(socket, "TCP_KEEPIDLE"):
+        options += [
+            (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, int(keepalive_idle)),
+            (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 15),
+            (socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 4),
+        ]
+    return options
+
+
+class TransportAdapter(HTTPAdapter):
+    """连接带自定义套接字选项的 HTTPAdapter"""
+
+    __attrs__ = HTTPAdapter.__attrs__ + ["socket_options"]
+
+    def __init__(self, socket_options=None, **kwargs):
+        self.socket_options = socket_options
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        if self.socket_options:
+            pool_kwargs["socket_options"] = self.socket_options
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+
+
+def configure(client, cfg, workers):
+    """按数据源配置为 garth 客户端挂载连接池，workers 为最大并发请求数(未配置 max_connections 时作为池大小)"""
+    pool_size = int(cfg.get("max_connections") or workers)
+    # garth 重新挂载默认适配器时也沿用相同的池大小
+    client.pool_connections = client.pool_maxsize = pool_size
+    retry = Retry(total=client.retries, status_forcelist=client.status_forcelist,
+                  backoff_factor=client.backoff_factor)
+    adapter = TransportAdapter(
+        socket_options=socket_options(cfg.get("keepalive_idle", KEEPALIVE_IDLE)),
+        max_retries=retry,
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        pool_block=bool(cfg.get("pool_block", True)),
+    )
+    client.sess.mount("https://", adapter)
+    client.sess.headers["Accept-Encoding"] = cfg.get("accept_encoding") or ACCEPT_ENCODING
+    logger.info(f"HTTP 连接池 {pool_size}，Accept-Encoding: {client.sess.headers['Accept-Encoding']}")
+    return adapter
+
+
+class CountingReader:
+    """包装流式响应(已解压)，统计读出的字节数"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes = 0
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        self.bytes += len(data)
+        return data
+
+
+def record_response(endpoint, resp, decoded_bytes):
+    """记录线上(压缩后)与解压后字节数；须在响应体读完后调用"""
+    wire = resp.raw.tell() if resp.raw is not None else decoded_bytes
+    metrics.record_api_response(endpoint, wire, decoded_bytes)
+
+
+def connection_stats(session):
+    """会话内各连接池累计 (请求数, 新建连接数)"""
+    requests = connections = 0
+    # 同一适配器可能挂载在多个前缀下
+    managers = {id(m): m for m in (getattr(a, "poolmanager", None) for a in session.adapters.values()) if m}
+    for manager in managers.values():
+        for key in manager.pools.keys():
+            pool = manager.pools.get(key)
+            if pool is not None:
+                requests += pool.num_requests
+                connections += pool.num_connections
+    return requests, connections
+
+
+def report(session):
+    """打印并记录本会话的连接复用情况"""
+    requests, connections = connection_stats(session)
+    metrics.API_CONNECTIONS.set(connections)
+    if requests:
+        print(f"  🔌 HTTP: {requests} 个请求，新建 {connections} 个连接")
+    return requests, connections
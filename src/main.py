@@ -4,13 +4,19 @@
 支持多平台数据源：Garmin / Polar / Coros
 """
 
-import sys
-import schedule
 import time
+
+# 进程启动(导入本模块)时刻，用于 run-once 统计冷启动耗时
+_STARTED = time.monotonic()
+
+import sys
+import argparse
 import logging
-from datetime import datetime, date
-from config import get_config
-from garmin_data_collector import GarminDataCollector
+import metrics
+from datetime import date, timedelta
+from config import get_config, get_backfill_config
+
+# garth / psycopg2 / schedule 等较重的模块在各子命令内按需导入
 
 logging.basicConfig(
     level=logging.INFO,
@@ -21,22 +27,57 @@ logger = logging.getLogger(__name__)
 # 最早回溯日期
 EARLIEST_DATE = date(2016, 6, 1)
 
+# run-once 退出码
+EXIT_OK = 0
+EXIT_FAILED = 1       # 采集中有接口请求或写入失败(失败的日期下次运行重试)
+EXIT_USAGE = 2        # 参数错误(同 argparse)
+EXIT_LOGIN = 3        # 佳明登录失败，需检查账号或重新登录
+EXIT_DATABASE = 4     # 数据库不可用
+EXIT_LOCKED = 75      # 其他进程正在采集(EX_TEMPFAIL)，本次跳过
+
 
-def run_garmin(days_back=1):
-    """执行佳明数据收集"""
-    print(f"\n📡 [GARMIN] {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} 数据收集开始 (回溯{days_back}天)...")
-    collector = None
+def run_garmin(days_back=1, profile_dir=None, profile_top=15):
+    """执行佳明数据收集，profile_dir 非空时开启分阶段剖析"""
+    from sources import run_source
+    profiler = None
+    if profile_dir:
+        from profiling import StageProfiler
+        profiler = StageProfiler(profile_dir, top_n=profile_top).start()
     try:
-        collector = GarminDataCollector()
-        collector.ensure_login()
-        collector.collect_all_data(days_back=days_back)
-        print(f"✅ [GARMIN] 数据收集完成")
+        return run_source("garmin", days_back, profiler=profiler)
+    finally:
+        if profiler:
+            profiler.stop()
+
+
+def run_garmin_backfill(init_days, worker_id=None, types=None, max_jobs=None, plan=True):
+    """分片回填: 登记任务后领取执行，多个进程/节点可同时运行"""
+    from backfill import BackfillWorker, plan_backfill
+    from garmin_data_collector import GarminDataCollector
+    cfg = get_backfill_config()
+    collector = GarminDataCollector()
+    collector.journal.days_back = init_days or None
+    success = False
+    errmsg = None
+    try:
+        if plan:
+            end = date.today() - timedelta(days=1)
+            plan_backfill(collector.db, end - timedelta(days=init_days - 1), end, types=types,
+                          chunk_days=int(cfg.get('chunk_days', 30)))
+        with collector.journal.stage("login"):
+            collector.ensure_login()
+        worker = BackfillWorker(collector, worker_id=worker_id, types=types,
+                                lease_seconds=int(cfg.get('lease_seconds', 300)))
+        _, failed = worker.run(max_jobs=max_jobs)
+        success = failed == 0
+        return 0 if success else 1
     except Exception as e:
-        print(f"❌ [GARMIN] 数据收集失败: {e}")
-        logger.error(f"[GARMIN] {e}", exc_info=True)
+        errmsg = str(e)
+        raise
     finally:
-        if collector:
-            collector.cleanup()
+        collector.journal.finish(success, errmsg)
+        collector.journal.save(collector.db)
+        collector.cleanup()
 
 
 def calc_init_days(garmin_cfg):
@@ -49,28 +90,459 @@ def calc_init_days(garmin_cfg):
     return delta.days
 
 
-def main():
+def run_collect(args):
+    """一次性采集: 多个数据源并发执行，共享数据库写入"""
+    from sources import enabled_sources, run_sources
+    names = args.sources or enabled_sources()
+    done = run_sources({name: args.days for name in names})
+    return 0 if len(done) == len(names) else 1
+
+
+def _daily_types():
+    from data_types import DATA_TYPES
+    return DATA_TYPES
+
+
+def _once_dates(args):
+    """run-once 的日期范围 [since, until]，默认只取昨天"""
+    until = date.fromisoformat(args.until) if args.until else date.today() - timedelta(days=1)
+    since = date.fromisoformat(args.since) if args.since else until - timedelta(days=args.days - 1)
+    if since > until:
+        raise ValueError(f"--since {since} 晚于 --until {until}")
+    return since, until
+
+
+def run_once(args):
+    """单次采集(cron / Kubernetes CronJob): 只采集指定类型与日期范围，不做启动回填，结束即退出
+
+    直接使用缓存的佳明会话(首个请求验证，失效才重新登录)，返回值为进程退出码(见 EXIT_*)。
+    """
+    try:
+        since, until = _once_dates(args)
+    except ValueError as e:
+        print(f"❌ 参数错误: {e}")
+        return EXIT_USAGE
+    from garmin_data_collector import GarminDataCollector
+    from garth_utils import LoginError
+
+    types = args.types or ["activity"] + [dt.dtype for dt in _daily_types()]
+    dates = [(until - timedelta(days=i)).isoformat() for i in range((until - since).days + 1)]
+    print(f"🚀 单次采集 {since} ~ {until}: {' '.join(types)}")
+    collector = GarminDataCollector()
+    collector.journal.days_back = len(dates)
+    locked = False
+    success = False
+    errmsg = None
+    try:
+        try:
+            locked = collector.db.try_advisory_lock("garmin:collect")
+        except Exception as e:
+            errmsg = f"数据库不可用: {e}"
+            print(f"❌ {errmsg}")
+            return EXIT_DATABASE
+        if not locked:
+            print("⏭️ 其他进程正在采集，本次跳过")
+            return EXIT_LOCKED
+        collector.journal.stages["startup"] = time.monotonic() - _STARTED
+        try:
+            with collector.journal.stage("login"):
+                collector.ensure_login(fast=True)
+        except LoginError as e:
+            errmsg = str(e)
+            print(f"❌ {errmsg}")
+            return EXIT_LOGIN
+        print(f"⏱️ 冷启动 {collector.journal.stages['startup']:.2f}s，"
+              f"至首个请求完成 {time.monotonic() - _STARTED:.2f}s")
+
+        errors = metrics.error_total()
+        if "activity" in types:
+            collector.collect_activities_between(since, until)
+        daily = [t for t in types if t != "activity"]
+        for dt in collector.daily_types(daily) if daily else []:
+            collector.collect_daily(dt, dates)
+        collector.refresh_rollups()
+        metrics.set_sync_progress(collector.db.latest_synced_dates("garmin"))
+        failed = metrics.error_total() - errors
+        success = failed == 0
+        if not success:
+            errmsg = f"{failed:.0f} 次请求/写入失败"
+        print(f"{'✅' if success else '⚠️'} 单次采集结束{'' if success else f': {errmsg}'}")
+        return EXIT_OK if success else EXIT_FAILED
+    except Exception as e:
+        errmsg = str(e)
+        raise
+    finally:
+        if locked:
+            collector.journal.finish(success, errmsg)
+            collector.journal.save(collector.db)
+        collector.cleanup()
+
+
+def run_reprocess(args):
+    """离线重算: 基于 rawjson 重新解析并批量写回"""
+    from reprocessor import RawJsonReprocessor
+    reprocessor = RawJsonReprocessor(
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        with_details=not args.no_details,
+    )
+    reprocessor.run(types=args.types, start=args.start, end=args.end)
+    return 0
+
+
+def run_export(args):
+    """Parquet 导出: 按类型/月份分区增量导出"""
+    from exporter import ParquetExporter
+    exporter = ParquetExporter(out_dir=args.out)
+    exporter.run(types=args.types, full=args.full)
+    return 0
+
+
+def run_retention(args):
+    """明细数据归档/恢复"""
+    from retention import RetentionManager
+    manager = RetentionManager(archive_path=args.archive_path)
+    if args.action == "archive":
+        manager.archive(types=args.types, include_restored=args.include_restored)
+    else:
+        if not args.types or len(args.types) != 1 or not args.start:
+            raise ValueError("恢复需指定单个 --types 及 --start YYYY-MM")
+        manager.restore(args.types[0], args.start, args.end)
+    return 0
+
+
+def run_backfill(args):
+    """分片回填: 登记任务 / 领取执行 / 查看进度"""
+    if args.action == "work":
+        return run_garmin_backfill(0, worker_id=args.worker_id, types=args.types,
+                                   max_jobs=args.max_jobs, plan=False)
+    from backfill import plan_backfill, print_status
+    from database import GarminDatabase
+    db = GarminDatabase()
+    try:
+        if args.action == "plan":
+            start = date.fromisoformat(args.start) if args.start else EARLIEST_DATE
+            end = date.fromisoformat(args.end) if args.end else None
+            chunk_days = args.chunk_days or int(get_backfill_config().get('chunk_days', 30))
+            plan_backfill(db, start, end, types=args.types, chunk_days=chunk_days)
+        else:
+            print_status(db)
+    finally:
+        db.close()
+    return 0
+
+
+def run_lod(args):
+    """为已有活动生成轨迹多分辨率 LOD"""
+    import track_lod
+    from database import GarminDatabase
+    db = GarminDatabase()
+    try:
+        track_lod.rebuild(db, activity_ids=args.activities)
+    finally:
+        db.close()
+    return 0
+
+
+def run_geo(args):
+    """活动空间索引: 补生成 / 起点附近 / 经过区域"""
+    from database import GarminDatabase
+    db = GarminDatabase()
+    try:
+        if args.action == "rebuild":
+            ids = db.activities_without_geom()
+            print(f"🗺️ 生成活动空间数据: {len(ids)} 个活动")
+            done = sum(1 for aid in ids if db.upsert_activity_geom(aid))
+            print(f"📊 完成 {done}/{len(ids)}")
+            return 0
+        if args.action == "near":
+            if args.lat is None or args.lng is None:
+                raise ValueError("near 需指定 --lat --lng")
+            rows = db.find_activities_near(args.lat, args.lng, args.radius, limit=args.limit)
+        else:
+            bbox = tuple(args.bbox) if args.bbox else None
+            rows = db.find_activities_through(wkt=args.wkt, bbox=bbox, limit=args.limit)
+        for r in rows:
+            dist = f" 起点距离 {r['startdistance']:.0f}m" if r["startdistance"] is not None else ""
+            print(f"  {r['starttime']:%Y-%m-%d %H:%M} {r['activityid']} {r['activityname']}{dist}")
+        print(f"📊 共 {len(rows)} 条")
+    finally:
+        db.close()
+    return 0
+
+
+def run_rollup(args):
+    """重建指定日期范围的每日汇总与小时汇总(日常由采集增量维护)"""
+    from database import GarminDatabase
+    start = date.fromisoformat(args.start) if args.start else EARLIEST_DATE
+    end = date.fromisoformat(args.end) if args.end else date.today()
+    dates = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    db = GarminDatabase()
+    try:
+        days = db.refresh_rollups(dates)
+        print(f"📅 每日汇总已重建 {days} 天 ({start} ~ {end})")
+    finally:
+        db.close()
+    return 0
+
+
+def run_load(args):
+    """训练负荷: 补算缺失的活动 TRIMP 并递推 ATL/CTL/TSB / 查看最近负荷"""
+    import training_load
+    from database import GarminDatabase
+    db = GarminDatabase()
+    try:
+        if args.action == "rebuild":
+            training_load.rebuild(db, start=args.start)
+            return 0
+        print(f"{'日期':<12} {'TRIMP':>8} {'ATL':>8} {'CTL':>8} {'TSB':>8}")
+        for r in reversed(db.recent_training_load(args.days)):
+            print(f"{r['loaddate']!s:<12} {r['dailyload']:>8} {r['atl']:>8} {r['ctl']:>8} {r['tsb']:>8}")
+    finally:
+        db.close()
+    return 0
+
+
+def run_gaps(args):
+    """明细覆盖率缺口: 查看 / 重新登记回填任务"""
+    import gaps
+    from database import GarminDatabase
+    start = date.fromisoformat(args.start) if args.start else EARLIEST_DATE
+    end = date.fromisoformat(args.end) if args.end else None
+    db = GarminDatabase()
+    try:
+        found = gaps.find_gaps(db, start, end, types=args.types)
+        gaps.print_gaps(found)
+        if args.action == "requeue" and found:
+            jobs = gaps.requeue(db, found)
+            print(f"\n🗂️ 已登记 {jobs} 个回填任务，运行 `python src/main.py backfill work` 重新获取")
+    finally:
+        db.close()
+    return 0
+
+
+def run_serve(args):
+    """单独运行只读查询服务(收不到采集器的失效通知，缓存按 ttl 过期)"""
+    import query_api
+    from config import get_query_api_config
+    cfg = get_query_api_config()
+    port = args.port or cfg.get('port') or 8108
+    server = query_api.start_server(int(port), args.host or cfg.get('host', '0.0.0.0'),
+                                    ttl=args.ttl or cfg.get('ttl') or 300)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+def run_report(args):
+    """运行性能报告: 最近运行与滚动基线对比"""
+    from database import GarminDatabase
+    from run_journal import print_report
+    db = GarminDatabase()
+    try:
+        print_report(db, recent=args.recent, baseline=args.baseline, threshold=args.threshold)
+    finally:
+        db.close()
+    return 0
+
+
+def run_changes(args):
+    """变更通知: 列出 / 跟随 outbox 事件，或清理过期事件"""
+    import change_feed
+    from config import get_change_feed_config
+    from database import GarminDatabase
+    db = GarminDatabase()
+    try:
+        if args.action == "prune":
+            days = args.days if args.days is not None else int(get_change_feed_config().get('retention_days', 30))
+            print(f"🧹 已删除 {db.prune_changes(days)} 条 {days} 天前的变更事件")
+        elif args.action == "follow":
+            change_feed.print_changes(change_feed.follow(db, args.after))
+        else:
+            change_feed.print_changes(change_feed.to_event(r) for r in db.changes_after(args.after, args.limit))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.close()
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="运动健康数据收集器")
+    parser.add_argument("--profile", nargs="?", const="./profiles", metavar="DIR",
+                        help="开启分阶段剖析(cProfile + tracemalloc)，结果写入 DIR(默认 ./profiles)")
+    parser.add_argument("--profile-top", type=int, default=15, help="剖析摘要显示的函数数")
+    sub = parser.add_subparsers(dest="command")
+
+    p = sub.add_parser("collect", help="一次性采集，多个数据源并发执行(默认 config.yml 中配置的全部数据源)")
+    p.add_argument("--sources", nargs="+", help="数据源名称，如 garmin")
+    p.add_argument("--days", type=int, default=1, help="回溯天数")
+    p.set_defaults(func=run_collect)
+
+    p = sub.add_parser("run-once", help="单次采集指定类型与日期范围后退出(定时任务/CronJob，不做启动回填)")
+    p.add_argument("--types", nargs="+", choices=["activity"] + [dt.dtype for dt in _daily_types()],
+                   metavar="TYPE", help="数据类型(默认全部): activity heartrate sleep stress spo2 respiration hrv")
+    p.add_argument("--since", help="起始日期 YYYY-MM-DD(默认按 --days)")
+    p.add_argument("--until", help="结束日期 YYYY-MM-DD(默认昨天)")
+    p.add_argument("--days", type=int, default=1, help="未指定 --since 时回溯天数")
+    p.set_defaults(func=run_once)
+
+    p = sub.add_parser("reprocess", help="基于已存储的 rawjson 离线重算汇总及明细表")
+    p.add_argument("--types", nargs="+", help="数据类型(默认全部): heartrate sleep stress spo2 respiration hrv")
+    p.add_argument("--start", help="起始日期 YYYY-MM-DD")
+    p.add_argument("--end", help="结束日期 YYYY-MM-DD")
+    p.add_argument("--workers", type=int, help="解析进程数(默认CPU核数)")
+    p.add_argument("--chunk-size", type=int, default=200, help="每批天数")
+    p.add_argument("--no-details", action="store_true", help="只重算汇总表，不重写明细")
+    p.set_defaults(func=run_reprocess)
+
+    p = sub.add_parser("export", help="按类型/月份分区导出 Parquet 数据集")
+    p.add_argument("--types", nargs="+", help="数据类型(默认全部): heartrate stress respiration spo2 sleep activity")
+    p.add_argument("--out", help="导出目录(默认 export.path)")
+    p.add_argument("--full", action="store_true", help="忽略导出记录，全量重新导出")
+    p.set_defaults(func=run_export)
+
+    p = sub.add_parser("retention", help="按保留策略归档明细数据，或从归档恢复")
+    p.add_argument("action", choices=["archive", "restore"])
+    p.add_argument("--types", nargs="+", help="数据类型(默认全部已配置策略): heartrate stress respiration spo2 sleep activity")
+    p.add_argument("--start", help="恢复起始月份 YYYY-MM")
+    p.add_argument("--end", help="恢复结束月份 YYYY-MM(默认同 --start)")
+    p.add_argument("--archive-path", help="归档目录(默认 retention.archive_path)")
+    p.add_argument("--include-restored", action="store_true", help="归档时包含曾被恢复的月份")
+    p.set_defaults(func=run_retention)
+
+    p = sub.add_parser("backfill", help="分片回填: 多进程/多节点领取任务共同完成历史数据回填")
+    p.add_argument("action", choices=["plan", "work", "status"])
+    p.add_argument("--types", nargs="+", help="数据类型(默认全部): activity heartrate sleep stress spo2 respiration hrv")
+    p.add_argument("--start", help="登记起始日期 YYYY-MM-DD(默认 2016-06-01)")
+    p.add_argument("--end", help="登记结束日期 YYYY-MM-DD(默认昨天)")
+    p.add_argument("--chunk-days", type=int, help="每个任务覆盖天数(默认 backfill.chunk_days)")
+    p.add_argument("--worker-id", help="工作进程标识(默认 主机名:pid)")
+    p.add_argument("--max-jobs", type=int, help="最多执行任务数")
+    p.set_defaults(func=run_backfill)
+
+    p = sub.add_parser("lod", help="为已有活动生成轨迹多分辨率(按缩放级别抽稀的编码折线)")
+    p.add_argument("--activities", nargs="+", help="活动id(默认全部缺少 LOD 的活动)")
+    p.set_defaults(func=run_lod)
+
+    p = sub.add_parser("geo", help="活动空间查询(需 PostGIS，见 script/postgis.sql)")
+    p.add_argument("action", choices=["rebuild", "near", "region"])
+    p.add_argument("--lat", type=float, help="near: 中心纬度")
+    p.add_argument("--lng", type=float, help="near: 中心经度")
+    p.add_argument("--radius", type=float, default=2000, help="near: 起点半径(米)")
+    p.add_argument("--wkt", help="region: WGS84 多边形 WKT")
+    p.add_argument("--bbox", type=float, nargs=4, metavar=("MIN_LNG", "MIN_LAT", "MAX_LNG", "MAX_LAT"),
+                   help="region: 外包框")
+    p.add_argument("--limit", type=int, default=100)
+    p.set_defaults(func=run_geo)
+
+    p = sub.add_parser("rollup", help="重建每日汇总宽表与小时汇总(日常由采集增量维护)")
+    p.add_argument("--start", help="起始日期 YYYY-MM-DD(默认 2016-06-01)")
+    p.add_argument("--end", help="结束日期 YYYY-MM-DD(默认今天)")
+    p.set_defaults(func=run_rollup)
+
+    p = sub.add_parser("load", help="训练负荷 TRIMP 与 ATL/CTL/TSB(日常由采集增量维护)")
+    p.add_argument("action", choices=["rebuild", "show"])
+    p.add_argument("--start", help="rebuild: 另外从该日期 YYYY-MM-DD 起重新递推")
+    p.add_argument("--days", type=int, default=30, help="show: 显示最近天数")
+    p.set_defaults(func=run_load)
+
+    p = sub.add_parser("gaps", help="明细覆盖率缺口检测，只重采明细稀疏的日期")
+    p.add_argument("action", choices=["scan", "requeue"])
+    p.add_argument("--types", nargs="+", help="数据类型(默认全部): heartrate stress respiration spo2")
+    p.add_argument("--start", help="起始日期 YYYY-MM-DD(默认 2016-06-01)")
+    p.add_argument("--end", help="结束日期 YYYY-MM-DD(默认昨天)")
+    p.set_defaults(func=run_gaps)
+
+    p = sub.add_parser("changes", help="变更通知: 输出 outbox 事件(每行一个 JSON)，follow 持续等待新事件，prune 清理过期事件")
+    p.add_argument("action", nargs="?", choices=["list", "follow", "prune"], default="list")
+    p.add_argument("--after", type=int, default=0, help="list/follow: 从该事件 id 之后开始(消费方记录的已处理位置)")
+    p.add_argument("--limit", type=int, default=100, help="list: 最多输出条数")
+    p.add_argument("--days", type=int, help="prune: 保留天数(默认 change_feed.retention_days 或 30)")
+    p.set_defaults(func=run_changes)
+
+    p = sub.add_parser("serve", help="单独运行只读查询服务(与采集同进程时由 config.yml 的 query_api.port 启动)")
+    p.add_argument("--port", type=int, help="端口(默认 query_api.port 或 8108)")
+    p.add_argument("--host", help="监听地址(默认 0.0.0.0)")
+    p.add_argument("--ttl", type=float, help="缓存过期秒数(默认 query_api.ttl 或 300)")
+    p.set_defaults(func=run_serve)
+
+    p = sub.add_parser("report", help="运行性能报告，标记相对滚动基线变慢的阶段")
+    p.add_argument("--recent", type=int, default=5, help="检查最近运行次数")
+    p.add_argument("--baseline", type=int, default=20, help="基线取之前成功运行次数")
+    p.add_argument("--threshold", type=float, default=1.5, help="超过基线中位数的倍数视为退化")
+    p.set_defaults(func=run_report)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command:
+        try:
+            return args.func(args)
+        except Exception as e:
+            print(f"❌ {args.command} 执行失败: {e}")
+            logger.error(f"{e}", exc_info=True)
+            return 1
+    return run_daemon(profile_dir=args.profile, profile_top=args.profile_top)
+
+
+def run_daemon(profile_dir=None, profile_top=15):
+    import schedule
+    from sources import enabled_sources, run_sources, spawn_source
     try:
         config = get_config()
         garmin_cfg = config.get('garmin', {})
         print("🚀 运动健康数据收集器启动")
         print("=" * 50)
 
-        # 首次运行：按 init_days 配置回溯
+        metrics_port = (config.get('metrics') or {}).get('port')
+        if metrics_port:
+            metrics.start_server(int(metrics_port))
+        query_cfg = config.get('query_api') or {}
+        if query_cfg.get('port'):
+            import query_api
+            query_api.start_server(int(query_cfg['port']), query_cfg.get('host', '0.0.0.0'))
+
+        names = enabled_sources(config)
+        others = [name for name in names if name != "garmin"]
+
+        # 首次运行：按各数据源 init_days 配置回溯
         init_days = calc_init_days(garmin_cfg)
         print(f"📊 首次运行，回溯 {init_days} 天数据...")
-        run_garmin(days_back=init_days)
+        if (config.get('backfill') or {}).get('enabled'):
+            # 其他数据源后台采集，佳明各副本登记同一批任务(幂等)后分头领取
+            for name in others:
+                spawn_source(name, calc_init_days(config.get(name) or {}))
+            try:
+                run_garmin_backfill(init_days)
+            except Exception as e:
+                print(f"❌ [GARMIN] 分片回填失败: {e}")
+                logger.error(f"[GARMIN] {e}", exc_info=True)
+        elif profile_dir or not others:
+            for name in others:
+                spawn_source(name, calc_init_days(config.get(name) or {}))
+            run_garmin(days_back=init_days, profile_dir=profile_dir, profile_top=profile_top)
+        else:
+            run_sources({name: calc_init_days(config.get(name) or {}) for name in names})
 
-        # 每日定时:按 sync_days 配置回溯(默认7天)
-        sync_days = garmin_cfg.get('sync_days', 7)
-        garmin_schedule = garmin_cfg.get('schedule', '08:00')
-        schedule.every().day.at(garmin_schedule).do(run_garmin, days_back=sync_days)
+        # 每日定时:按各数据源 sync_days 配置回溯(默认7天)，各自后台线程执行，互不阻塞
         print(f"\n⏰ 定时任务:")
-        print(f"   - Garmin 每日 {garmin_schedule} (获取前{sync_days}天数据)")
-
-        # TODO: 后续扩展
-        # polar_schedule = config.get('polar', {}).get('schedule', '08:30')
-        # coros_schedule = config.get('coros', {}).get('schedule', '09:00')
+        for name in names:
+            cfg = config.get(name) or {}
+            sync_days = cfg.get('sync_days', 7)
+            at = cfg.get('schedule', '08:00')
+            if name == "garmin" and profile_dir:
+                # 剖析为进程级，佳明在主线程执行
+                schedule.every().day.at(at).do(run_garmin, days_back=sync_days,
+                                               profile_dir=profile_dir, profile_top=profile_top)
+            else:
+                schedule.every().day.at(at).do(spawn_source, name, sync_days)
+            print(f"   - {name.capitalize()} 每日 {at} (获取前{sync_days}天数据)")
 
         print("\n🔄 定时任务运行中...")
 
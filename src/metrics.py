@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+运行指标模块
+进程内收集接口耗时、数据库写入、同步进度等指标，
+以 Prometheus 文本格式通过内嵌 HTTP 端口暴露 (/metrics, /healthz)
+"""
+
+import bisect
+import logging
+import threading
+import time
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+_registry = []
+_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, doc, labelnames=()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        _registry.append(self)
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        with _lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+        return child
+
+    def _default(self):
+        return self.labels()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        with _lock:
+            children = list(self._children.items())
+        for key, child in children:
+            lines.extend(self._render_child(key, child))
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self.func = None
+
+    def inc(self, amount=1):
+        with _lock:
+            self.value += amount
+
+    def set(self, value):
+        with _lock:
+            self.value = float(value)
+
+    def set_function(self, func):
+        """取值时调用 func 计算(如同步滞后天数)"""
+        self.func = func
+
+    def get(self):
+        return self.func() if self.func else self.value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def _render_child(self, key, child):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {child.get()}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value):
+        self._default().set(value)
+
+
+class _Buckets:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        with _lock:
+            self.counts[bisect.bisect_left(self.bounds, value)] += 1
+            self.sum += value
+            self.count += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, doc, labelnames=(), buckets=(0.1, 0.5, 1, 5, 10)):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, doc, labelnames)
+
+    def _new_child(self):
+        return _Buckets(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def _render_child(self, key, child):
+        lines = []
+        cumulative = 0
+        for bound, cnt in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += cnt
+            le = "+Inf" if bound == float("inf") else repr(float(bound))
+            labels = _format_labels(self.labelnames, key, f'le="{le}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {child.sum}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+# ==================== 指标定义 ====================
+
+API_LATENCY = Histogram(
+    "garmin_api_request_seconds", "佳明接口请求耗时(秒)", ["endpoint"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+API_ERRORS = Counter("garmin_api_errors_total", "佳明接口请求失败次数", ["endpoint"])
+API_BYTES = Counter("garmin_api_response_bytes_total", "佳明接口响应体线上字节数(压缩后)", ["endpoint"])
+API_DECODED_BYTES = Counter("garmin_api_decoded_bytes_total", "佳明接口响应体解压后字节数", ["endpoint"])
+API_CONNECTIONS = Gauge("garmin_api_connections_opened", "佳明接口会话累计新建的 HTTP 连接数")
+
+DB_ROWS = Counter("garmin_db_rows_written_total", "数据库写入行数", ["table"])
+DB_WRITE_LATENCY = Histogram(
+    "garmin_db_write_seconds", "数据库写入(含提交)耗时(秒)", ["table"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+DB_COMMITS = Counter("garmin_db_commits_total", "数据库提交次数", ["table"])
+DB_ERRORS = Counter("garmin_db_write_errors_total", "数据库写入失败次数", ["table"])
+
+SYNC_NEWEST = Gauge("garmin_sync_newest_date_timestamp_seconds", "各类型最新同步日期(unix秒)", ["datatype"])
+SYNC_LAG = Gauge("garmin_sync_lag_days", "各类型最新同步日期距今天数", ["datatype"])
+QUEUE_DEPTH = Gauge("garmin_collect_queue_depth", "当前采集待处理项数", ["datatype"])
+
+QUERY_REQUESTS = Counter("garmin_query_requests_total", "查询服务请求数", ["endpoint", "status"])
+QUERY_CACHE = Counter("garmin_query_cache_total", "查询服务缓存单元(按日/活动)命中情况", ["result"])
+
+RUNS = Counter("garmin_runs_total", "采集运行次数", ["status"])
+RUN_DURATION = Gauge("garmin_run_duration_seconds", "最近一次采集运行耗时(秒)")
+RUN_LAST_FINISHED = Gauge("garmin_run_last_finished_timestamp_seconds", "最近一次采集结束时间(unix秒)")
+RUN_LAST_SUCCESS = Gauge("garmin_run_last_success_timestamp_seconds", "最近一次成功采集结束时间(unix秒)")
+
+
+# ==================== 按数据源累计 ====================
+# 多个数据源在同一进程内并发采集，全局累计值的差会混入其他数据源的请求与写入；
+# 线程登记所属数据源后(采集线程池继承)，请求与写入同时计入该数据源，运行日志按数据源计算增量
+
+_local = threading.local()
+_RUN_KEYS = ("requests", "apiseconds", "bytesdownloaded", "rowswritten", "dbseconds", "dbcommits")
+_source_totals = {}
+
+
+def set_source(name):
+    """登记当前线程所属的数据源"""
+    _local.source = name
+
+
+def current_source():
+    return getattr(_local, "source", None)
+
+
+def _tally(**amounts):
+    source = current_source()
+    if source is None:
+        return
+    with _lock:
+        totals = _source_totals.setdefault(source, dict.fromkeys(_RUN_KEYS, 0))
+        for key, value in amounts.items():
+            totals[key] += value
+
+
+def record_api_request(endpoint, seconds):
+    API_LATENCY.labels(endpoint).observe(seconds)
+    _tally(requests=1, apiseconds=seconds)
+
+
+def record_api_response(endpoint, wire_bytes, decoded_bytes):
+    API_BYTES.labels(endpoint).inc(wire_bytes)
+    API_DECODED_BYTES.labels(endpoint).inc(decoded_bytes)
+    _tally(bytesdownloaded=wire_bytes)
+
+
+def record_db_write(table, rows, seconds, commits=1):
+    DB_ROWS.labels(table).inc(rows)
+    DB_WRITE_LATENCY.labels(table).observe(seconds)
+    if commits:
+        DB_COMMITS.labels(table).inc(commits)
+    _tally(rowswritten=rows, dbseconds=seconds, dbcommits=commits)
+
+
+def record_db_commit(table):
+    DB_COMMITS.labels(table).inc()
+    _tally(dbcommits=1)
+
+
+def set_sync_progress(latest_dates):
+    """latest_dates: {datatype: date}，滞后天数在抓取时按当天计算"""
+    for dtype, newest in latest_dates.items():
+        if newest is None:
+            continue
+        SYNC_NEWEST.labels(dtype).set(datetime(newest.year, newest.month, newest.day).timestamp())
+        SYNC_LAG.labels(dtype).set_function(lambda d=newest: (date.today() - d).days)
+
+
+def record_run(success, seconds):
+    now = time.time()
+    RUNS.labels("success" if success else "failure").inc()
+    RUN_DURATION.set(seconds)
+    RUN_LAST_FINISHED.set(now)
+    if success:
+        RUN_LAST_SUCCESS.set(now)
+
+
+def _counter_total(metric):
+    with _lock:
+        return sum(c.value for c in metric._children.values())
+
+
+def _histogram_total(metric):
+    with _lock:
+        children = list(metric._children.values())
+        return sum(c.sum for c in children), sum(c.count for c in children)
+
+
+def error_total():
+    """接口请求与数据库写入失败累计次数"""
+    return _counter_total(API_ERRORS) + _counter_total(DB_ERRORS)
+
+
+def snapshot(source=None):
+    """当前累计值快照，用于计算单次运行的增量；指定 source 时只取该数据源的累计值"""
+    if source is not None:
+        with _lock:
+            return dict(_source_totals.get(source) or dict.fromkeys(_RUN_KEYS, 0))
+    api_seconds, requests = _histogram_total(API_LATENCY)
+    db_seconds, _ = _histogram_total(DB_WRITE_LATENCY)
+    return {
+        "requests": requests,
+        "apiseconds": api_seconds,
+        "bytesdownloaded": _counter_total(API_BYTES),
+        "rowswritten": _counter_total(DB_ROWS),
+        "dbseconds": db_seconds,
+        "dbcommits": _counter_total(DB_COMMITS),
+    }
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ==================== HTTP 端口 ====================
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/metrics":
+            body = render().encode("utf-8")
+            self._reply(200, body, "text/plain; version=0.0.4; charset=utf-8")
+        elif path == "/healthz":
+            self._reply(200, b"ok\n", "text/plain; charset=utf-8")
+        else:
+            self._reply(404, b"not found\n", "text/plain; charset=utf-8")
+
+    def _reply(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def start_server(port, host="0.0.0.0"):
+    """后台线程启动指标端口"""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    print(f"📈 指标端口已启动: http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+运行剖析模块
+按采集阶段记录 CPU profile(cProfile) 与 tracemalloc 内存快照，
+并对主线程采样生成折叠栈(flamegraph.pl / speedscope 可直接打开)，运行结束打印 Top-N 摘要
+
+输出目录结构:
+    <dir>/NN-<阶段>.prof      cProfile 数据(snakeviz / flameprof 可视化)
+    <dir>/NN-<阶段>.mem.txt   阶段内内存分配 Top-N
+    <dir>/run.folded          整次运行的折叠栈采样，根帧为阶段名
+"""
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class _StackSampler(threading.Thread):
+    """定时采样目标线程调用栈，累计折叠栈计数"""
+
+    def __init__(self, thread_id, interval=0.005):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stage = "-"
+        self.counts = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.append(f"stage:{self.stage}")
+            self.counts[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class StageProfiler:
+    """分阶段剖析器"""
+
+    def __init__(self, out_dir=None, top_n=15, sample_interval=0.005):
+        base = out_dir or "./profiles"
+        self.out_dir = os.path.join(base, datetime.now().strftime("%Y%m%d-%H%M%S"))
+        self.top_n = top_n
+        self.results = []
+        self._index = 0
+        self._active = False
+        self._sampler = _StackSampler(threading.get_ident(), sample_interval)
+
+    def start(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+        self._sampler.start()
+        return self
+
+    @contextmanager
+    def stage(self, name):
+        """剖析一个阶段；嵌套阶段只计入外层 CPU profile"""
+        if self._active:
+            yield
+            return
+        self._active = True
+        self._index += 1
+        safe_name = re.sub(r"[^\w.-]+", "_", name)
+        prefix = os.path.join(self.out_dir, f"{self._index:02d}-{safe_name}")
+        self._sampler.stage = name
+        tracemalloc.reset_peak()
+        mem_before = tracemalloc.take_snapshot()
+        profile = cProfile.Profile()
+        t0 = time.monotonic()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            elapsed = time.monotonic() - t0
+            self._sampler.stage = "-"
+            self._active = False
+            _, peak = tracemalloc.get_traced_memory()
+            mem_after = tracemalloc.take_snapshot()
+            self._save_stage(name, prefix, profile, elapsed, peak, mem_before, mem_after)
+
+    def _save_stage(self, name, prefix, profile, elapsed, peak, mem_before, mem_after):
+        profile.dump_stats(prefix + ".prof")
+        stats = pstats.Stats(profile)
+        # 排除剖析器自身的分配
+        ignore = [tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, tracemalloc.__file__),
+                  tracemalloc.Filter(False, "<frozen importlib._bootstrap>")]
+        diff = mem_after.filter_traces(ignore).compare_to(mem_before.filter_traces(ignore), "lineno")
+        with open(prefix + ".mem.txt", "w", encoding="utf-8") as f:
+            f.write(f"阶段 {name} 峰值内存 {peak / 1024 / 1024:.1f}MB\n")
+            for stat in diff[:self.top_n]:
+                f.write(f"{stat}\n")
+        self.results.append({
+            "stage": name,
+            "seconds": elapsed,
+            "peak_mb": peak / 1024 / 1024,
+            "stats": stats,
+            "alloc": diff[:3],
+        })
+
+    def stop(self):
+        """停止采样，写出折叠栈并打印摘要"""
+        self._sampler.stop()
+        folded = os.path.join(self.out_dir, "run.folded")
+        with open(folded, "w", encoding="utf-8") as f:
+            for stack, count in self._sampler.counts.most_common():
+                f.write(f"{stack} {count}\n")
+        tracemalloc.stop()
+        self.print_summary()
+
+    def print_summary(self):
+        print(f"\n🔬 剖析结果 -> {self.out_dir}")
+        print("=" * 60)
+        for res in sorted(self.results, key=lambda r: r["seconds"], reverse=True):
+            print(f"▶ {res['stage']}: {res['seconds']:.2f}s, 峰值内存 {res['peak_mb']:.1f}MB")
+            buf = io.StringIO()
+            res["stats"].stream = buf
+            res["stats"].sort_stats("cumulative").print_stats(self.top_n)
+            for line in buf.getvalue().splitlines():
+                # 只保留函数行，跳过 pstats 表头
+                if re.match(r"^\s+\d", line) and "function calls" not in line:
+                    print(f"    {line.strip()}")
+            for stat in res["alloc"]:
+                print(f"    📦 {stat}")
+        print("=" * 60)
+        # 全局热点: 按折叠栈叶子帧自耗时汇总
+        leaves = Counter()
+        total = sum(self._sampler.counts.values()) or 1
+        for stack, count in self._sampler.counts.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        print(f"🔥 采样热点 Top {self.top_n} (共 {total} 个样本):")
+        for frame, count in leaves.most_common(self.top_n):
+            print(f"    {count / total * 100:5.1f}%  {frame}")
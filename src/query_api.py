@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+只读查询服务
+为看板提供每日汇总、时序区间与活动轨迹的 HTTP 查询，避免各自直连数据库反复执行相同查询
+
+结果按"日期/活动"为单元缓存在进程内 LRU 中，区间请求由各日单元拼接，只查询未命中的日期；
+响应带 ETag，客户端携带 If-None-Match 命中时返回 304。
+与采集器同进程运行时，采集器刷新汇总后按本次写入的日期与活动精确失效对应单元，
+看板重复加载不再访问数据库；单独运行(serve)时收不到失效通知，按 ttl 过期。
+
+接口:
+    GET /api/daily?start=&end=                       每日汇总宽表
+    GET /api/series/<类型>?start=&end=&resolution=   明细时序(raw)或小时汇总(hour)
+    GET /api/activities?start=&end=                  活动汇总
+    GET /api/activities/<活动id>/track?zoom=          活动轨迹(带 zoom 时取多分辨率折线)
+"""
+
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+import metrics
+from config import get_query_api_config
+
+logger = logging.getLogger(__name__)
+
+# 时序接口支持的数据类型(与 GarminDatabase.HOURLY_SOURCES 一致)
+SERIES_TYPES = ("heartrate", "stress", "respiration", "spo2")
+
+
+def _etag(body):
+    return '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"无法序列化: {type(value)}")
+
+
+def _dumps(value):
+    return json.dumps(value, default=_json_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class QueryCache:
+    """按单元缓存序列化后的响应片段，LRU 淘汰；条目带标签(("date", 日期) / ("activity", 活动id))按标签失效
+
+    generation 在每次失效时递增: 查询数据库前记下，写入缓存时若已变化则不缓存，
+    避免查询期间采集器写入并失效后，旧结果又被放回缓存。
+    """
+
+    def __init__(self, max_entries=4096, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.generation = 0
+        self._entries = OrderedDict()   # key -> (body, etag, expires, tags)
+        self._tags = {}                 # tag -> {key, ...}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """命中返回 (body, etag)，否则 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] is not None and entry[2] < time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0], entry[1]
+
+    def put(self, key, body, tags, generation):
+        """写入单元，返回 (body, etag)；generation 已过期时只返回不缓存"""
+        etag = _etag(body)
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if generation != self.generation:
+                return body, etag
+            self._drop(key)
+            self._entries[key] = (body, etag, expires, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+        return body, etag
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[3]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate(self, tags):
+        """失效带有任一标签的条目，返回失效条数"""
+        with self._lock:
+            self.generation += 1
+            keys = set()
+            for tag in tags:
+                keys |= self._tags.get(tag, set())
+            for key in keys:
+                self._drop(key)
+            return len(keys)
+
+
+class QueryService:
+    """查询单元的缓存读取与拼接，db 为只读 GarminDatabase(多线程共享时需加锁，见 sources.SharedDatabase)"""
+
+    def __init__(self, db, cache, max_days=366):
+        self.db = db
+        self.cache = cache
+        self.max_days = max_days
+
+    def _days(self, prefix, days, load):
+        """按日取单元 [(日期, (body, etag)), ...]，未命中的日期用 load(日期列表) 一次查询"""
+        parts = {}
+        missing = []
+        for day in days:
+            hit = self.cache.get(prefix + (day,))
+            if hit is None:
+                missing.append(day)
+            else:
+                parts[day] = hit
+        metrics.QUERY_CACHE.labels("hit").inc(len(parts))
+        if missing:
+            metrics.QUERY_CACHE.labels("miss").inc(len(missing))
+            generation = self.cache.generation
+            loaded = load(missing)
+            for day in missing:
+                parts[day] = self.cache.put(prefix + (day,), _dumps(loaded.get(day)),
+                                            (("date", day),), generation)
+        return [(day, parts[day]) for day in days]
+
+    def _one(self, key, activity_id, load):
+        hit = self.cache.get(key)
+        if hit is not None:
+            metrics.QUERY_CACHE.labels("hit").inc()
+            return hit
+        metrics.QUERY_CACHE.labels("miss").inc()
+        generation = self.cache.generation
+        return self.cache.put(key, _dumps(load()), (("activity", activity_id),), generation)
+
+    @staticmethod
+    def _join(parts):
+        """按日单元拼成 {日期: 数据}，ETag 由各单元 ETag 组合，不必拼接即可判断 304"""
+        etag = _etag("".join(day + tag for day, (_, tag) in parts).encode("utf-8"))
+
+        def body():
+            return b"{" + b",".join(b'"' + day.encode() + b'":' + part for day, (part, _) in parts) + b"}"
+        return etag, body
+
+    def date_range(self, query):
+        today = date.today()
+        end = date.fromisoformat(query["end"][0]) if "end" in query else today
+        start = date.fromisoformat(query["start"][0]) if "start" in query else end
+        days = (end - start).days + 1
+        if days < 1:
+            raise ValueError("start 晚于 end")
+        if days > self.max_days:
+            raise ValueError(f"日期范围超过 {self.max_days} 天")
+        return [(start + timedelta(days=i)).isoformat() for i in range(days)]
+
+    def daily(self, query):
+        return self._join(self._days(("daily",), self.date_range(query), self.db.daily_rollups))
+
+    def series(self, dtype, query):
+        if dtype not in SERIES_TYPES:
+            raise LookupError(f"未知数据类型: {dtype}")
+        resolution = query.get("resolution", ["raw"])[0]
+        if resolution == "raw":
+            load = lambda days: self.db.detail_series(dtype, days)
+        elif resolution == "hour":
+            load = lambda days: self.db.hourly_series(dtype, days)
+        else:
+            raise ValueError("resolution 取值 raw / hour")
+        return self._join(self._days(("series", dtype, resolution), self.date_range(query), load))
+
+    def activities(self, query):
+        return self._join(self._days(("activities",), self.date_range(query), self.db.activities_on))
+
+    def track(self, activity_id, query):
+        zoom = int(query["zoom"][0]) if "zoom" in query else None
+        if zoom is None:
+            body, etag = self._one(("track", activity_id), activity_id,
+                                   lambda: self.db.activity_track(activity_id) or None)
+        else:
+            body, etag = self._one(("track", activity_id, zoom), activity_id,
+                                   lambda: self.db.get_track_lod(activity_id, zoom))
+        if body == b"null":
+            raise LookupError(f"活动 {activity_id} 无轨迹")
+        return etag, lambda: body
+
+
+_ROUTES = (
+    ("daily", re.compile(r"^/api/daily$"), lambda s, m, q: s.daily(q)),
+    ("series", re.compile(r"^/api/series/(\w+)$"), lambda s, m, q: s.series(m.group(1), q)),
+    ("activities", re.compile(r"^/api/activities$"), lambda s, m, q: s.activities(q)),
+    ("track", re.compile(r"^/api/activities/([\w-]+)/track$"), lambda s, m, q: s.track(m.group(1), q)),
+)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/healthz":
+            self._reply(200, b"ok\n", "text/plain; charset=utf-8")
+            return
+        for endpoint, pattern, handle in _ROUTES:
+            m = pattern.match(url.path)
+            if m:
+                break
+        else:
+            self._reply(404, b'{"error":"not found"}', "application/json; charset=utf-8")
+            return
+        try:
+            etag, body = handle(self.service, m, parse_qs(url.query))
+        except LookupError as e:
+            return self._error(endpoint, 404, e)
+        except ValueError as e:
+            return self._error(endpoint, 400, e)
+        except Exception as e:
+            logger.error(f"查询失败 {self.path}: {e}", exc_info=True)
+            return self._error(endpoint, 500, "查询失败")
+        if etag in (self.headers.get("If-None-Match") or ""):
+            metrics.QUERY_REQUESTS.labels(endpoint, "304").inc()
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        metrics.QUERY_REQUESTS.labels(endpoint, "200").inc()
+        self._reply(200, body(), "application/json; charset=utf-8", etag)
+
+    def _error(self, endpoint, status, message):
+        metrics.QUERY_REQUESTS.labels(endpoint, str(status)).inc()
+        self._reply(status, _dumps({"error": str(message)}), "application/json; charset=utf-8")
+
+    def _reply(self, status, body, content_type, etag=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+            # 每次向服务端校验，未变化时 304
+            self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+# 本进程的查询缓存，未启动查询服务时为 None
+_cache = None
+
+
+def start_server(port, host="0.0.0.0", ttl=None):
+    """后台线程启动查询服务(只读连接)，返回 server"""
+    global _cache
+    from database import GarminDatabase
+    from sources import SharedDatabase
+    cfg = get_query_api_config()
+    ttl = ttl if ttl is not None else cfg.get("ttl")
+    _cache = QueryCache(int(cfg.get("max_entries", 4096)), ttl=float(ttl) if ttl else None)
+    db = SharedDatabase(GarminDatabase(readonly=True))
+    handler = type("QueryHandler", (_Handler,), {
+        "service": QueryService(db, _cache, max_days=int(cfg.get("max_days", 366))),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, name="query-server", daemon=True)
+    thread.start()
+    print(f"🔎 查询服务已启动: http://{host}:{port}/api/daily")
+    return server
+
+
+def invalidate(dates=(), activities=()):
+    """失效指定日期与活动的缓存单元(采集写入后调用)，未启动查询服务时无操作"""
+    if _cache is None:
+        return 0
+    tags = [("date", str(d)[:10]) for d in dates] + [("activity", str(a)) for a in activities]
+    if not tags:
+        return 0
+    dropped = _cache.invalidate(tags)
+    logger.info(f"查询缓存失效 {len(dates)} 天 / {len(activities)} 个活动，共 {dropped} 条")
+    return dropped
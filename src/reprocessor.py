@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+离线重算模块
+从各汇总表的 rawjson 流式读取原始数据，多进程重新解析后批量写回，不访问佳明接口
+
+说明: garmin_activity.rawjson 只保存了活动列表项，详情/轨迹接口数据未落库，
+因此活动数据无法离线重算，这里只覆盖按日采集的健康数据类型
+"""
+
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from database import GarminDatabase
+from garmin_data_collector import GarminDataCollector
+from data_types import DATA_TYPES
+
+logger = logging.getLogger(__name__)
+
+# 数据类型 -> (汇总表, 日期列, 解析函数)
+REPROCESS_TYPES = {
+    dt.dtype: (dt.table, dt.datecol, getattr(GarminDataCollector, dt.parser)) for dt in DATA_TYPES
+}
+
+# 数据类型 -> 明细行构造(hrv 无明细)
+DETAIL_BUILDERS = {
+    "heartrate": lambda d, data: GarminDatabase._heartrate_detail_values(d, data.get("heartRateValues")),
+    "sleep": lambda d, data: GarminDatabase._sleep_detail_values(d, data.get("sleepLevels")),
+    "stress": lambda d, data: GarminDatabase._stress_detail_values(d, data.get("stressValuesArray")),
+    "spo2": lambda d, data: GarminDatabase._spo2_detail_values(d, data),
+    "respiration": lambda d, data: GarminDatabase._respiration_detail_values(d, data.get("respirationValuesArray")),
+}
+
+
+def _reprocess_chunk(dtype, rows, with_details):
+    """子进程执行: 解析一批 (日期, rawjson文本)，返回 (汇总行, 明细行)"""
+    _, _, parse = REPROCESS_TYPES[dtype]
+    builder = DETAIL_BUILDERS.get(dtype) if with_details else None
+    summaries = []
+    details = []
+    for target_date, raw in rows:
+        try:
+            data = json.loads(raw)
+        except (TypeError, ValueError):
+            continue
+        parsed = parse(target_date, data)
+        if not parsed:
+            continue
+        # rawjson 原样保留，不回写
+        parsed.pop("rawjson", None)
+        summaries.append(parsed)
+        if builder:
+            details.extend(builder(target_date, data))
+    return summaries, details
+
+
+class RawJsonReprocessor:
+    """基于 rawjson 的离线重算器"""
+
+    def __init__(self, workers=None, chunk_size=200, with_details=True):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.with_details = with_details
+        self.db = GarminDatabase()
+
+    def _iter_chunks(self, dtype, start=None, end=None):
+        table, datecol, _ = REPROCESS_TYPES[dtype]
+        sql = f"""
+            SELECT {datecol}::text, rawjson::text FROM {table}
+            WHERE rawjson IS NOT NULL
+              AND (%(start)s::date IS NULL OR {datecol} >= %(start)s::date)
+              AND (%(end)s::date IS NULL OR {datecol} <= %(end)s::date)
+            ORDER BY {datecol}
+        """
+        chunk = []
+        rows = self.db.stream_rows(sql, {"start": start, "end": end},
+                                   itersize=self.chunk_size * 4, name=f"reprocess_{dtype}")
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _write(self, dtype, result):
+        table, datecol, _ = REPROCESS_TYPES[dtype]
+        summaries, details = result
+        with self.db.transaction():
+            self.db.bulk_upsert_summaries(table, datecol, summaries)
+            if details:
+                self.db.bulk_insert_details(dtype, details)
+            self.db.record_change(GarminDataCollector.name, dtype, dates=[row[datecol] for row in summaries])
+        self.db.touched_dates.update(str(row[datecol]) for row in summaries)
+        # 按解析出的条数统计(管道模式下事务内写入的影响行数在提交时才确认)
+        return len(summaries), len(details)
+
+    def reprocess_type(self, pool, dtype, start=None, end=None):
+        """重算单个数据类型，读取/解析/写入流水线并行，在途批次数受限"""
+        t0 = time.monotonic()
+        days = 0
+        points = 0
+        pending = set()
+        max_pending = self.workers * 2
+        for chunk in self._iter_chunks(dtype, start, end):
+            pending.add(pool.submit(_reprocess_chunk, dtype, chunk, self.with_details))
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    d, p = self._write(dtype, fut.result())
+                    days += d
+                    points += p
+        for fut in pending:
+            d, p = self._write(dtype, fut.result())
+            days += d
+            points += p
+        elapsed = time.monotonic() - t0
+        print(f"  📊 {dtype}: 重算 {days} 天, 明细 {points} 条, 耗时 {elapsed:.1f}s")
+        return days, points
+
+    def run(self, types=None, start=None, end=None):
+        types = types or list(REPROCESS_TYPES)
+        unknown = [t for t in types if t not in REPROCESS_TYPES]
+        if unknown:
+            raise ValueError(f"不支持重算的数据类型: {', '.join(unknown)}")
+
+        print(f"\n♻️ 离线重算开始 (类型: {', '.join(types)}, 进程数: {self.workers})")
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                for dtype in types:
+                    self.reprocess_type(pool, dtype, start, end)
+            days = self.db.refresh_rollups()
+            print(f"  📅 每日汇总已刷新 {days} 天")
+        finally:
+            self.db.close()
+        print("✅ 离线重算完成")
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+明细表数据保留与冷归档模块
+超过保留期的明细按月归档为本地 gzip 压缩 CSV(可按需恢复)，
+心率/压力/呼吸/血氧同时保留小时级汇总，然后从在线表中删除
+"""
+
+import gzip
+import logging
+import os
+import time
+from datetime import date, timedelta
+from database import GarminDatabase
+from config import get_retention_config
+
+logger = logging.getLogger(__name__)
+
+# 类型 -> (明细表, 分区日期列, 汇总取值列(无则不生成小时汇总), 归档列)
+RETENTION_TABLES = {
+    "heartrate": ("garmin_heartrate_detail", "hrdate", "heartrate",
+                  ["hrdate", "pointtime", "heartrate"]),
+    "stress": ("garmin_stress_detail", "stressdate", "stresslevel",
+               ["stressdate", "pointtime", "stresslevel"]),
+    "respiration": ("garmin_respiration_detail", "respdate", "respvalue",
+                    ["respdate", "pointtime", "respvalue"]),
+    "spo2": ("garmin_spo2_detail", "spo2date", "spo2value",
+             ["spo2date", "pointtime", "spo2value", "readingsource"]),
+    "sleep": ("garmin_sleep_detail", "sleepdate", None,
+              ["sleepdate", "starttime", "endtime", "activitylevel"]),
+    "activity": ("garmin_activity_detail", "pointtime", None,
+                 ["activityid", "pointtime", "latitude", "longitude", "elevation",
+                  "heartrate", "speed", "cadence", "power", "temperature", "distance"]),
+}
+
+# 归档状态
+ARCHIVED = 1
+RESTORED = 2
+
+
+def _month_start(d):
+    return d.replace(day=1)
+
+
+def _next_month(d):
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _add_months(d, months):
+    y, m = divmod(d.year * 12 + d.month - 1 + months, 12)
+    return date(y, m + 1, 1)
+
+
+class _LineCounter:
+    """包装二进制文件对象，统计 COPY 输出行数"""
+
+    def __init__(self, f):
+        self._f = f
+        self.lines = 0
+
+    def write(self, data):
+        self.lines += data.count(b"\n")
+        return self._f.write(data)
+
+
+class RetentionManager:
+    """明细表保留策略执行器"""
+
+    def __init__(self, archive_path=None):
+        cfg = get_retention_config()
+        self.archive_path = archive_path or cfg.get("archive_path", "./archive")
+        self.default_mode = cfg.get("mode", "file")
+        self.policies = self._load_policies(cfg.get("policies") or {})
+        self.db = GarminDatabase()
+
+    def _load_policies(self, raw):
+        """policies 支持 `heartrate: 24` 或 `heartrate: {months: 24, mode: summary}`"""
+        policies = {}
+        for dtype, policy in raw.items():
+            if dtype not in RETENTION_TABLES:
+                logger.warning(f"未知的保留策略类型: {dtype}")
+                continue
+            if isinstance(policy, dict):
+                months = policy.get("months")
+                mode = policy.get("mode", self.default_mode)
+            else:
+                months, mode = policy, self.default_mode
+            if not months:
+                continue
+            if mode not in ("file", "summary"):
+                raise ValueError(f"{dtype} 保留模式无效: {mode} (file/summary)")
+            if mode == "summary" and RETENTION_TABLES[dtype][2] is None:
+                raise ValueError(f"{dtype} 不支持 summary 模式，只能归档为文件")
+            policies[dtype] = (int(months), mode)
+        return policies
+
+    def _archive_file(self, dtype, month):
+        return os.path.join(self.archive_path, RETENTION_TABLES[dtype][0], f"{month:%Y-%m}.csv.gz")
+
+    # ==================== 归档 ====================
+
+    def _months_to_archive(self, dtype, cutoff, include_restored):
+        table, datecol, _, _ = RETENTION_TABLES[dtype]
+        conn = self.db._get_conn()
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT min({datecol})::date FROM {table} WHERE {datecol} < %s", (cutoff,))
+            first = cur.fetchone()[0]
+            cur.execute(
+                "SELECT archivemonth FROM garmin_archive WHERE tablename = %s AND status = %s",
+                (table, RESTORED),
+            )
+            restored = {r[0] for r in cur.fetchall()}
+        conn.commit()
+        if first is None:
+            return []
+        months = []
+        month = _month_start(first)
+        while month < cutoff:
+            if include_restored or month not in restored:
+                months.append(month)
+            month = _next_month(month)
+        return months
+
+    def archive_month(self, dtype, month, mode):
+        """归档单月: 导出文件 -> 小时汇总 -> 删除在线数据 -> 记录归档清单，返回行数"""
+        table, datecol, valuecol, columns = RETENTION_TABLES[dtype]
+        params = {"start": month, "end": _next_month(month)}
+        where = f"{datecol} >= %(start)s AND {datecol} < %(end)s"
+        conn = self.db._get_conn()
+        path = None
+        rows = 0
+        try:
+            with conn.cursor() as cur:
+                if mode == "file":
+                    path = self._archive_file(dtype, month)
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    tmp = path + ".tmp"
+                    copy_sql = cur.mogrify(
+                        f"COPY (SELECT {', '.join(columns)} FROM {table} WHERE {where} "
+                        f"ORDER BY {datecol}) TO STDOUT WITH CSV HEADER", params
+                    ).decode()
+                    with gzip.open(tmp, "wb") as f:
+                        counter = _LineCounter(f)
+                        cur.copy_expert(copy_sql, counter)
+                    # 去掉表头行
+                    rows = max(counter.lines - 1, 0)
+                    if rows == 0:
+                        os.remove(tmp)
+                        conn.rollback()
+                        return 0
+
+                if valuecol:
+                    cur.execute(f"""
+                        INSERT INTO garmin_detail_hourly
+                            (datatype, pointhour, samples, minvalue, avgvalue, maxvalue)
+                        SELECT %(dtype)s, date_trunc('hour', pointtime), count(*),
+                               min({valuecol}), avg({valuecol}), max({valuecol})
+                        FROM {table} WHERE {where}
+                        GROUP BY 2
+                        ON CONFLICT (datatype, pointhour) DO UPDATE SET
+                            samples = EXCLUDED.samples,
+                            minvalue = EXCLUDED.minvalue,
+                            avgvalue = EXCLUDED.avgvalue,
+                            maxvalue = EXCLUDED.maxvalue
+                    """, {**params, "dtype": dtype})
+
+                cur.execute(f"DELETE FROM {table} WHERE {where}", params)
+                deleted = cur.rowcount
+                if deleted == 0:
+                    conn.rollback()
+                    return 0
+                if mode == "file" and deleted != rows:
+                    # 导出与删除之间有新写入，放弃本月，下次重试
+                    raise RuntimeError(f"{table} {month:%Y-%m} 导出 {rows} 行但删除 {deleted} 行")
+                rows = deleted
+
+                cur.execute("""
+                    INSERT INTO garmin_archive (tablename, archivemonth, archivemode, filepath, rowcount, status)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (tablename, archivemonth) DO UPDATE SET
+                        archivemode = EXCLUDED.archivemode,
+                        filepath = EXCLUDED.filepath,
+                        rowcount = EXCLUDED.rowcount,
+                        status = EXCLUDED.status
+                """, (table, month, mode, path, rows, ARCHIVED))
+            if path:
+                os.replace(path + ".tmp", path)
+            conn.commit()
+            return rows
+        except Exception as e:
+            conn.rollback()
+            if path and os.path.exists(path + ".tmp"):
+                os.remove(path + ".tmp")
+            logger.error(f"{table} {month:%Y-%m} 归档失败: {e}")
+            raise
+
+    def archive(self, types=None, include_restored=False):
+        types = types or list(self.policies)
+        today = date.today()
+        print(f"\n🧊 明细数据归档开始 -> {self.archive_path}")
+        try:
+            for dtype in types:
+                if dtype not in self.policies:
+                    print(f"  ⏭️ {dtype}: 未配置保留策略")
+                    continue
+                months, mode = self.policies[dtype]
+                cutoff = _add_months(_month_start(today), -months)
+                total = 0
+                for month in self._months_to_archive(dtype, cutoff, include_restored):
+                    t0 = time.monotonic()
+                    n = self.archive_month(dtype, month, mode)
+                    if n:
+                        total += n
+                        print(f"  ✅ {dtype} {month:%Y-%m}: 归档 {n} 行 ({mode}, {time.monotonic() - t0:.1f}s)")
+                print(f"  📊 {dtype}: 保留 {months} 个月, 本次归档 {total} 行")
+        finally:
+            self.db.close()
+        print("✅ 明细数据归档完成")
+
+    # ==================== 恢复 ====================
+
+    def restore_month(self, dtype, month):
+        """从归档文件恢复单月明细到在线表，返回恢复行数，无归档记录返回 None"""
+        table, _, _, columns = RETENTION_TABLES[dtype]
+        conn = self.db._get_conn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT filepath, archivemode FROM garmin_archive WHERE tablename = %s AND archivemonth = %s",
+                    (table, month),
+                )
+                row = cur.fetchone()
+                if row is None:
+                    conn.rollback()
+                    return None
+                path, mode = row
+                if mode != "file" or not path:
+                    raise ValueError(f"{table} {month:%Y-%m} 仅保留了小时汇总，无法恢复明细")
+
+                cur.execute(f"CREATE TEMP TABLE _restore (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+                with gzip.open(path, "rb") as f:
+                    cur.copy_expert(f"COPY _restore ({', '.join(columns)}) FROM STDIN WITH CSV HEADER", f)
+                cols = ", ".join(columns)
+                cur.execute(f"INSERT INTO {table} ({cols}) SELECT {cols} FROM _restore ON CONFLICT DO NOTHING")
+                restored = cur.rowcount
+                cur.execute(
+                    "UPDATE garmin_archive SET status = %s WHERE tablename = %s AND archivemonth = %s",
+                    (RESTORED, table, month),
+                )
+            conn.commit()
+            return restored
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"{table} {month:%Y-%m} 恢复失败: {e}")
+            raise
+
+    def restore(self, dtype, start, end=None):
+        if dtype not in RETENTION_TABLES:
+            raise ValueError(f"不支持的数据类型: {dtype}")
+        month = _month_start(date.fromisoformat(start + "-01"))
+        last = _month_start(date.fromisoformat((end or start) + "-01"))
+        print(f"\n♨️ 恢复归档明细 {dtype} {month:%Y-%m} ~ {last:%Y-%m}")
+        try:
+            while month <= last:
+                n = self.restore_month(dtype, month)
+                if n is None:
+                    print(f"  ⏭️ {dtype} {month:%Y-%m}: 无归档记录")
+                else:
+                    print(f"  ✅ {dtype} {month:%Y-%m}: 恢复 {n} 行")
+                month = _next_month(month)
+        finally:
+            self.db.close()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+运行日志模块
+记录每次采集运行的分阶段耗时、请求数、写入行数、下载字节数并落库，
+报告命令将最近运行与滚动基线对比，标记变慢的阶段
+"""
+
+import json
+import logging
+import statistics
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class RunJournal:
+    """单次运行记录"""
+
+    def __init__(self, datasource="garmin"):
+        self.datasource = datasource
+        self.days_back = None
+        self.stages = {}
+        self.started_at = datetime.now().astimezone()
+        self._t0 = time.monotonic()
+        # 本线程(及其采集线程池)的请求与写入计入该数据源，并发的其他数据源不混入增量
+        metrics.set_source(datasource)
+        self._base = metrics.snapshot(datasource)
+        self._record = None
+        # 剖析模式下由 main 注入 profiling.StageProfiler，阶段划分与日志一致
+        self.profiler = None
+
+    @contextmanager
+    def stage(self, name):
+        """累计记录某阶段耗时(秒)"""
+        t0 = time.monotonic()
+        try:
+            with self.profiler.stage(name) if self.profiler else nullcontext():
+                yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.monotonic() - t0
+
+    def finish(self, success, errmsg=None):
+        """结束运行，计算本次运行的指标增量"""
+        now = metrics.snapshot(self.datasource)
+        record = {k: now[k] - self._base[k] for k in now}
+        record["stages"] = {k: round(v, 3) for k, v in self.stages.items()}
+        # 数据库写入耗时单列为 db_write 阶段
+        record["stages"]["db_write"] = round(record["dbseconds"], 3)
+        record.update({
+            "datasource": self.datasource,
+            "startedat": self.started_at,
+            "finishedat": datetime.now().astimezone(),
+            "daysback": self.days_back,
+            "status": 1 if success else 0,
+            "duration": round(time.monotonic() - self._t0, 3),
+            "errmessage": errmsg,
+        })
+        self._record = record
+        return record
+
+    def save(self, db):
+        if self._record is None:
+            return
+        data = dict(self._record)
+        data["stages"] = json.dumps(data["stages"], ensure_ascii=False)
+        try:
+            db.insert_run_journal(data)
+        except Exception as e:
+            logger.warning(f"运行日志写入失败: {e}")
+
+
+# ==================== 回归报告 ====================
+
+def _run_metrics(run):
+    """单次运行的对比指标: 总耗时、各阶段耗时、平均请求耗时、每千行写入耗时"""
+    values = {"total": float(run["duration"])}
+    for name, sec in (run["stages"] or {}).items():
+        values[f"stage:{name}"] = float(sec)
+    if run["requests"]:
+        values["api_avg"] = float(run["apiseconds"]) / run["requests"]
+    if run["rowswritten"]:
+        values["db_per_1k_rows"] = float(run["dbseconds"]) * 1000 / run["rowswritten"]
+    return values
+
+
+def build_report(runs, recent=5, baseline=20, threshold=1.5, min_seconds=0.5):
+    """runs 按时间倒序；每个最近运行与其之前同回溯天数的 baseline 次运行中位数对比
+
+    返回 [(run, [(指标, 当前值, 基线中位数, 倍数), ...]), ...]
+    """
+    report = []
+    for i, run in enumerate(runs[:recent]):
+        history = [r for r in runs[i + 1:] if r["daysback"] == run["daysback"] and r["status"] == 1]
+        history = history[:baseline]
+        current = _run_metrics(run)
+        flags = []
+        if len(history) >= 3:
+            past = [_run_metrics(r) for r in history]
+            for key, value in current.items():
+                samples = [p[key] for p in past if key in p]
+                if len(samples) < 3:
+                    continue
+                median = statistics.median(samples)
+                # 忽略绝对耗时过小的阶段，避免噪声
+                if not key.endswith(("api_avg", "db_per_1k_rows")) and value < min_seconds:
+                    continue
+                if median > 0 and value / median >= threshold:
+                    flags.append((key, value, median, value / median))
+        report.append((run, flags))
+    return report
+
+
+def print_report(db, datasource="garmin", recent=5, baseline=20, threshold=1.5):
+    runs = db.recent_run_journals(datasource, limit=recent + baseline * 3)
+    if not runs:
+        print("📭 暂无运行记录")
+        return 0
+    print(f"\n📒 最近 {min(recent, len(runs))} 次运行 (基线: 之前同回溯天数的 {baseline} 次成功运行中位数, 阈值 x{threshold})")
+    print("=" * 60)
+    regressions = 0
+    for run, flags in build_report(runs, recent, baseline, threshold):
+        status = "✅" if run["status"] == 1 else "❌"
+        api_avg = float(run["apiseconds"]) / run["requests"] if run["requests"] else 0
+        print(f"{status} {run['startedat']:%Y-%m-%d %H:%M} 回溯{run['daysback']}天 "
+              f"耗时 {float(run['duration']):.1f}s, 请求 {run['requests']} 次(均 {api_avg * 1000:.0f}ms), "
+              f"写入 {run['rowswritten']} 行, 下载 {run['bytesdownloaded'] / 1024 / 1024:.1f}MB")
+        for key, value, median, ratio in flags:
+            regressions += 1
+            print(f"   ⚠️ {key}: {value:.3f} vs 基线 {median:.3f} (x{ratio:.1f})")
+    print("=" * 60)
+    print(f"{'⚠️ 发现' if regressions else '✅ 未发现'}性能退化{f' {regressions} 项' if regressions else ''}")
+    return regressions
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+数据源插件模块
+每个平台实现 DataSource 接口(佳明为首个实现)，在同一进程内各自线程并发采集，
+各自限速与连接数，共享数据库写入与 garmin_sync 同步记录(按 datasource 区分)
+
+新增数据源: 实现 DataSource 子类，在 SOURCES 中登记 "名称": "模块:类"，
+并在 config.yml 中添加同名配置段(含 schedule / rate_limit / max_connections)。
+"""
+
+import contextlib
+import functools
+import importlib
+import logging
+import threading
+import time
+import metrics
+from datetime import datetime
+from config import get_config
+from run_journal import RunJournal
+
+logger = logging.getLogger(__name__)
+
+# 数据源名称 -> "模块:类"，按需导入
+SOURCES = {
+    "garmin": "garmin_data_collector:GarminDataCollector",
+}
+
+
+class RateLimiter:
+    """令牌桶限速，rate 为每秒请求数，burst 为允许的突发请求数；线程安全"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(rate, 1))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class SharedDatabase:
+    """多个数据源共享的数据库写入
+
+    包装一个 GarminDatabase，方法调用加锁串行执行(单连接上各数据源的事务不能交错)；
+    stream_rows 使用独立连接，不加锁。
+    """
+
+    UNLOCKED = {"stream_rows", "close"}
+
+    def __init__(self, db):
+        self._db = db
+        self._lock = threading.RLock()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        # 整个事务期间持锁，其他数据源的写入不会混入本事务
+        with self._lock, self._db.transaction():
+            yield
+
+    def __getattr__(self, name):
+        attr = getattr(self._db, name)
+        if not callable(attr) or name in self.UNLOCKED:
+            return attr
+
+        @functools.wraps(attr)
+        def locked(*args, **kwargs):
+            with self._lock:
+                return attr(*args, **kwargs)
+        return locked
+
+
+class DataSource:
+    """数据源插件接口
+
+    子类需设置 name / label，并实现 login / collect；db 为空时自建连接并在 cleanup 时关闭。
+    """
+
+    name = None
+    label = None
+
+    def __init__(self, db=None):
+        from database import create_database
+        self.cfg = get_config().get(self.name, {}) or {}
+        self._owns_db = db is None
+        self.db = db if db is not None else create_database()
+        self.journal = RunJournal(self.name)
+        rate = self.cfg.get("rate_limit")
+        self.limiter = RateLimiter(rate, self.cfg.get("burst")) if rate else None
+
+    def throttle(self):
+        """每次调用平台接口前调用，按 rate_limit 限速"""
+        if self.limiter:
+            self.limiter.acquire()
+
+    def login(self):
+        raise NotImplementedError
+
+    def collect(self, days_back):
+        raise NotImplementedError
+
+    def cleanup(self):
+        if self._owns_db:
+            self.db.close()
+
+
+def load_source(name):
+    """按名称导入数据源类"""
+    if name not in SOURCES:
+        raise ValueError(f"未知数据源: {name}，可选 {', '.join(SOURCES)}")
+    module, cls = SOURCES[name].split(":")
+    return getattr(importlib.import_module(module), cls)
+
+
+def enabled_sources(config=None):
+    """config.yml 中配置了同名配置段的数据源"""
+    config = config if config is not None else get_config()
+    return [name for name in SOURCES if config.get(name)]
+
+
+# 进程内每个数据源同一时刻只运行一次(咨询锁按会话可重入，共享连接时挡不住同进程重复触发)
+_running = {}
+
+
+def run_source(name, days_back=1, db=None, profiler=None):
+    """执行单个数据源采集，返回 True(成功) / False(失败) / None(已有采集在运行，跳过)"""
+    source_cls = load_source(name)
+    tag = name.upper()
+    print(f"\n📡 [{tag}] {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} 数据收集开始 (回溯{days_back}天)...")
+    running = _running.setdefault(name, threading.Lock())
+    if not running.acquire(blocking=False):
+        print(f"⏭️ [{tag}] 本进程上一次采集尚未结束，本次跳过")
+        return None
+    source = None
+    skipped = False
+    locked = False
+    success = False
+    errmsg = None
+    t0 = time.monotonic()
+    try:
+        source = source_cls(db=db)
+        source.journal.profiler = profiler
+        source.journal.days_back = days_back
+        # 多副本部署时同一时刻只允许一个进程执行采集
+        if not source.db.try_advisory_lock(f"{name}:collect"):
+            skipped = True
+            print(f"⏭️ [{tag}] 其他进程正在采集，本次跳过")
+            return None
+        locked = True
+        with source.journal.stage("login"):
+            source.login()
+        source.collect(days_back)
+        success = True
+        print(f"✅ [{tag}] 数据收集完成")
+    except Exception as e:
+        errmsg = str(e)
+        print(f"❌ [{tag}] 数据收集失败: {e}")
+        logger.error(f"[{tag}] {e}", exc_info=True)
+    finally:
+        if not skipped:
+            metrics.record_run(success, time.monotonic() - t0)
+        if source:
+            if not skipped:
+                source.journal.finish(success, errmsg)
+                source.journal.save(source.db)
+            if locked and not source._owns_db:
+                # 共享连接不随采集结束断开，需显式释放
+                source.db.advisory_unlock(f"{name}:collect")
+            source.cleanup()
+        running.release()
+    return success
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared_database():
+    """进程内共享的数据库写入(懒创建)"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            from database import create_database
+            _shared = SharedDatabase(create_database())
+        return _shared
+
+
+def run_sources(days_by_source):
+    """多个数据源各自线程并发采集，共享数据库写入；days_by_source 为 {数据源: 回溯天数}，返回成功的数据源列表"""
+    db = shared_database()
+    names = list(days_by_source)
+    results = {}
+
+    def _run(name):
+        results[name] = run_source(name, days_by_source[name], db=db)
+
+    threads = [threading.Thread(target=_run, args=(name,), name=f"source-{name}") for name in names]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return [name for name in names if results.get(name)]
+
+
+def spawn_source(name, days_back):
+    """后台线程启动一次采集(定时任务用)，慢数据源不阻塞其他数据源的定时任务"""
+    t = threading.Thread(target=run_source, args=(name, days_back),
+                         kwargs={"db": shared_database()}, name=f"source-{name}", daemon=True)
+    t.start()
+    return t
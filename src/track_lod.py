@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+轨迹多分辨率(LOD)模块
+对活动 GPS 轨迹做 Douglas-Peucker 抽稀，按地图缩放级别生成 Google 编码折线，
+存入 garmin_activity_track_lod，地图按级别读取几百个点即可
+
+一次 Douglas-Peucker 遍历给每个点计算"显著度"(被选中时的偏离距离，且不超过父分割点)，
+某容差下的抽稀结果即显著度大于容差的点，所有级别共用一次计算。
+"""
+
+import logging
+import math
+from array import array
+
+logger = logging.getLogger(__name__)
+
+# (地图缩放级别, 容差米)
+LOD_LEVELS = [
+    (10, 120.0),
+    (12, 30.0),
+    (14, 8.0),
+    (16, 2.0),
+]
+
+EARTH_RADIUS = 6371008.8
+
+
+def _project(lats, lngs):
+    """经纬度按轨迹平均纬度做等距投影，返回米坐标 (xs, ys)"""
+    lat0 = math.radians(sum(lats) / len(lats))
+    kx = math.cos(lat0) * math.pi / 180 * EARTH_RADIUS
+    ky = math.pi / 180 * EARTH_RADIUS
+    return [lng * kx for lng in lngs], [lat * ky for lat in lats]
+
+
+def significance(xs, ys):
+    """Douglas-Peucker 显著度(米)，首尾点为 inf"""
+    n = len(xs)
+    sig = [0.0] * n
+    if n == 0:
+        return sig
+    sig[0] = sig[-1] = math.inf
+    stack = [(0, n - 1, math.inf)]
+    while stack:
+        i, j, cap = stack.pop()
+        if j <= i + 1:
+            continue
+        ax, ay = xs[i], ys[i]
+        dx, dy = xs[j] - ax, ys[j] - ay
+        seg2 = dx * dx + dy * dy
+        best_k, best_d2 = i + 1, -1.0
+        for k in range(i + 1, j):
+            px, py = xs[k] - ax, ys[k] - ay
+            # 点到线段距离(首尾重合的环形轨迹退化为点距)
+            t = (px * dx + py * dy) / seg2 if seg2 else 0.0
+            if t < 0.0:
+                t = 0.0
+            elif t > 1.0:
+                t = 1.0
+            ex, ey = px - t * dx, py - t * dy
+            d2 = ex * ex + ey * ey
+            if d2 > best_d2:
+                best_k, best_d2 = k, d2
+        d = min(math.sqrt(best_d2), cap)
+        sig[best_k] = d
+        stack.append((i, best_k, d))
+        stack.append((best_k, j, d))
+    return sig
+
+
+def encode_polyline(points, precision=5):
+    """Google 编码折线 [(lat, lng), ...] -> str"""
+    factor = 10 ** precision
+    out = []
+    prev_lat = prev_lng = 0
+    for lat, lng in points:
+        ilat, ilng = int(round(lat * factor)), int(round(lng * factor))
+        for delta in (ilat - prev_lat, ilng - prev_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                out.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            out.append(chr(value + 63))
+        prev_lat, prev_lng = ilat, ilng
+    return "".join(out)
+
+
+def decode_polyline(encoded, precision=5):
+    """Google 编码折线 -> [(lat, lng), ...]"""
+    factor = 10 ** precision
+    points = []
+    index = lat = lng = 0
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                b = ord(encoded[index]) - 63
+                index += 1
+                result |= (b & 0x1f) << shift
+                shift += 5
+                if b < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        points.append((lat / factor, lng / factor))
+    return points
+
+
+def build_lods(lats, lngs, levels=LOD_LEVELS):
+    """生成各级别抽稀轨迹 [(缩放级别, 容差, 点数, 编码折线), ...]"""
+    if len(lats) < 2:
+        return []
+    xs, ys = _project(lats, lngs)
+    sig = significance(xs, ys)
+    lods = []
+    for zoom, tolerance in levels:
+        kept = [(lats[i], lngs[i]) for i in range(len(sig)) if sig[i] > tolerance]
+        lods.append((zoom, tolerance, len(kept), encode_polyline(kept)))
+    return lods
+
+
+class TrackCollector:
+    """写入轨迹时顺带收集经纬度(紧凑数组)，写完后生成 LOD"""
+
+    def __init__(self):
+        self.lats = array("d")
+        self.lngs = array("d")
+
+    def add(self, points):
+        for p in points:
+            lat, lng = p.get("latitude"), p.get("longitude")
+            if lat is None or lng is None:
+                continue
+            self.lats.append(float(lat))
+            self.lngs.append(float(lng))
+
+    def save(self, db, activity_id):
+        lods = build_lods(self.lats, self.lngs)
+        if lods:
+            db.upsert_track_lods(activity_id, lods)
+        return lods
+
+
+def rebuild(db, activity_ids=None):
+    """从 garmin_activity_detail 为已有活动(默认缺少 LOD 的活动)重新生成轨迹 LOD"""
+    ids = activity_ids or db.activities_without_lod()
+    print(f"🗺️ 生成轨迹 LOD: {len(ids)} 个活动")
+    done = 0
+    for aid in ids:
+        collector = TrackCollector()
+        for lat, lng in db.stream_rows("""
+            SELECT latitude, longitude FROM garmin_activity_detail
+            WHERE activityid = %s AND latitude IS NOT NULL AND longitude IS NOT NULL
+            ORDER BY pointtime
+        """, (aid,)):
+            collector.lats.append(float(lat))
+            collector.lngs.append(float(lng))
+        lods = collector.save(db, aid)
+        if lods:
+            done += 1
+            print(f"  ✅ {aid}: {len(collector.lats)} 点 -> " + ", ".join(f"z{z}:{n}" for z, _, n, _ in lods))
+    print(f"📊 完成 {done}/{len(ids)}")
+    return done
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+训练负荷模块
+入库时由轨迹心率序列计算单次活动 TRIMP(Banister)，无心率序列时按平均心率估算；
+ATL(7天)/CTL(42天) 指数加权平均按日维护，只从最早变动日期向后递推，无需重扫全部历史
+
+TSB 为前一日 CTL - ATL(当日训练前的状态)。
+"""
+
+import logging
+import math
+from datetime import date, timedelta
+from config import get_training_load_config
+
+logger = logging.getLogger(__name__)
+
+ATL_DAYS = 7
+CTL_DAYS = 42
+# 相邻心率点间隔超过该秒数视为暂停，不计负荷
+MAX_GAP_SECONDS = 30
+
+
+def _hr_weight(hr, rest_hr, max_hr, k):
+    """Banister 每分钟权重 HRr * 0.64 * e^(k * HRr)"""
+    hrr = (hr - rest_hr) / (max_hr - rest_hr)
+    hrr = min(max(hrr, 0.0), 1.0)
+    return hrr * 0.64 * math.exp(k * hrr)
+
+
+class TrimpAccumulator:
+    """按轨迹点分批累计 TRIMP，可随流式写入的每批轨迹调用"""
+
+    def __init__(self, rest_hr, max_hr, k=1.92):
+        self.rest_hr = float(rest_hr)
+        self.max_hr = float(max_hr)
+        self.k = k
+        self.trimp = 0.0
+        self.seconds = 0.0
+        self._last_time = None
+        self._last_hr = None
+
+    def add(self, points):
+        for p in points:
+            hr, pt = p.get("heartrate"), p.get("pointtime")
+            if hr is None or pt is None:
+                continue
+            if self._last_time is not None:
+                dt = (pt - self._last_time).total_seconds()
+                if 0 < dt <= MAX_GAP_SECONDS:
+                    self.trimp += dt / 60 * _hr_weight(self._last_hr, self.rest_hr, self.max_hr, self.k)
+                    self.seconds += dt
+            self._last_time, self._last_hr = pt, float(hr)
+
+
+def _settings(db, day):
+    """(静息心率, 最大心率, 系数)，静息心率取当日或之前最近一次记录"""
+    cfg = get_training_load_config()
+    rest_hr = db.latest_resting_hr(day) or cfg.get("rest_hr", 60)
+    max_hr = cfg.get("max_hr", 190)
+    k = 1.67 if cfg.get("gender") == "female" else 1.92
+    return rest_hr, max_hr, k
+
+
+def new_accumulator(db, day):
+    rest_hr, max_hr, k = _settings(db, day)
+    return TrimpAccumulator(rest_hr, max_hr, k)
+
+
+def activity_load(db, summary, acc=None):
+    """单次活动负荷: 心率序列覆盖足够时用序列 TRIMP，否则按时长 x 平均心率估算"""
+    day = str(summary.get("starttime") or "")[:10]
+    if not day:
+        return None
+    duration = float(summary.get("duration") or 0)
+    if acc is not None and acc.seconds >= max(duration * 0.5, 60):
+        trimp, method = acc.trimp, "hr_series"
+    elif summary.get("avghr") and duration:
+        rest_hr, max_hr, k = _settings(db, day)
+        trimp, method = duration / 60 * _hr_weight(float(summary["avghr"]), rest_hr, max_hr, k), "avg_hr"
+    else:
+        return None
+    return {
+        "activityid": summary["activityid"],
+        "activitydate": day,
+        "trimp": round(trimp, 2),
+        "method": method,
+        "hrseconds": int(acc.seconds) if acc else 0,
+    }
+
+
+def update_daily(db, from_date, to_date=None):
+    """从 from_date 起向后递推 ATL/CTL/TSB，起点状态取之前最近一条记录
+
+    最近记录早于 from_date 前一天时(中间为休息日)，从该记录次日起递推，空缺的日期按无负荷衰减并补齐
+    """
+    if isinstance(from_date, str):
+        from_date = date.fromisoformat(from_date[:10])
+    to_date = to_date or date.today()
+    if from_date > to_date:
+        return 0
+    atl = ctl = 0.0
+    last = db.training_load_before(from_date)
+    if last:
+        last_date, atl, ctl = last
+        from_date = last_date + timedelta(days=1)
+    loads = db.daily_activity_loads(from_date, to_date)
+    ka = 1 - math.exp(-1 / ATL_DAYS)
+    kc = 1 - math.exp(-1 / CTL_DAYS)
+    rows = []
+    day = from_date
+    while day <= to_date:
+        load = float(loads.get(day, 0.0))
+        tsb = ctl - atl
+        atl += (load - atl) * ka
+        ctl += (load - ctl) * kc
+        rows.append((day, round(load, 2), round(atl, 2), round(ctl, 2), round(tsb, 2)))
+        day += timedelta(days=1)
+    with db.transaction():
+        db.upsert_training_load(rows)
+        db.record_change("garmin", "training_load", dates=[r[0] for r in rows])
+    return len(rows)
+
+
+def rebuild(db, start=None):
+    """为缺少负荷记录的活动补算(读取已入库心率轨迹)，并从最早变动日期递推"""
+    ids = db.activities_without_load()
+    print(f"🏋️ 补算活动负荷: {len(ids)} 个活动")
+    earliest = None
+    for summary in ids:
+        acc = new_accumulator(db, str(summary["starttime"])[:10])
+        chunk = []
+        for pt, hr in db.stream_rows("""
+            SELECT pointtime, heartrate FROM garmin_activity_detail
+            WHERE activityid = %s AND heartrate IS NOT NULL
+            ORDER BY pointtime
+        """, (summary["activityid"],)):
+            chunk.append({"pointtime": pt, "heartrate": hr})
+            if len(chunk) >= 2000:
+                acc.add(chunk)
+                chunk = []
+        acc.add(chunk)
+        load = activity_load(db, summary, acc)
+        if load:
+            db.upsert_activity_load(load)
+            earliest = min(earliest or load["activitydate"], load["activitydate"])
+    if start:
+        earliest = min(earliest or start, start)
+    if earliest:
+        days = update_daily(db, earliest)
+        print(f"📈 ATL/CTL/TSB 自 {earliest} 起递推 {days} 天")
+    return len(ids)
@@ -0,0 +1,17 @@
+"""单元测试公共配置: src/ 为扁平模块目录，加入导入路径；配置不读取 conf/config.yml"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+
+@pytest.fixture(autouse=True)
+def config(monkeypatch):
+    """每个测试使用空配置，测试内直接写入需要的配置段"""
+    import config as config_module
+    cfg = {}
+    monkeypatch.setattr(config_module, "_config", cfg)
+    return cfg
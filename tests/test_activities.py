@@ -0,0 +1,248 @@
+"""活动汇总入库: 只为新活动获取详情，汇总在详情与轨迹写入后整批写入"""
+
+import contextlib
+
+import pytest
+
+import garmin_data_collector
+from database import GarminDatabase
+from garmin_data_collector import GarminDataCollector
+from run_journal import RunJournal
+
+
+class FakeDB:
+    postgis = False
+
+    def __init__(self, existing=()):
+        self.existing = set(existing)
+        self.written = []
+        self.changes = []
+
+    def existing_activity_ids(self, ids):
+        return self.existing & set(ids)
+
+    tx_depth = 0
+    detail_tx = ()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        self.tx_depth += 1
+        try:
+            yield
+        finally:
+            self.tx_depth -= 1
+
+    def batch_upsert_activities(self, rows, update=False):
+        self.written.append((list(rows), update))
+        self.existing.update(r["activityid"] for r in rows)
+        return set()
+
+    def record_change(self, *args, **kwargs):
+        self.changes.append((args, kwargs))
+
+    def latest_resting_hr(self, day):
+        return 50
+
+    def batch_upsert_activity_details(self, aid, points):
+        self.details = getattr(self, "details", 0) + len(points)
+        self.detail_tx += (self.tx_depth,)
+        return len(points)
+
+    def upsert_track_lods(self, aid, lods):
+        pass
+
+
+LIST_ITEM = {
+    "activityId": 1,
+    "activityName": "晨跑",
+    "activityType": {"typeKey": "running"},
+    "startTimeLocal": "2025-03-01 07:00:00",
+    "endTimeGMT": "2025-02-28 23:40:00",
+    "duration": 2400.0,
+    "distance": 6000.0,
+    "hasPolyline": False,
+}
+
+DETAIL = {"summaryDTO": {
+    "elevationGain": 35.0, "elevationLoss": 33.0,
+    "startLatitude": 31.2, "startLongitude": 121.4, "endLatitude": 31.3, "endLongitude": 121.5,
+    "averageRunCadence": 172.0, "maxRunCadence": 190.0,
+}}
+
+
+def make_collector(db, detail=DETAIL, fail=()):
+    collector = GarminDataCollector.__new__(GarminDataCollector)
+    collector.db = db
+    collector.journal = RunJournal("garmin")
+    collector._load_from = None
+    calls = []
+
+    def get_activity_detail(aid):
+        calls.append(aid)
+        if aid in fail:
+            raise RuntimeError("详情接口失败")
+        return detail
+
+    collector.get_activity_detail = get_activity_detail
+    collector._save_activity_load = lambda parsed, trimp=None: None
+    return collector, calls
+
+
+def item(aid):
+    return dict(LIST_ITEM, activityId=aid)
+
+
+def test_update_covers_every_detail_field():
+    parsed = GarminDataCollector._parse_activity_summary(None, LIST_ITEM, DETAIL)
+    detail_fields = {k for k, v in parsed.items()
+                     if v != GarminDataCollector._parse_activity_summary(None, LIST_ITEM).get(k)}
+    assert detail_fields
+    assert detail_fields <= set(GarminDatabase.ACTIVITY_UPDATE_COLUMNS)
+    assert "activityid" not in GarminDatabase.ACTIVITY_UPDATE_COLUMNS
+
+
+def test_new_activities_written_once_with_detail_fields(capsys):
+    db = FakeDB(existing={"2"})
+    collector, calls = make_collector(db)
+    collector._save_activities([item(1), item(2), item(3)])
+
+    assert calls == ["1", "3"]
+    assert len(db.written) == 1
+    rows, update = db.written[0]
+    assert update is True
+    assert [r["activityid"] for r in rows] == ["1", "3"]
+    for row in rows:
+        assert row["elevationgain"] == 35.0
+        assert row["startlat"] == 31.2
+        assert row["avgcadence"] == 172.0
+    assert "新增2, 跳过1" in capsys.readouterr().out
+
+
+def test_failed_enrichment_is_not_registered():
+    db = FakeDB()
+    collector, _ = make_collector(db, fail={"2"})
+    collector._save_activities([item(1), item(2)])
+    assert [r["activityid"] for r in db.written[0][0]] == ["1"]
+
+    # 下次采集重新获取失败的活动
+    collector, calls = make_collector(db)
+    collector._save_activities([item(1), item(2)])
+    assert calls == ["2"]
+    assert [r["activityid"] for r in db.written[-1][0]] == ["2"]
+
+
+def test_duplicate_in_batch_processed_once():
+    db = FakeDB()
+    collector, calls = make_collector(db)
+    collector._save_activities([item(1), item(1)])
+    assert calls == ["1"]
+    assert len(db.written[0][0]) == 1
+
+
+@pytest.mark.parametrize("batch", [1, 2])
+def test_summary_written_per_batch(batch):
+    db = FakeDB()
+    collector, _ = make_collector(db)
+    collector.ACTIVITY_BATCH = batch
+    collector._save_activities([item(i) for i in range(1, 4)])
+    assert sum(len(rows) for rows, _ in db.written) == 3
+    assert len(db.written) == -(-3 // batch)
+
+
+POLYLINE = {"polyline": [[1740786000000 + i * 1000, 31.2 + i * 1e-5, 121.4] for i in range(600)]}
+TRACK = {
+    "metricDescriptors": [{"key": "directTimestamp", "metricsIndex": 0},
+                          {"key": "directHeartRate", "metricsIndex": 1}],
+    "activityDetailMetrics": [{"metrics": [1740786000000 + i * 1000, 150]} for i in range(600)],
+}
+
+
+def track_collector(monkeypatch, db, polyline=POLYLINE, track=TRACK):
+    """不装 ijson 的整包解析路径，polyline/details 为 Exception 时接口抛出"""
+    monkeypatch.setattr(garmin_data_collector, "ijson", None)
+    collector, _ = make_collector(db)
+    def respond(value):
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    collector.get_activity_polyline = lambda aid: respond(polyline)
+    collector.get_activity_track = lambda aid: respond(track)
+    loads = []
+    collector._save_activity_load = lambda parsed, trimp=None: loads.append(trimp)
+    return collector, loads
+
+
+def gps_item(aid, **extra):
+    return dict(LIST_ITEM, **{"activityId": aid, "hasPolyline": True, "averageHR": 150, **extra})
+
+
+def test_track_failure_is_not_registered(monkeypatch):
+    db = FakeDB()
+    collector, _ = track_collector(monkeypatch, db, polyline=RuntimeError("超时"), track=RuntimeError("超时"))
+    collector._save_activities([gps_item(1)])
+    assert db.written == []
+
+    # polyline 失败时回退 details 成功，正常入库
+    collector, _ = track_collector(monkeypatch, db, polyline=RuntimeError("超时"))
+    collector._save_activities([gps_item(1)])
+    assert [r["activityid"] for r in db.written[-1][0]] == ["1"]
+
+
+def test_polyline_empty_and_details_failure_is_not_registered(monkeypatch):
+    db = FakeDB()
+    collector, _ = track_collector(monkeypatch, db, polyline=None, track=RuntimeError("超时"))
+    collector._save_activities([gps_item(1)])
+    assert db.written == []
+
+
+def test_stream_failure_after_partial_track_is_not_registered(monkeypatch):
+    db = FakeDB()
+    collector, _ = make_collector(db)
+    monkeypatch.setattr(garmin_data_collector, "ijson", object())
+
+    def broken(*args):
+        yield [{"pointtime": i} for i in range(3)]
+        raise ConnectionError("连接中断")
+
+    def empty(*args):
+        return iter(())
+
+    collector.stream_activity_polyline = broken
+    collector.stream_activity_track = empty
+    collector._save_activities([gps_item(1)])
+    assert db.details == 3
+    assert db.written == []
+
+
+def test_track_written_outside_transaction(monkeypatch):
+    # 下载轨迹期间不持有事务，共享写入时其他数据源不被阻塞
+    db = FakeDB()
+    collector, _ = track_collector(monkeypatch, db)
+    collector._save_activities([gps_item(1)])
+    assert db.detail_tx == (0,)
+    assert db.changes[0][0][1] == "activity_detail"
+    assert db.changes[0][1]["rows"] == 600
+
+
+def test_trimp_uses_details_heart_rate_when_track_is_polyline(monkeypatch):
+    db = FakeDB()
+    collector, loads = track_collector(monkeypatch, db)
+    collector._save_activities([gps_item(1)])
+    assert db.details == 600
+    assert loads[0].seconds == 599
+    assert loads[0].trimp > 0
+
+
+def test_trimp_for_activity_without_gps(monkeypatch):
+    db = FakeDB()
+    collector, loads = track_collector(monkeypatch, db, polyline=RuntimeError("不应请求"))
+    collector._save_activities([gps_item(1, hasPolyline=False)])
+    assert loads[0].seconds == 599
+    assert not hasattr(db, "details")
+
+    # 心率序列获取失败时按平均心率估算，活动照常入库
+    collector, loads = track_collector(monkeypatch, db, track=RuntimeError("超时"))
+    collector._save_activities([gps_item(2, hasPolyline=False)])
+    assert loads == [None]
+    assert [r["activityid"] for r in db.written[-1][0]] == ["2"]
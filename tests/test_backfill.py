@@ -0,0 +1,44 @@
+"""回填任务切分"""
+from datetime import date, timedelta
+from backfill import split_range, plan_backfill
+
+
+def test_split_range_newest_first_and_contiguous():
+    start, end = date(2025, 1, 1), date(2025, 3, 1)
+    chunks = split_range(start, end, 30)
+    assert chunks[0] == (date(2025, 1, 31), end)
+    assert chunks[-1][0] == start
+    for (newer_start, _), (_, older_end) in zip(chunks, chunks[1:]):
+        assert older_end == newer_start - timedelta(days=1)
+    assert sum((b - a).days + 1 for a, b in chunks) == (end - start).days + 1
+    assert all((b - a).days + 1 <= 30 for a, b in chunks)
+
+
+def test_split_range_exact_multiple_and_single_day():
+    assert split_range(date(2025, 1, 1), date(2025, 1, 20), 10) == [
+        (date(2025, 1, 11), date(2025, 1, 20)),
+        (date(2025, 1, 1), date(2025, 1, 10)),
+    ]
+    assert split_range(date(2025, 1, 1), date(2025, 1, 1), 30) == [(date(2025, 1, 1), date(2025, 1, 1))]
+    assert split_range(date(2025, 1, 1), date(2025, 1, 3), 1) == [
+        (date(2025, 1, 3), date(2025, 1, 3)),
+        (date(2025, 1, 2), date(2025, 1, 2)),
+        (date(2025, 1, 1), date(2025, 1, 1)),
+    ]
+
+
+def test_split_range_empty_when_start_after_end():
+    assert split_range(date(2025, 1, 2), date(2025, 1, 1), 30) == []
+
+
+def test_plan_backfill_registers_each_type_and_chunk():
+    class FakeDB:
+        def plan_sync_jobs(self, jobs):
+            self.jobs = jobs
+            return len(jobs)
+
+    db = FakeDB()
+    created = plan_backfill(db, date(2025, 1, 1), date(2025, 1, 20), types=["activity", "sleep"], chunk_days=10)
+    assert created == 4
+    assert db.jobs[0] == ("garmin", "activity", date(2025, 1, 11), date(2025, 1, 20))
+    assert {job[1] for job in db.jobs} == {"activity", "sleep"}
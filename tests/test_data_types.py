@@ -0,0 +1,62 @@
+"""按日数据类型调度: HRV 逐日获取并保存完整响应"""
+import contextlib
+import json
+from data_types import DailyTypeEngine, get_data_type
+from garmin_data_collector import GarminDataCollector
+
+HRV_DAY = {
+    "hrvSummary": {"calendarDate": "2025-01-02", "weeklyAvg": 48, "lastNightAvg": 52, "status": "BALANCED"},
+    "hrvReadings": [{"hrvValue": 50, "readingTimeGMT": "2025-01-01T23:05:00.0"}],
+}
+
+
+class FakeDB:
+    def __init__(self):
+        self.summaries = []
+
+    def sync_states(self, datasource, datatype, dates):
+        return {}
+
+    @contextlib.contextmanager
+    def transaction(self):
+        yield
+
+    def bulk_upsert_summaries(self, table, datecol, rows):
+        self.summaries.extend(rows)
+
+    def upsert_syncs(self, *args, **kwargs):
+        pass
+
+    def record_change(self, *args, **kwargs):
+        pass
+
+
+class FakeCollector:
+    _display_name = "u"
+    _parse_hrv = staticmethod(GarminDataCollector._parse_hrv)
+
+    def __init__(self, db):
+        self.db = db
+        self.paths = []
+
+    def _connectapi(self, endpoint, path, params=None):
+        self.paths.append(path)
+        return HRV_DAY
+
+
+def test_hrv_fetched_per_day_with_readings(capsys):
+    db = FakeDB()
+    collector = FakeCollector(db)
+    dt = get_data_type("hrv")
+    assert not dt.range_fetch
+    assert DailyTypeEngine(collector).run(dt, ["2025-01-02", "2025-01-01"]) == 2
+    assert sorted(collector.paths) == ["/hrv-service/hrv/2025-01-01", "/hrv-service/hrv/2025-01-02"]
+    assert json.loads(db.summaries[0]["rawjson"])["hrvReadings"] == HRV_DAY["hrvReadings"]
+    assert db.summaries[0]["lastnightavg"] == 52
+
+
+def test_hrv_range_fetch_can_be_enabled(config):
+    config["data_types"] = {"hrv": {"range_path": "/hrv-service/hrv/daily/{start}/{end}",
+                                    "range_key": "hrvSummaries", "batch_size": 28}}
+    dt = get_data_type("hrv")
+    assert dt.range_fetch and dt.batch_size == 28
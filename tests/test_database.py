@@ -0,0 +1,67 @@
+"""GarminDatabase._write 写入行数统计"""
+import database
+from database import GarminDatabase
+
+
+class FakeCursor:
+    def __init__(self, affected):
+        self.affected = affected
+        self.rowcount = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeConn:
+    def __init__(self, affected):
+        self.cur = FakeCursor(affected)
+        self.commits = 0
+
+    def cursor(self, **kwargs):
+        return self.cur
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+def make_db(monkeypatch, affected):
+    """affected(page) -> 该页实际影响行数，模拟 ON CONFLICT DO NOTHING 跳过已有行"""
+    db = GarminDatabase()
+    conn = FakeConn(affected)
+    monkeypatch.setattr(db, "_get_conn", lambda: conn)
+
+    def execute_values(cur, sql, page, template=None, page_size=100, fetch=False):
+        assert len(page) <= page_size
+        cur.rowcount = affected(page)
+        return [(v,) for v in page[:cur.rowcount]] if fetch else None
+
+    monkeypatch.setattr(database, "execute_values", execute_values)
+    return db, conn
+
+
+def test_write_sums_rowcount_across_pages(monkeypatch):
+    # 偶数为已有行，不计入
+    db, conn = make_db(monkeypatch, lambda page: sum(1 for v in page if v % 2))
+    rows = db._write("t", "INSERT INTO t VALUES %s", values=list(range(1250)), page_size=500)
+    assert rows == 625
+    assert conn.commits == 1
+
+
+def test_write_in_transaction_counts_affected_rows(monkeypatch):
+    db, _ = make_db(monkeypatch, lambda page: 0)
+    with db.transaction():
+        assert db._write("t", "INSERT INTO t VALUES %s", values=list(range(10)), page_size=4) == 0
+        assert db._tx_rows == {"t": 0}
+
+
+def test_write_fetch_collects_all_pages(monkeypatch):
+    db, _ = make_db(monkeypatch, lambda page: len(page))
+    returned = db._write("t", "INSERT INTO t VALUES %s RETURNING id", values=list(range(7)),
+                         page_size=3, fetch=True)
+    assert returned == [(v,) for v in range(7)]
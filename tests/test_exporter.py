@@ -0,0 +1,149 @@
+"""ParquetExporter 单月分区导出与按月增量判断"""
+import os
+from datetime import date, datetime, timezone
+import pytest
+from exporter import ParquetExporter
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+MONTH = date(2025, 1, 1)
+
+
+class FakeDB:
+    def __init__(self, rows, fail_after=None):
+        self.rows = rows
+        self.fail_after = fail_after
+        self.updated = {}
+        self.archived = set()
+        self.has_updatedat = True
+
+    def stream_rows(self, sql, params=None, itersize=2000, name=None):
+        rows = [r for r in self.rows if params["start"] <= r[0] < params["end"]]
+        for i, row in enumerate(rows):
+            if self.fail_after is not None and i >= self.fail_after:
+                raise RuntimeError("连接中断")
+            yield row
+
+    def _fetchall(self, sql, params=None, dict_rows=False):
+        if "information_schema" in sql:
+            return [(1,)] if self.has_updatedat else []
+        if "garmin_archive" in sql:
+            return [(m,) for m in self.archived]
+        counts = {}
+        for row in self.rows:
+            month = row[0].replace(day=1)
+            counts[month] = counts.get(month, 0) + 1
+        return [(m, n, self.updated.get(m) if self.has_updatedat else None) for m, n in counts.items()]
+
+
+def make_exporter(tmp_path, rows, fail_after=None):
+    exporter = ParquetExporter.__new__(ParquetExporter)
+    exporter.out_dir = str(tmp_path)
+    exporter.batch_rows = 2
+    exporter.compression = "zstd"
+    exporter.db = FakeDB(rows, fail_after)
+    return exporter
+
+
+def heartrate_rows(n, day=MONTH):
+    return [(day, datetime(day.year, day.month, day.day, 0, i, tzinfo=timezone.utc), 60 + i) for i in range(n)]
+
+
+def part_path(tmp_path, month="2025-01"):
+    return os.path.join(str(tmp_path), "heartrate", f"month={month}", "part-0.parquet")
+
+
+def export(exporter, marks, full=False):
+    """执行一次导出，返回本次重新写入的月份"""
+    written = []
+    export_month = exporter._export_month
+
+    def record(pa, dtype, month):
+        written.append(f"{month:%Y-%m}")
+        return export_month(pa, dtype, month)
+
+    exporter._export_month = record
+    exporter.export_type(pa, "heartrate", marks, full=full)
+    return written
+
+
+def test_export_month_writes_partition(tmp_path):
+    exporter = make_exporter(tmp_path, heartrate_rows(5))
+    assert exporter._export_month(pa, "heartrate", MONTH) == 5
+    assert pq.read_table(part_path(tmp_path)).num_rows == 5
+    assert not os.path.exists(part_path(tmp_path) + ".tmp")
+
+
+def test_empty_month_removes_stale_partition(tmp_path):
+    make_exporter(tmp_path, heartrate_rows(3))._export_month(pa, "heartrate", MONTH)
+    assert make_exporter(tmp_path, [])._export_month(pa, "heartrate", MONTH) == 0
+    assert not os.path.exists(part_path(tmp_path))
+
+
+def test_failed_export_keeps_previous_partition_and_cleans_tmp(tmp_path):
+    make_exporter(tmp_path, heartrate_rows(3))._export_month(pa, "heartrate", MONTH)
+    with pytest.raises(RuntimeError):
+        make_exporter(tmp_path, heartrate_rows(5), fail_after=4)._export_month(pa, "heartrate", MONTH)
+    assert pq.read_table(part_path(tmp_path)).num_rows == 3
+    assert not os.path.exists(part_path(tmp_path) + ".tmp")
+
+
+def test_backfilled_month_is_reexported(tmp_path):
+    exporter = make_exporter(tmp_path, heartrate_rows(3) + heartrate_rows(2, date(2025, 2, 1)))
+    marks = {}
+    assert export(exporter, marks) == ["2025-01", "2025-02"]
+    assert export(exporter, marks) == []
+    # 回填补入 1 月的数据，即使 2 月已导出，1 月也重新导出
+    exporter.db.rows += heartrate_rows(2, date(2025, 1, 20))
+    assert export(exporter, marks) == ["2025-01"]
+    assert pq.read_table(part_path(tmp_path)).num_rows == 5
+    assert export(exporter, marks) == []
+
+
+def test_updated_rows_are_reexported(tmp_path):
+    exporter = make_exporter(tmp_path, heartrate_rows(3))
+    exporter.db.updated[MONTH] = datetime(2025, 2, 1, tzinfo=timezone.utc)
+    marks = {}
+    export(exporter, marks)
+    exporter.db.updated[MONTH] = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    assert export(exporter, marks) == ["2025-01"]
+    assert export(exporter, marks, full=True) == ["2025-01"]
+
+
+def test_append_only_table_compares_row_counts(tmp_path):
+    exporter = make_exporter(tmp_path, heartrate_rows(3))
+    exporter.db.has_updatedat = False
+    marks = {}
+    export(exporter, marks)
+    assert export(exporter, marks) == []
+    exporter.db.rows += heartrate_rows(1, date(2025, 1, 2))
+    assert export(exporter, marks) == ["2025-01"]
+
+
+def test_archived_month_keeps_partition(tmp_path):
+    exporter = make_exporter(tmp_path, heartrate_rows(3))
+    marks = {}
+    export(exporter, marks)
+    # 保留策略将 1 月明细归档移出在线表
+    exporter.db.rows = []
+    exporter.db.archived = {MONTH}
+    assert export(exporter, marks) == []
+    assert export(exporter, marks, full=True) == []
+    assert pq.read_table(part_path(tmp_path)).num_rows == 3
+    assert "2025-01" in marks["heartrate"]
+
+
+def test_deleted_month_removes_partition(tmp_path):
+    exporter = make_exporter(tmp_path, heartrate_rows(3))
+    marks = {}
+    export(exporter, marks)
+    exporter.db.rows = []
+    assert export(exporter, marks) == ["2025-01"]
+    assert not os.path.exists(part_path(tmp_path))
+    assert marks["heartrate"] == {}
+
+
+def test_legacy_watermark_reexports_all_months(tmp_path):
+    exporter = make_exporter(tmp_path, heartrate_rows(3) + heartrate_rows(2, date(2025, 2, 1)))
+    assert export(exporter, {"heartrate": "2025-02"}) == ["2025-01", "2025-02"]
@@ -0,0 +1,113 @@
+"""明细覆盖率缺口: 回填任务合并、缺口与失败日期的重新获取"""
+
+from datetime import date, timedelta
+
+import gaps
+from garmin_data_collector import GarminDataCollector
+from run_journal import RunJournal
+
+
+class FakeDB:
+    def __init__(self, coverage=None, failed=()):
+        self.coverage = coverage or {}
+        self.failed = list(failed)
+        self.syncs = []
+        self.jobs = None
+
+    def detail_coverage_gaps(self, datasource, dtype, *args, **kwargs):
+        return self.coverage.get(dtype, [])
+
+    def failed_sync_dates(self, datasource, start, end):
+        return [(t, d) for t, d in self.failed if start <= d <= end]
+
+    def upsert_syncs(self, datasource, dtype, dates, status=1, errmsg=None):
+        self.syncs.append((dtype, list(dates), status))
+
+    def requeue_sync_jobs(self, jobs):
+        self.jobs = jobs
+        return len(jobs)
+
+
+def d(day):
+    return date(2025, 3, day)
+
+
+def test_requeue_merges_contiguous_days():
+    found = {
+        "heartrate": [(d(5), 0, 720), (d(1), 10, 720), (d(2), 0, 720), (d(3), 5, 720), (d(9), 0, 720)],
+        "stress": [(d(7), 0, 480)],
+    }
+    db = FakeDB()
+    assert gaps.requeue(db, found) == 4
+    assert db.jobs == [
+        ("garmin", "heartrate", d(1), d(3)),
+        ("garmin", "heartrate", d(5), d(5)),
+        ("garmin", "heartrate", d(9), d(9)),
+        ("garmin", "stress", d(7), d(7)),
+    ]
+    # 回填按同步状态领取，登记前先标记为未完成
+    assert ("heartrate", [d(5), d(1), d(2), d(3), d(9)], 0) in db.syncs
+
+
+def test_find_gaps_reports_expected_and_skips_unknown_types(config):
+    config["gaps"] = {"expected": {"heartrate": 100}}
+    db = FakeDB(coverage={"heartrate": [(d(2), 12)]})
+    assert gaps.find_gaps(db, d(1), d(3), types=["heartrate", "sleep"]) == {"heartrate": [(d(2), 12, 100)]}
+
+
+def test_find_failed_groups_by_type():
+    db = FakeDB(failed=[("sleep", d(2)), ("heartrate", d(3)), ("sleep", d(1))])
+    assert gaps.find_failed(db, d(1), d(31)) == {"sleep": [d(2), d(1)], "heartrate": [d(3)]}
+
+
+class DT:
+    def __init__(self, dtype):
+        self.dtype = dtype
+
+
+def make_collector(db):
+    collector = GarminDataCollector.__new__(GarminDataCollector)
+    collector.db = db
+    collector.journal = RunJournal("garmin")
+    collector.calls = []
+    collector.daily_types = lambda names=None: [DT("heartrate"), DT("sleep")]
+    collector.collect_daily = lambda dt, dates, on_progress=None, force=False: \
+        collector.calls.append((dt.dtype, dates, force))
+    return collector
+
+
+def test_refetch_gaps_keeps_sync_status_and_retries_failed_days():
+    yesterday = date.today() - timedelta(days=1)
+    gap_day = yesterday - timedelta(days=5)
+    failed_day = yesterday - timedelta(days=9)
+    db = FakeDB(coverage={"heartrate": [(gap_day, 3)]},
+                failed=[("sleep", failed_day), ("hrv", failed_day)])
+    collector = make_collector(db)
+    collector.refetch_gaps(yesterday)
+
+    # 缺口日期不预先置为失败(重新获取失败时下次仍能检出)，已同步的日期强制重新获取
+    assert db.syncs == []
+    assert collector.calls == [
+        ("heartrate", [gap_day.isoformat()], True),
+        ("sleep", [failed_day.isoformat()], False),
+    ]
+
+
+def test_refetch_gaps_outside_lookback(config):
+    config["gaps"] = {"lookback_days": 3}
+    collector = make_collector(FakeDB(coverage={"heartrate": [(d(1), 0)]}))
+    collector.refetch_gaps(date.today() - timedelta(days=10))
+    assert collector.calls == []
+
+
+def test_collect_all_data_activities_only(monkeypatch):
+    collector = make_collector(FakeDB())
+    called = []
+    collector.collect_activities = lambda days_back: called.append(days_back)
+    collector.refetch_gaps = lambda end: called.append(("gaps", end))
+    collector.refresh_rollups = lambda: None
+    collector.db.latest_synced_dates = lambda source: {}
+    monkeypatch.setattr("http_transport.report", lambda session: (0, 0))
+    collector.collect_all_data(days_back=0)
+    assert called == [0]
+    assert all(dates == [] for _, dates, _ in collector.calls)
@@ -0,0 +1,77 @@
+"""查询服务缓存: LRU 淘汰、按标签失效、generation 防止旧结果回填"""
+import query_api
+from query_api import QueryCache
+
+
+def put(cache, key, tags=()):
+    return cache.put(key, key.encode(), tags, cache.generation)
+
+
+def test_get_returns_body_and_etag():
+    cache = QueryCache()
+    body, etag = put(cache, "daily:2025-01-01")
+    assert cache.get("daily:2025-01-01") == (body, etag)
+    assert etag.startswith('"') and etag.endswith('"')
+    assert cache.get("daily:2025-01-02") is None
+
+
+def test_lru_evicts_least_recently_used():
+    cache = QueryCache(max_entries=2)
+    put(cache, "a", [("date", "2025-01-01")])
+    put(cache, "b")
+    cache.get("a")
+    put(cache, "c")
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    # 淘汰 a 后其标签索引一并清理
+    put(cache, "d")
+    put(cache, "e")
+    assert ("date", "2025-01-01") not in cache._tags
+
+
+def test_invalidate_by_tag():
+    cache = QueryCache()
+    put(cache, "daily:2025-01-01", [("date", "2025-01-01")])
+    put(cache, "series:hr:2025-01-01", [("date", "2025-01-01")])
+    put(cache, "daily:2025-01-02", [("date", "2025-01-02")])
+    put(cache, "track:1", [("activity", "1"), ("date", "2025-01-02")])
+    assert cache.invalidate([("date", "2025-01-01"), ("activity", "1")]) == 3
+    assert cache.get("daily:2025-01-01") is None
+    assert cache.get("series:hr:2025-01-01") is None
+    assert cache.get("track:1") is None
+    assert cache.get("daily:2025-01-02") is not None
+    assert cache._tags == {("date", "2025-01-02"): {"daily:2025-01-02"}}
+    assert cache.invalidate([("date", "2099-01-01")]) == 0
+
+
+def test_stale_generation_is_not_cached():
+    cache = QueryCache()
+    generation = cache.generation
+    # 查询期间发生写入并失效
+    cache.invalidate([("date", "2025-01-01")])
+    body, etag = cache.put("daily:2025-01-01", b"old", [("date", "2025-01-01")], generation)
+    assert body == b"old" and etag
+    assert cache.get("daily:2025-01-01") is None
+    assert len(cache) == 0
+
+
+def test_put_replaces_entry_and_its_tags():
+    cache = QueryCache()
+    put(cache, "k", [("date", "2025-01-01")])
+    cache.put("k", b"new", [("date", "2025-01-02")], cache.generation)
+    assert cache.get("k")[0] == b"new"
+    assert ("date", "2025-01-01") not in cache._tags
+    assert cache.invalidate([("date", "2025-01-02")]) == 1
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(query_api.time, "monotonic", lambda: now[0])
+    cache = QueryCache(ttl=60)
+    put(cache, "k", [("date", "2025-01-01")])
+    now[0] += 59
+    assert cache.get("k") is not None
+    now[0] += 2
+    assert cache.get("k") is None
+    assert cache._tags == {}
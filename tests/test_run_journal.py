@@ -0,0 +1,42 @@
+"""RunJournal 按数据源计算运行增量"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+from run_journal import RunJournal
+
+
+def test_concurrent_sources_do_not_mix():
+    started = threading.Barrier(2)
+    records = {}
+
+    def run(name, requests, rows):
+        journal = RunJournal(name)
+        started.wait()
+        for _ in range(requests):
+            metrics.record_api_request("test", 0.01)
+        metrics.record_db_write("test_table", rows, 0.02)
+        started.wait()
+        records[name] = journal.finish(True)
+
+    threads = [threading.Thread(target=run, args=args)
+               for args in (("journal_a", 3, 100), ("journal_b", 5, 7))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert records["journal_a"]["requests"] == 3
+    assert records["journal_a"]["rowswritten"] == 100
+    assert records["journal_a"]["dbcommits"] == 1
+    assert records["journal_b"]["requests"] == 5
+    assert records["journal_b"]["rowswritten"] == 7
+
+
+def test_fetch_pool_inherits_source():
+    journal = RunJournal("journal_pool")
+    with ThreadPoolExecutor(max_workers=2, initializer=metrics.set_source,
+                            initargs=(metrics.current_source(),)) as pool:
+        list(pool.map(lambda _: metrics.record_api_response("test", 10, 40), range(4)))
+    record = journal.finish(True)
+    assert record["bytesdownloaded"] == 40
+    assert record["requests"] == 0
@@ -0,0 +1,52 @@
+"""压力解析: 按区间统计时长"""
+import json
+from garmin_data_collector import GarminDataCollector
+
+T0 = 1735689600000  # 2025-01-01 00:00 UTC(毫秒)
+
+
+def samples(levels, interval=180):
+    return [[T0 + i * interval * 1000, level] for i, level in enumerate(levels)]
+
+
+def test_durations_by_band():
+    result = GarminDataCollector._stress_durations(samples([0, 25, 26, 50, 51, 75, 76, 100]))
+    assert result == {"restduration": 360, "lowduration": 360, "mediumduration": 360, "highduration": 360}
+
+
+def test_interval_is_median_of_sample_gaps():
+    # 间隔 60 秒为主，一次 10 分钟中断不影响推断
+    points = samples([10] * 5, interval=60)
+    points.append([points[-1][0] + 600 * 1000, 90])
+    result = GarminDataCollector._stress_durations(points)
+    assert result["restduration"] == 5 * 60
+    assert result["highduration"] == 60
+
+
+def test_negative_and_missing_values_are_ignored():
+    points = samples([-1, -2, 30, 30]) + [[T0, None], [None, 40], None, [T0]]
+    result = GarminDataCollector._stress_durations(points)
+    assert result == {"restduration": 0, "lowduration": 360, "mediumduration": 0, "highduration": 0}
+
+
+def test_single_sample_uses_default_interval():
+    result = GarminDataCollector._stress_durations([[T0, 80]])
+    assert result["highduration"] == GarminDataCollector.STRESS_SAMPLE_SECONDS
+
+
+def test_no_samples_gives_null_durations():
+    expected = {"restduration": None, "lowduration": None, "mediumduration": None, "highduration": None}
+    assert GarminDataCollector._stress_durations(None) == expected
+    assert GarminDataCollector._stress_durations([[T0, None]]) == expected
+
+
+def test_parse_stress():
+    data = {"avgStressLevel": 32, "maxStressLevel": 88, "stressValuesArray": samples([20, 20, 90])}
+    parsed = GarminDataCollector._parse_stress("2025-01-01", data)
+    assert parsed["stressdate"] == "2025-01-01"
+    assert parsed["overalllevel"] == 32
+    assert parsed["stressscore"] == 88
+    assert parsed["restduration"] == 360 and parsed["highduration"] == 180
+    assert json.loads(parsed["rawjson"]) == data
+    assert GarminDataCollector._parse_stress("2025-01-01", {}) is None
+    assert GarminDataCollector._parse_stress("2025-01-01", {"avgStressLevel": None}) is None
@@ -0,0 +1,67 @@
+"""轨迹 LOD: 显著度、编码折线"""
+import math
+import pytest
+from track_lod import significance, encode_polyline, decode_polyline, build_lods, TrackCollector
+
+# Google 编码折线文档中的示例
+GOOGLE_POINTS = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+GOOGLE_ENCODED = "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+
+def test_encode_polyline_matches_reference():
+    assert encode_polyline(GOOGLE_POINTS) == GOOGLE_ENCODED
+
+
+def test_decode_polyline_matches_reference():
+    assert decode_polyline(GOOGLE_ENCODED) == pytest.approx(GOOGLE_POINTS)
+
+
+def test_polyline_round_trip_negative_and_small_deltas():
+    points = [(0.0, 0.0), (-0.00001, 0.00001), (-89.99999, 179.99999), (31.23456, 121.47371)]
+    assert decode_polyline(encode_polyline(points)) == pytest.approx(points)
+    assert encode_polyline([]) == ""
+    assert decode_polyline("") == []
+
+
+def test_significance_endpoints_and_collinear_points():
+    sig = significance([0, 1, 2, 3], [0, 0, 0, 0])
+    assert sig[0] == sig[-1] == math.inf
+    assert sig[1:3] == [0.0, 0.0]
+    assert significance([], []) == []
+
+
+def test_significance_is_capped_by_parent_split():
+    # 峰值点偏离 10 米；其两侧的小起伏按各自子段计算，但不超过父分割点的显著度
+    xs = [0, 5, 10, 15, 20]
+    ys = [0, 0, 10, 0, 0]
+    sig = significance(xs, ys)
+    assert sig[2] == pytest.approx(10.0)
+    assert all(s <= sig[2] for s in sig[1:4])
+
+
+def test_significance_closed_loop():
+    # 首尾重合时按点距计算，最远点最显著
+    xs = [0, 10, 10, 0, 0]
+    ys = [0, 0, 10, 10, 0]
+    sig = significance(xs, ys)
+    assert sig[2] == pytest.approx(math.hypot(10, 10))
+
+
+def test_build_lods_more_points_at_higher_zoom():
+    lats = [30 + i * 1e-4 for i in range(200)]
+    lngs = [120 + 2e-4 * math.sin(i / 5) for i in range(200)]
+    lods = build_lods(lats, lngs)
+    counts = [n for _, _, n, _ in lods]
+    assert counts == sorted(counts)
+    assert counts[0] >= 2
+    for _, _, n, encoded in lods:
+        assert len(decode_polyline(encoded)) == n
+    assert build_lods([30.0], [120.0]) == []
+
+
+def test_track_collector_skips_points_without_position():
+    collector = TrackCollector()
+    collector.add([{"latitude": 30.0, "longitude": 120.0}, {"latitude": None, "longitude": 120.0},
+                   {"heartRate": 120}, {"latitude": 30.1, "longitude": 120.1}])
+    assert list(collector.lats) == [30.0, 30.1]
+    assert list(collector.lngs) == [120.0, 120.1]
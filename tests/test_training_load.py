@@ -0,0 +1,148 @@
+"""训练负荷: TRIMP 累计与 ATL/CTL/TSB 递推"""
+import contextlib
+import math
+from datetime import date, datetime, timedelta, timezone
+import pytest
+import training_load
+from training_load import TrimpAccumulator, activity_load, update_daily
+
+T0 = datetime(2025, 1, 1, 8, 0, tzinfo=timezone.utc)
+
+
+def hr_points(seconds, hr=150, step=1, start=T0):
+    return [{"pointtime": start + timedelta(seconds=s), "heartrate": hr} for s in range(0, seconds + 1, step)]
+
+
+class FakeDB:
+    def __init__(self, loads=None, rest_hr=50):
+        self.loads = loads or {}
+        self.rest_hr = rest_hr
+        self.stored = {}
+        self.changes = []
+
+    def latest_resting_hr(self, day):
+        return self.rest_hr
+
+    def training_load_before(self, day):
+        earlier = [d for d in self.stored if d < day]
+        if not earlier:
+            return None
+        row = self.stored[max(earlier)]
+        return row[0], row[2], row[3]
+
+    def daily_activity_loads(self, start, end):
+        return {d: v for d, v in self.loads.items() if start <= d <= end}
+
+    @contextlib.contextmanager
+    def transaction(self):
+        yield
+
+    def upsert_training_load(self, rows):
+        self.stored.update({r[0]: r for r in rows})
+
+    def record_change(self, datasource, datatype, dates=()):
+        self.changes.append((datatype, list(dates)))
+
+
+def test_trimp_constant_heart_rate():
+    acc = TrimpAccumulator(rest_hr=50, max_hr=190)
+    acc.add(hr_points(600))
+    hrr = (150 - 50) / (190 - 50)
+    assert acc.seconds == 600
+    assert acc.trimp == pytest.approx(10 * hrr * 0.64 * math.exp(1.92 * hrr))
+
+
+def test_trimp_batches_equal_single_pass():
+    points = hr_points(300, step=2) + [{"pointtime": None, "heartrate": 100}, {"pointtime": T0, "heartrate": None}]
+    whole = TrimpAccumulator(50, 190)
+    whole.add(points)
+    split = TrimpAccumulator(50, 190)
+    for i in range(0, len(points), 7):
+        split.add(points[i:i + 7])
+    assert split.trimp == pytest.approx(whole.trimp)
+    assert split.seconds == whole.seconds == 300
+
+
+def test_trimp_skips_pauses():
+    acc = TrimpAccumulator(50, 190)
+    acc.add(hr_points(60) + hr_points(60, start=T0 + timedelta(seconds=60 + training_load.MAX_GAP_SECONDS + 1)))
+    assert acc.seconds == 120
+
+
+def test_trimp_clamps_heart_rate_reserve():
+    low = TrimpAccumulator(50, 190)
+    low.add(hr_points(60, hr=40))
+    high = TrimpAccumulator(50, 190)
+    high.add(hr_points(60, hr=220))
+    assert low.trimp == 0
+    assert high.trimp == pytest.approx(0.64 * math.exp(1.92))
+
+
+def test_activity_load_prefers_hr_series_and_falls_back_to_avg_hr():
+    db = FakeDB()
+    summary = {"activityid": 1, "starttime": "2025-01-01 08:00:00", "duration": 600, "avghr": 150}
+    acc = TrimpAccumulator(50, 190)
+    acc.add(hr_points(600))
+    assert activity_load(db, summary, acc)["method"] == "hr_series"
+
+    # 心率序列覆盖不足一半时长，按平均心率估算
+    short = TrimpAccumulator(50, 190)
+    short.add(hr_points(120))
+    load = activity_load(db, summary, short)
+    assert load["method"] == "avg_hr"
+    assert load["trimp"] == pytest.approx(acc.trimp, abs=0.01)
+    assert load["hrseconds"] == 120
+
+    assert activity_load(db, dict(summary, avghr=None), None) is None
+    assert activity_load(db, dict(summary, starttime=None), acc) is None
+
+
+def test_update_daily_recursion():
+    d0 = date(2025, 1, 1)
+    db = FakeDB({d0: 100.0})
+    assert update_daily(db, d0, d0 + timedelta(days=1)) == 2
+    ka = 1 - math.exp(-1 / training_load.ATL_DAYS)
+    kc = 1 - math.exp(-1 / training_load.CTL_DAYS)
+    day0, day1 = db.stored[d0], db.stored[d0 + timedelta(days=1)]
+    assert day0[1:] == (100.0, round(100 * ka, 2), round(100 * kc, 2), 0.0)
+    # TSB 取前一日 CTL - ATL
+    assert day1[4] == pytest.approx(day0[3] - day0[2], abs=0.01)
+    assert day1[2] == pytest.approx(100 * ka * (1 - ka), abs=0.01)
+    assert db.changes == [("training_load", [d0, d0 + timedelta(days=1)])]
+
+
+def test_update_daily_incremental_matches_full():
+    d0 = date(2025, 1, 1)
+    loads = {d0 + timedelta(days=i): float(30 + i * 7 % 50) for i in range(0, 60, 3)}
+    end = d0 + timedelta(days=59)
+    full = FakeDB(loads)
+    update_daily(full, d0, end)
+
+    incremental = FakeDB(loads)
+    update_daily(incremental, d0, d0 + timedelta(days=29))
+    update_daily(incremental, (d0 + timedelta(days=30)).isoformat(), end)
+    # 起点状态取库中两位小数的 ATL/CTL，允许舍入误差
+    assert incremental.stored.keys() == full.stored.keys()
+    for day, row in full.stored.items():
+        assert incremental.stored[day][1:] == pytest.approx(row[1:], abs=0.05)
+
+
+def test_update_daily_decays_over_rest_days():
+    # 已有记录到 3/1，下一次活动在 3/6: 3/2~3/5 按无负荷衰减并补齐
+    d0 = date(2025, 3, 1)
+    rest_end = d0 + timedelta(days=5)
+    loads = {d0: 100.0, rest_end: 50.0}
+    incremental = FakeDB(loads)
+    update_daily(incremental, d0, d0)
+    assert update_daily(incremental, rest_end, rest_end) == 5
+    assert sorted(incremental.stored) == [d0 + timedelta(days=i) for i in range(6)]
+
+    full = FakeDB(loads)
+    update_daily(full, d0, rest_end)
+    assert incremental.stored[rest_end][1:] == pytest.approx(full.stored[rest_end][1:], abs=0.05)
+
+
+def test_update_daily_empty_range():
+    db = FakeDB()
+    assert update_daily(db, date(2025, 1, 2), date(2025, 1, 1)) == 0
+    assert db.stored == {}